@@ -0,0 +1,461 @@
+import sys
+import json
+import time
+import logging
+import argparse
+import numpy as np
+import cv2
+import config
+
+logging.basicConfig(level=logging.INFO)
+
+
+def read_frames(video_path, max_frames):
+    """Read up to max_frames BGR frames from a video file (or camera index)."""
+    source = int(video_path) if str(video_path).isdigit() else video_path
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while cap.isOpened() and len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret or frame is None:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def summarize_timings(timings, unit='ms'):
+    """Return mean and p95 of a list of durations given in unit."""
+    if not timings:
+        return {f'mean_{unit}': 0.0, f'p95_{unit}': 0.0}
+    return {
+        f'mean_{unit}': round(float(np.mean(timings)), 2),
+        f'p95_{unit}': round(float(np.percentile(timings, 95)), 2),
+    }
+
+
+def run_detectors_at_height(frames, height):
+    """Run face, hand and pose detection on every frame at the given inference height."""
+    from utils.detectors import Detectors
+    from utils.inference_frames import InferenceFrames
+
+    detector = Detectors(config.DEFAULT_MIN_DETECTION_CONFIDENCE, config.DEFAULT_MIN_TRACKING_CONFIDENCE)
+    detector.inference_heights = {name: height for name in detector.inference_heights}
+    timings = {'resize': [], 'face': [], 'hands': [], 'pose': []}
+    results = []
+    for index, frame in enumerate(frames):
+        timestamp = index / config.VIDEO_FPS
+        inference = InferenceFrames(frame, detector.inference_heights)
+
+        start = time.perf_counter()
+        for name in ('face', 'hands', 'pose'):
+            inference.rgb(name)
+        timings['resize'].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        face = detector.detect_face(inference)
+        timings['face'].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        hand = detector.detect_hand_gesture(inference, timestamp)
+        timings['hands'].append((time.perf_counter() - start) * 1000)
+        hand_points = detector.last_points['hand']
+
+        start = time.perf_counter()
+        body = detector.detect_body_gesture(inference, timestamp)
+        timings['pose'].append((time.perf_counter() - start) * 1000)
+        body_points = detector.last_points['body']
+
+        results.append({
+            'distance': face.distance if face is not None else None,
+            'hand_id': hand.class_id if hand is not None else None,
+            'body_id': body.class_id if body is not None else None,
+            'hand_points': None if hand_points is None else np.asarray(hand_points, dtype=np.float64),
+            'body_points': None if body_points is None else np.asarray(body_points, dtype=np.float64),
+        })
+    return results, timings
+
+
+def compare_results(results, baseline):
+    """Compare detections against the native-resolution baseline."""
+    comparison = {}
+    for kind in ('hand', 'body'):
+        ids = [(r[f'{kind}_id'], b[f'{kind}_id']) for r, b in zip(results, baseline)]
+        errors = [
+            float(np.mean(np.linalg.norm(r[f'{kind}_points'] - b[f'{kind}_points'], axis=1)))
+            for r, b in zip(results, baseline)
+            if r[f'{kind}_points'] is not None and b[f'{kind}_points'] is not None
+        ]
+        comparison[kind] = {
+            'detection_rate': round(sum(r[f'{kind}_points'] is not None for r in results) / max(len(results), 1), 3),
+            'gesture_agreement': round(sum(a == b for a, b in ids) / max(len(ids), 1), 3),
+            'landmark_error_px': round(float(np.mean(errors)), 2) if errors else None,
+        }
+    distance_errors = [
+        abs(r['distance'] - b['distance']) / b['distance']
+        for r, b in zip(results, baseline)
+        if r['distance'] and b['distance']
+    ]
+    comparison['face'] = {
+        'detection_rate': round(sum(r['distance'] is not None for r in results) / max(len(results), 1), 3),
+        'distance_rel_error': round(float(np.mean(distance_errors)), 3) if distance_errors else None,
+    }
+    return comparison
+
+
+def benchmark_resolution(args):
+    """Measure per-detector latency and agreement with native-resolution results at each inference height."""
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        logging.error(f"No frames read from {args.video}")
+        return None
+    native_height = frames[0].shape[0]
+    baseline, baseline_timings = run_detectors_at_height(frames, None)
+    report = {'video': str(args.video), 'frames': len(frames), 'native_height': native_height, 'heights': {}}
+    report['heights']['native'] = {name: summarize_timings(t) for name, t in baseline_timings.items()}
+    report['heights']['native']['accuracy'] = compare_results(baseline, baseline)
+
+    for height in args.heights:
+        if height >= native_height:
+            continue
+        results, timings = run_detectors_at_height(frames, height)
+        entry = {name: summarize_timings(t) for name, t in timings.items()}
+        entry['accuracy'] = compare_results(results, baseline)
+        report['heights'][str(height)] = entry
+
+    print(f"\n{'height':<8}{'resize':>9}{'face':>9}{'hands':>9}{'pose':>9}{'hand agr':>10}{'hand px':>9}{'body agr':>10}{'body px':>9}{'dist err':>10}")
+    for height, entry in report['heights'].items():
+        accuracy = entry['accuracy']
+        print(f"{height:<8}{entry['resize']['mean_ms']:>9.2f}{entry['face']['mean_ms']:>9.2f}"
+              f"{entry['hands']['mean_ms']:>9.2f}{entry['pose']['mean_ms']:>9.2f}"
+              f"{accuracy['hand']['gesture_agreement']:>10.3f}{accuracy['hand']['landmark_error_px'] or 0:>9.2f}"
+              f"{accuracy['body']['gesture_agreement']:>10.3f}{accuracy['body']['landmark_error_px'] or 0:>9.2f}"
+              f"{accuracy['face']['distance_rel_error'] or 0:>10.3f}")
+    return report
+
+
+def run_profile(frames, profile, mode):
+    """
+    Run the per-frame pipeline of a performance profile (capture-size frames, face cadence, warm standby and
+    the hand or body graph of mode) and return the per-frame latencies in ms, the wall time and the CPU time.
+    """
+    from utils.detectors import Detectors
+    from utils.detector_lifecycle import DetectorLifecycle
+    from utils.inference_frames import InferenceFrames
+    from utils.performance_profiles import apply_thread_settings
+
+    detector = Detectors(profile.min_detection_confidence, profile.min_tracking_confidence)
+    detector.apply_profile(profile)
+    detector.model_registry.commit_pending()
+    apply_thread_settings(profile)
+    lifecycle = DetectorLifecycle(detector, profile.standby_interval, profile.prewarm_interval)
+    frames = [cv2.resize(frame, profile.video_size, interpolation=cv2.INTER_AREA) for frame in frames]
+    # Far from the switch distance, so the standby (not pre-warm) cadence applies
+    offset = 2 * config.STANDBY_PREWARM_BAND
+    distance = config.GESTURE_SWITCH_DISTANCE - offset if mode == 1 else config.GESTURE_SWITCH_DISTANCE + offset
+    latencies = []
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    for index, frame in enumerate(frames):
+        timestamp = index / profile.video_fps
+        start = time.perf_counter()
+        inference = InferenceFrames(frame, detector.inference_heights)
+        if index % profile.face_interval == 0:
+            detector.detect_faces(inference)
+        lifecycle.before_detection(inference, mode, distance, timestamp)
+        if mode == 1:
+            detector.detect_hand_gesture(inference, timestamp)
+        else:
+            detector.detect_body_gesture(inference, timestamp)
+        latencies.append((time.perf_counter() - start) * 1000)
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    return latencies, wall, cpu
+
+
+def benchmark_profiles(args):
+    """Measure FPS, per-frame latency and CPU usage of each performance profile on the same clip."""
+    from utils.performance_profiles import get_profile, profile_names
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        logging.error(f"No frames read from {args.video}")
+        return None
+    mode = 1 if args.mode == 'hand' else 2
+    report = {'video': str(args.video), 'frames': len(frames), 'mode': args.mode, 'profiles': {}}
+    for name in args.profiles or profile_names():
+        profile = get_profile(name)
+        latencies, wall, cpu = run_profile(frames, profile, mode)
+        report['profiles'][name] = {
+            'fps': round(len(latencies) / wall, 1) if wall > 0 else 0.0,
+            'latency': summarize_timings(latencies),
+            # Process CPU time over wall time; above 100% when MediaPipe/TFLite use several cores
+            'cpu_percent': round(100.0 * cpu / wall, 1) if wall > 0 else 0.0,
+            'cpu_ms_per_frame': round(1000.0 * cpu / len(latencies), 2),
+        }
+
+    print(f"\n{'profile':<12}{'fps':>8}{'mean ms':>9}{'p95 ms':>9}{'cpu %':>8}{'cpu ms':>9}")
+    for name, entry in report['profiles'].items():
+        print(f"{name:<12}{entry['fps']:>8.1f}{entry['latency']['mean_ms']:>9.2f}{entry['latency']['p95_ms']:>9.2f}"
+              f"{entry['cpu_percent']:>8.0f}{entry['cpu_ms_per_frame']:>9.2f}")
+    return report
+
+
+def record_features(video_paths, kind, max_frames):
+    """Run detection without the classification cache on each clip and return the per-frame landmark vectors (None without landmarks)."""
+    from utils.detectors import Detectors
+
+    detector = Detectors(config.DEFAULT_MIN_DETECTION_CONFIDENCE, config.DEFAULT_MIN_TRACKING_CONFIDENCE)
+    detector.classification_cache = None
+    detect = detector.detect_hand_gesture if kind == 'hand' else detector.detect_body_gesture
+    sessions = []
+    for video_path in video_paths:
+        features = []
+        for index, frame in enumerate(read_frames(video_path, max_frames)):
+            detect(frame, index / config.VIDEO_FPS)
+            vector = detector.last_features[kind]
+            features.append(None if vector is None else np.array(vector, dtype=np.float32))
+        sessions.append(features)
+    return sessions, detector.model_registry.active(kind)
+
+
+def benchmark_cache(args):
+    """Check that cached classification decisions match uncached ones on recorded clips, and measure hit rate and saved time."""
+    from utils.classification_cache import ClassificationCache
+    from utils.gesture_debouncer import gesture_decisions
+
+    sessions, model = record_features(args.video, args.kind, args.frames)
+    if model is None:
+        logging.error(f"No {args.kind} model loaded")
+        return None
+    frames = sum(len(features) for features in sessions)
+    if not frames:
+        logging.error("No frames read from the clips")
+        return None
+
+    def classify(features, predict):
+        predictions = [None if vector is None else predict(vector) for vector in features]
+        return gesture_decisions(predictions, model)
+
+    inference_times = []
+
+    def timed_predict(vector):
+        start = time.perf_counter()
+        prediction = model.predict(vector)
+        inference_times.append((time.perf_counter() - start) * 1e6)
+        return prediction
+
+    baseline = [classify(features, timed_predict) for features in sessions]
+    report = {'videos': [str(v) for v in args.video], 'kind': args.kind, 'frames': frames,
+              'model_version': model.version, 'inference': summarize_timings(inference_times, 'us'), 'steps': {}}
+    for step in args.steps:
+        cache = ClassificationCache(max_size=args.size, step=step)
+        decision_mismatches = confirmed_mismatches = 0
+        start = time.perf_counter()
+        for features, (decisions, confirmed) in zip(sessions, baseline):
+            cached_decisions, cached_confirmed = classify(
+                features, lambda vector: cache.classify(model.version, vector, model.predict))
+            decision_mismatches += sum(a != b for a, b in zip(decisions, cached_decisions))
+            confirmed_mismatches += sum(a != b for a, b in zip(confirmed, cached_confirmed))
+        elapsed = time.perf_counter() - start
+        report['steps'][str(step)] = {
+            'decision_agreement': round(1.0 - decision_mismatches / frames, 4),
+            'decision_mismatches': decision_mismatches,
+            'confirmed_mismatches': confirmed_mismatches,
+            'cached_run_ms': round(elapsed * 1000, 2),
+            **cache.stats(),
+        }
+    # Confirmations are what reach the drone; any difference fails the parity check
+    report['failures'] = [f"step {step}: {entry['confirmed_mismatches']} confirmed gestures differ from uncached"
+                          for step, entry in report['steps'].items() if entry['confirmed_mismatches']]
+    report['passed'] = not report['failures']
+
+    print(f"\nuncached inference mean {report['inference']['mean_us']:.1f} us over {len(inference_times)} vectors")
+    print(f"{'step':<8}{'hit rate':>10}{'agreement':>11}{'mismatch':>10}{'confirmed':>11}{'saved ms':>10}")
+    for step, entry in report['steps'].items():
+        print(f"{step:<8}{entry['hit_rate']:>10.3f}{entry['decision_agreement']:>11.4f}{entry['decision_mismatches']:>10}"
+              f"{entry['confirmed_mismatches']:>11}{entry['saved_seconds'] * 1000:>10.2f}")
+    for failure in report['failures']:
+        logging.error(f"Cache parity failed: {failure}")
+    return report
+
+
+def benchmark_preroll(args):
+    """CPU overhead and memory of the pre-roll buffer while nothing is recorded, per JPEG quality, at camera rate."""
+    from utils.video_recorder import PrerollBuffer
+
+    frames = read_frames(args.video, args.frames)
+    if not frames:
+        logging.error(f"No frames read from {args.video}")
+        return None
+    period = 1.0 / args.fps
+
+    def run(quality):
+        preroll = PrerollBuffer(quality=quality).start() if quality is not None else None
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        deadline = start_wall
+        for index, frame in enumerate(frames):
+            if preroll is not None:
+                preroll.offer(frame, index * period)
+            deadline += period
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+        wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        stats = preroll.stats() if preroll is not None else {}
+        if preroll is not None:
+            preroll.stop()
+        return 100.0 * cpu / wall, stats
+
+    baseline, _ = run(None)
+    report = {'video': str(args.video), 'frames': len(frames), 'fps': args.fps,
+              'baseline_cpu_percent': round(baseline, 2), 'qualities': {}}
+    for quality in args.qualities:
+        cpu, stats = run(quality)
+        report['qualities'][quality] = dict(stats, cpu_overhead_percent=round(cpu - baseline, 2),
+                                            raw_bytes=int(stats['frames'] * frames[0].nbytes))
+
+    print(f"\n{'quality':<9}{'cpu %':>7}{'enc ms':>8}{'frames':>8}{'seconds':>9}{'MB':>7}{'raw MB':>8}{'skipped':>9}")
+    for quality, entry in report['qualities'].items():
+        print(f"{quality:<9}{entry['cpu_overhead_percent']:>7.1f}{entry['encode_ms']:>8.2f}{entry['frames']:>8}"
+              f"{entry['seconds']:>9.1f}{entry['bytes'] / 1e6:>7.1f}{entry['raw_bytes'] / 1e6:>8.1f}{entry['skipped']:>9}")
+    return report
+
+
+def velocity_setpoints(count, hold):
+    """A setpoint stream like the control loops produce: the commanded velocity changes every hold samples."""
+    rng = np.random.default_rng(config.RANDOM_SEED)
+    setpoints = []
+    for index in range(count):
+        if index % hold == 0:
+            velocity = tuple(float(v) for v in np.round(rng.uniform(-1.0, 1.0, 3), 2))
+        setpoints.append(velocity)
+    return setpoints
+
+
+def benchmark_mavlink(args):
+    """Compare per-message encoding, template patching and coalesced setpoint streaming against a local endpoint."""
+    import threading
+    from pymavlink import mavutil
+    from utils.mavlink_templates import MessageTemplates, SetpointCoalescer, VELOCITY_MASK
+
+    receiver = mavutil.mavlink_connection(f"udpin:{args.host}:{args.port}")
+    sender = mavutil.mavlink_connection(f"udpout:{args.host}:{args.port}", source_system=255)
+    frame = mavutil.mavlink.MAV_FRAME_BODY_OFFSET_NED
+    setpoints = velocity_setpoints(args.count, args.hold)
+    period = 1.0 / args.rate
+
+    def run(strategy):
+        templates = MessageTemplates(sender.mav)
+        coalescer = SetpointCoalescer()
+        encode_times, send_times = [], []
+        received = [0]
+        done = threading.Event()
+
+        def drain():
+            while True:
+                if receiver.recv_match(blocking=True, timeout=0.1) is not None:
+                    received[0] += 1
+                elif done.is_set():
+                    break
+
+        listener = threading.Thread(target=drain, daemon=True)
+        listener.start()
+        start_wall = time.perf_counter()
+        for index, velocity in enumerate(setpoints):
+            if strategy == 'coalesced' and not coalescer.should_send('velocity', velocity, now=index * period):
+                continue
+            start = time.perf_counter()
+            if strategy == 'encode':
+                msg = sender.mav.set_position_target_local_ned_encode(
+                    0, 0, 0, frame, VELOCITY_MASK, 0, 0, 0, *velocity, 0, 0, 0, 0, 0)
+            else:
+                msg = templates.local_ned(frame, VELOCITY_MASK)
+                msg.vx, msg.vy, msg.vz = velocity
+            encoded = time.perf_counter()
+            sender.mav.send(msg)
+            sent = time.perf_counter()
+            encode_times.append((encoded - start) * 1e6)
+            send_times.append((sent - encoded) * 1e6)
+        elapsed = time.perf_counter() - start_wall
+        done.set()
+        listener.join(timeout=5.0)
+        return {
+            'setpoints': len(setpoints),
+            'sent': len(send_times),
+            'received': received[0],
+            'coalesced': coalescer.coalesced,
+            'messages_per_second': round(len(send_times) / elapsed, 1) if elapsed > 0 else 0.0,
+            'encode': summarize_timings(encode_times, 'us'),
+            'send': summarize_timings(send_times, 'us'),
+            # Link messages per second when streaming at the control rate
+            'link_rate_hz': round(len(send_times) / (len(setpoints) * period), 2),
+        }
+
+    report = {'endpoint': f"{args.host}:{args.port}", 'control_rate_hz': args.rate, 'hold': args.hold, 'strategies': {}}
+    for strategy in ('encode', 'template', 'coalesced'):
+        report['strategies'][strategy] = run(strategy)
+
+    print(f"\n{'strategy':<11}{'sent':>7}{'recv':>7}{'msg/s':>10}{'encode us':>11}{'send us':>9}{'link Hz':>9}")
+    for strategy, entry in report['strategies'].items():
+        print(f"{strategy:<11}{entry['sent']:>7}{entry['received']:>7}{entry['messages_per_second']:>10.0f}"
+              f"{entry['encode']['mean_us']:>11.2f}{entry['send']['mean_us']:>9.2f}{entry['link_rate_hz']:>9.2f}")
+    return report
+
+
+def main():
+    """Command line entry point for the pipeline benchmarks. Returns the exit status."""
+    parser = argparse.ArgumentParser(description="Benchmarks for the gesture-controlled drone pipeline.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    resolution = subparsers.add_parser('resolution', help="Latency/accuracy tradeoff of detector inference resolution.")
+    resolution.add_argument('--video', default=config.VIDEO_CAPTURE_DEVICE, help="Video file or camera index.")
+    resolution.add_argument('--heights', type=int, nargs='+', default=[480, 360, 240])
+    resolution.add_argument('--frames', type=int, default=300)
+    resolution.add_argument('--output', help="Write the report as JSON to this path.")
+    resolution.set_defaults(func=benchmark_resolution)
+
+    mavlink = subparsers.add_parser('mavlink', help="Setpoint encoding/sending cost against a local MAVLink UDP endpoint.")
+    mavlink.add_argument('--host', default='127.0.0.1')
+    mavlink.add_argument('--port', type=int, default=14560)
+    mavlink.add_argument('--count', type=int, default=5000, help="Number of setpoints to stream.")
+    mavlink.add_argument('--rate', type=float, default=config.PALM_CONTROL_RATE, help="Simulated control rate in Hz.")
+    mavlink.add_argument('--hold', type=int, default=10, help="Setpoints between velocity changes.")
+    mavlink.add_argument('--output', help="Write the report as JSON to this path.")
+    mavlink.set_defaults(func=benchmark_mavlink)
+
+    cache = subparsers.add_parser('cache', help="Parity, hit rate and saved time of the classification cache on recorded clips.")
+    cache.add_argument('--video', nargs='+', default=[config.VIDEO_CAPTURE_DEVICE], help="Recorded video files (or a camera index).")
+    cache.add_argument('--kind', choices=('hand', 'body'), default='hand')
+    cache.add_argument('--steps', type=float, nargs='+', default=sorted({0.01, 0.02, config.CLASSIFICATION_CACHE_STEP}),
+                       help="Quantization steps to check; the command fails if any changes a confirmed gesture.")
+    cache.add_argument('--size', type=int, default=config.CLASSIFICATION_CACHE_SIZE, help="LRU entries.")
+    cache.add_argument('--frames', type=int, default=1000, help="Maximum frames per clip.")
+    cache.add_argument('--output', help="Write the report as JSON to this path.")
+    cache.set_defaults(func=benchmark_cache)
+
+    profiles = subparsers.add_parser('profiles', help="FPS, latency and CPU usage of each performance profile.")
+    profiles.add_argument('--video', default=config.VIDEO_CAPTURE_DEVICE, help="Video file or camera index.")
+    profiles.add_argument('--profiles', nargs='+', choices=list(config.PERFORMANCE_PROFILES),
+                          help="Profiles to run (all by default).")
+    profiles.add_argument('--mode', choices=('hand', 'body'), default='hand', help="Gesture mode to run.")
+    profiles.add_argument('--frames', type=int, default=300)
+    profiles.add_argument('--output', default=config.PROFILE_BENCHMARK_PATH,
+                          help="Write the report as JSON to this path (read back by main.py to log each profile's numbers).")
+    profiles.set_defaults(func=benchmark_profiles)
+
+    preroll = subparsers.add_parser('preroll', help="CPU overhead and memory of the pre-roll buffer while not recording.")
+    preroll.add_argument('--video', default=config.VIDEO_CAPTURE_DEVICE, help="Video file or camera index.")
+    preroll.add_argument('--qualities', type=int, nargs='+', default=sorted({50, config.PREROLL_JPEG_QUALITY, 90}))
+    preroll.add_argument('--fps', type=float, default=config.VIDEO_FPS, help="Rate frames are offered at.")
+    preroll.add_argument('--frames', type=int, default=250)
+    preroll.add_argument('--output', help="Write the report as JSON to this path.")
+    preroll.set_defaults(func=benchmark_preroll)
+
+    args = parser.parse_args()
+    report = args.func(args)
+    if report is not None and args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Wrote benchmark report to {args.output}")
+    return 0 if report is not None and not report.get('failures') else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,9 @@ DRONEKIT_BAUD = 57600
 
 # Gesture recognition settings
 GESTURE_SWITCH_DISTANCE = 200  # Distance in cm to switch between hand and body gestures
+GESTURE_SWITCH_HYSTERESIS = 20 # cm band on each side of the switch distance before the mode changes
+GESTURE_SWITCH_MIN_DWELL = 1.0 # seconds to stay in a mode before it may switch again
+GESTURE_SWITCH_MIN_CONFIDENCE = 0.5 # minimum distance confidence required to switch modes
 
 # Gesture types
 GESTURE_TYPES = {
@@ -38,40 +41,155 @@ GESTURES = {
     14: 'palm',
     15: 'no_class',
 }
+# Camera gestures; they leave follow and palm control and running macro missions in place
+MEDIA_GESTURES = ('photo', 'video', 'video_pause')
 
 # Model/data paths for detectors.py
 BODY_MODEL_PATH = 'model/body_detection/body_detection_model.tflite'
 HAND_MODEL_PATH = 'model/hand_detection/hand_detection_model.tflite'
 BODY_LABELS_PATH = 'model/body_detection/body_gesture_labels.csv'
 HAND_LABELS_PATH = 'model/hand_detection/hand_gesture_labels.csv'
+HAND_INPUT_SIZE = 21 * 2 # x, y of the 21 hand landmarks
+BODY_INPUT_SIZE = 6 * 2 # x, y of the 6 arm landmarks
+
+# Temporal (sequence) gesture classifier over a sliding window of landmark vectors
+TEMPORAL_CLASSIFIER_ENABLED = False # requires models trained with `train.py --temporal`
+TEMPORAL_WINDOW = 16 # frames per window
+TEMPORAL_KERNEL_SIZE = 3 # frames per Conv1D kernel
+TEMPORAL_FILTERS = 32 # Conv1D channels
+TEMPORAL_TRAIN_STRIDE = 2 # frames between training windows cut from the keypoint CSV
+TEMPORAL_CONFIRM_FRAMES = 5 # consecutive frames needed to confirm a temporal model decision
+HAND_TEMPORAL_MODEL_PATH = 'model/hand_detection/hand_temporal_model.npz'
+BODY_TEMPORAL_MODEL_PATH = 'model/body_detection/body_temporal_model.npz'
+HAND_TEMPORAL_TFLITE_PATH = 'model/hand_detection/hand_temporal_model.tflite'
+BODY_TEMPORAL_TFLITE_PATH = 'model/body_detection/body_temporal_model.tflite'
+
+# Model registry (hot reload) settings
+MODEL_REGISTRY_POLL_INTERVAL = 2.0 # seconds between checks of the model/label files for new versions
+MODEL_REGISTRY_HISTORY = 3 # previous versions kept for rollback
+
+# Training settings for train.py
+RANDOM_SEED = 42
+NUM_CLASSES = 16 # gesture ids start from 1, index 0 is unused
+TRAIN_SPLIT = 0.8
+TRAIN_EPOCHS = 75
+TRAIN_BATCH_SIZE = 128
+TRAIN_EARLY_STOPPING_PATIENCE = 20
+TRAIN_LATENCY_SAMPLES = 500 # single-sample inferences timed per exported variant
+HAND_DATASET_PATH = 'model/hand_detection/keypoint.csv'
+BODY_DATASET_PATH = 'model/body_detection/body_keypoints.csv'
+HAND_KERAS_MODEL_PATH = 'model/hand_detection/hand_detection_model.keras'
+BODY_KERAS_MODEL_PATH = 'model/body_detection/body_detection_model.keras'
+HAND_FLOAT32_MODEL_PATH = 'model/hand_detection/hand_detection_model_float32.tflite'
+BODY_FLOAT32_MODEL_PATH = 'model/body_detection/body_detection_model_float32.tflite'
+HAND_INT8_MODEL_PATH = 'model/hand_detection/hand_detection_model_int8.tflite'
+BODY_INT8_MODEL_PATH = 'model/body_detection/body_detection_model_int8.tflite'
+HAND_NUMPY_MODEL_PATH = 'model/hand_detection/hand_detection_model.npz'
+BODY_NUMPY_MODEL_PATH = 'model/body_detection/body_detection_model.npz'
+HAND_TRAINING_REPORT_PATH = 'model/hand_detection/training_report.json'
+BODY_TRAINING_REPORT_PATH = 'model/body_detection/training_report.json'
 
 # Default values for drone movement and actions
 DEFAULT_MOVE_DISTANCE = 1 # meters
 DEFAULT_TAKEOFF_ALTITUDE = 2 # meters
 DEFAULT_SPEED = 1 # meters/second
 
+# Gesture macros, flown as autopilot missions. Steps (offsets in metres from where the macro is triggered):
+#   ('waypoint', north, east, up[, hold seconds]), ('hold', seconds), ('yaw', degrees[, relative]),
+#   ('speed', m/s), ('roi', north, east, up), ('land',), ('rtl',)
+MACROS = {
+    'survey_square': (
+        ('speed', 2),
+        ('waypoint', 10, 0, 0),
+        ('waypoint', 10, 10, 0),
+        ('waypoint', 0, 10, 0),
+        ('waypoint', 0, 0, 0),
+    ),
+    'rise_and_return': (
+        ('waypoint', 0, 0, 5, 3),
+        ('waypoint', 0, 0, 0),
+    ),
+}
+GESTURE_MACROS = {} # gesture name -> macro name, e.g. {'further': 'survey_square'}
+MISSION_UPLOAD_TIMEOUT = 10 # seconds to wait for the autopilot to acknowledge a mission upload
+MISSION_MODE_TIMEOUT = 3 # seconds to wait for the switch to AUTO
+
 # Known values for distance estimation
 KNOWN_FACE_WIDTH = 17.2  # centimeter
 FOCAL_LENGTH = 453.49  # calculated from reference image 
+FOCAL_LENGTH_REFERENCE_WIDTH = 640  # frame width in pixels the focal length was calibrated at
+KNOWN_SHOULDER_WIDTH = 38.0  # centimeter, average adult shoulder width
+
+# Distance filtering
+DISTANCE_FACE_REL_STD = 0.08 # relative standard deviation of a face-box distance measurement
+DISTANCE_SHOULDER_REL_STD = 0.2 # relative standard deviation of a shoulder-width distance measurement
+DISTANCE_ACCEL_STD = 50.0 # cm/s^2, process noise of the constant-velocity model
+DISTANCE_GATE = 4.0 # measurements further than this many standard deviations are rejected as outliers
+DISTANCE_MAX_REL_STD = 0.5 # relative standard deviation at which distance confidence reaches 0
 
 # Detection thresholds
 DEFAULT_MIN_DETECTION_CONFIDENCE = 0.5 # Minimum confidence for detection
 DEFAULT_MIN_TRACKING_CONFIDENCE = 0.5 # Minimum confidence for tracking
 GESTURE_ACCURACY_THRESHOLD = 0.75 # Minimum accuracy for gesture recognition
 
+# Warm standby of the inactive hand/pose graph
+STANDBY_INTERVAL_FRAMES = 15 # run the inactive graph every N frames (0 disables warm standby)
+STANDBY_PREWARM_INTERVAL_FRAMES = 2 # run it every N frames while the distance is near the switch distance
+STANDBY_PREWARM_BAND = 40 # cm around GESTURE_SWITCH_DISTANCE where the inactive graph is pre-warmed
+STANDBY_SCALE = 0.5 # downscale factor of the frames fed to the inactive graph
+
+# Landmark temporal filtering (between MediaPipe output and pre-processing)
+LANDMARK_FILTER = 'one_euro' # 'one_euro' or None to classify raw per-frame landmarks
+LANDMARK_FILTER_MIN_CUTOFF = 1.0 # Hz, lower values smooth more when the hand is still
+LANDMARK_FILTER_BETA = 0.01 # speed coefficient, higher values reduce lag on fast motion
+LANDMARK_FILTER_D_CUTOFF = 1.0 # Hz, cutoff for the velocity estimate
+LANDMARK_MAX_PREDICTED_FRAMES = 3 # frames to predict landmarks through a detection dropout
+LANDMARK_MAX_GAP_SECONDS = 0.25 # restart the filter after a longer gap between frames instead of extrapolating across it
+
 
 
 # Default video capture device
 VIDEO_CAPTURE_DEVICE = 0
 
+# Camera capture settings
+CAPTURE_FORMATS = ('MJPG', 'YUYV') # pixel formats requested from the camera, in order of preference
+CAPTURE_BUFFER_SIZE = 1 # driver-side frame buffer, kept minimal so frames are not stale
+CAPTURE_AGE_HISTORY = 100 # frames over which driver-to-consumer frame age is reported
+
 # Default video settings
 VIDEO_CODEC = 'XVID'
 VIDEO_FPS = 25.0
-VIDEO_SIZE = (640, 480)
+VIDEO_SIZE = (640, 480) # requested camera resolution; recordings use the negotiated size
+
+# Inference resolution per detector (frame height in pixels, None for the native capture height).
+# Detections are mapped back to the full-resolution frame for drawing, recording and distance estimation.
+INFERENCE_HEIGHTS = {
+    'face': 480,
+    'hands': 480,
+    'pose': 480,
+}
+
+# Annotation overlay sinks; detection itself never draws on the frame
+OVERLAY_DISPLAY = True # render annotations for the GUI video feed
+OVERLAY_RECORD = False # record annotated video instead of the raw camera frames
 
 # Video and photo output directory
 OUTPUT_DIR = 'drone_media'
 
+# Photos are taken from a ring of the most recent raw camera frames
+PHOTO_RING_SECONDS = 2.0 # seconds of frames kept; bounds how far before the trigger a photo can be taken
+PHOTO_OFFSET = 1.5 # seconds from the photo gesture's confirmation to the photo (negative: before it)
+PHOTO_OFFSET_LIMIT = 5.0 # longest offset after the trigger a request may ask for
+PHOTO_BURST = 5 # consecutive frames taken per photo
+PHOTO_SELECT_SHARPEST = True # save only the sharpest frame of a burst instead of all of them
+PHOTO_JPEG_QUALITY = 95
+
+# Pre-roll: the seconds before a recording starts (or an emergency) are kept as JPEG frames in memory
+PREROLL_SECONDS = 5.0 # 0 disables the pre-roll buffer
+PREROLL_MAX_BYTES = 32 * 1024 * 1024 # memory cap; the oldest frames are dropped first
+PREROLL_JPEG_QUALITY = 75
+RECORDER_QUEUE_SIZE = 64 # live frames queued for the video writer thread before new ones are dropped (the pre-roll is not counted)
+
 # GUI colors
 COLOR_PRIMARY = "#8d2ac9"
 COLOR_TEXT = "white"
@@ -85,3 +203,179 @@ GUI_FRAME_HEIGHT = 720  # Height of the GUI frame
 
 
 
+
+# Instrumentation: hot-path timers and the local metrics endpoint
+METRICS_ENABLED = True
+METRICS_PREFIX = 'gesture_drone_'
+METRICS_HTTP_HOST = '127.0.0.1'
+METRICS_HTTP_PORT = 9100  # 0 disables the endpoint
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples of the sampling profiler
+DEBUG_PANEL_KEY = '<F1>'  # toggles the GUI metrics panel
+PROFILE_KEY = '<F2>'  # starts/stops the sampling profiler; the report is written to OUTPUT_DIR
+
+# Rolling frame rate and latency statistics
+STATS_WINDOW = 2.0  # seconds of history behind the FPS/latency statistics
+STATS_EWMA_ALPHA = 0.1  # smoothing factor of the exponentially weighted moving averages
+
+# Operator tracking (keeps control locked to one person among several faces)
+OPERATOR_IOU_WEIGHT = 0.5 # weight of the overlap with the predicted operator box in the match score
+OPERATOR_APPEARANCE_WEIGHT = 0.5 # weight of the torso colour histogram similarity in the match score
+OPERATOR_MATCH_THRESHOLD = 0.35 # minimum match score to accept a face as the operator
+OPERATOR_LOST_TIMEOUT = 2.0 # seconds without a match before another person can be locked
+OPERATOR_HIST_BINS = (16, 8) # hue and saturation bins of the appearance histogram
+OPERATOR_HIST_UPDATE = 0.05 # blending factor of new appearance histograms into the operator model
+OPERATOR_PATCH_SIZE = 32 # torso patches are downscaled to this size before the histogram
+
+# Follow mode
+CAMERA_HFOV = 62.0 # degrees, horizontal field of view of the camera
+FOLLOW_CONTROL_RATE = 10.0 # Hz, rate of the follow control loop
+FOLLOW_TARGET_DISTANCE = 300 # cm to keep between drone and operator
+FOLLOW_DISTANCE_DEADBAND = 30 # cm of distance error ignored
+FOLLOW_DISTANCE_GAIN = 0.005 # m/s forward speed per cm of distance error
+FOLLOW_MAX_SPEED = 1.0 # m/s
+FOLLOW_YAW_DEADBAND = 4.0 # degrees of bearing error ignored
+FOLLOW_YAW_GAIN = 0.6 # fraction of the bearing error commanded per yaw command
+FOLLOW_YAW_INTERVAL = 0.5 # seconds between relative yaw commands, so a turn completes before the next
+FOLLOW_TARGET_TIMEOUT = 0.5 # seconds without an operator observation before holding position
+
+# Palm mode (continuous 3D control from the palm position)
+PALM_CONTROL_RATE = 15.0 # Hz, rate of the palm control loop, independent of the camera FPS
+PALM_PID_GAINS = (0.8, 0.05, 0.1) # kp, ki, kd applied to the normalized palm offsets
+PALM_DEADBAND = 0.1 # normalized offset around the neutral palm position that is ignored
+PALM_MAX_SPEED = 0.5 # m/s per axis
+PALM_WATCHDOG_TIMEOUT = 0.3 # seconds without a hand before the velocity is zeroed
+PALM_LATENCY_BUDGET = 0.15 # seconds from camera frame to MAVLink setpoint
+PALM_LATENCY_WINDOW = 10.0 # seconds of latency history in the report
+
+# MAVLink setpoint streaming
+MAVLINK_SETPOINT_KEEPALIVE = 0.5 # seconds; identical streamed setpoints are not re-sent more often than this
+
+# Vehicle connection management
+CONNECTION_HEARTBEAT_TIMEOUT = 30 # seconds dronekit.connect waits for the first heartbeat
+CONNECTION_STALE_TIMEOUT = 3.0 # seconds without a heartbeat before the link is stale and commands fail fast
+CONNECTION_RECONNECT_TIMEOUT = 10.0 # seconds without a heartbeat before reconnecting
+CONNECTION_RETRY_INITIAL = 1.0 # seconds before the first reconnection retry, doubled after each failure
+CONNECTION_RETRY_MAX = 30.0 # maximum seconds between reconnection retries
+CONNECTION_CHECK_INTERVAL = 0.5 # seconds between link health checks
+CONNECTION_LOSS_WINDOW = 10.0 # seconds of history behind the packet loss estimate
+
+# Asyncio runtime
+RUNTIME_EXECUTORS = {'vision': 1, 'io': 2} # worker threads per executor; 'vision' must stay single-threaded
+RUNTIME_MAX_PENDING = 4 # calls queued or running per executor before callers wait
+RUNTIME_LAG_INTERVAL = 0.25 # seconds between event loop lag samples
+RUNTIME_SHUTDOWN_TIMEOUT = 5.0 # seconds to wait for tasks and the loop thread on shutdown
+
+# Performance profiles: each retunes capture, MediaPipe graphs, detector cadence, classifier backend and
+# thread counts together. Select one with `main.py --profile NAME`, or cycle them at runtime with PROFILE_CYCLE_KEY.
+PERFORMANCE_PROFILE = 'balanced' # profile used when none is given on the command line
+PERFORMANCE_PROFILES = {
+    # Onboard companion computer: small frames, lite graphs, face detection every third frame, no warm standby
+    'low_power': {
+        'video_size': (320, 240),
+        'video_fps': 15.0,
+        'min_detection_confidence': 0.5,
+        'min_tracking_confidence': 0.5,
+        'pose_model_complexity': 0,
+        'hand_model_complexity': 0,
+        'face_model_selection': 0, # short-range face model (within about 2 m)
+        'inference_heights': {'face': 240, 'hands': 240, 'pose': 240},
+        'face_interval': 3, # run face detection every N frames, tracking the distance in between
+        'standby_interval': 0, # warm standby cadence of the inactive graph (0 disables it)
+        'prewarm_interval': 0,
+        'classifier_backend': 'numpy',
+        'num_threads': 1, # OpenCV and TFLite worker threads (None for the library default)
+    },
+    # The module defaults above
+    'balanced': {
+        'video_size': VIDEO_SIZE,
+        'video_fps': VIDEO_FPS,
+        'min_detection_confidence': DEFAULT_MIN_DETECTION_CONFIDENCE,
+        'min_tracking_confidence': DEFAULT_MIN_TRACKING_CONFIDENCE,
+        'pose_model_complexity': 1,
+        'hand_model_complexity': 1,
+        'face_model_selection': 1,
+        'inference_heights': INFERENCE_HEIGHTS,
+        'face_interval': 1,
+        'standby_interval': STANDBY_INTERVAL_FRAMES,
+        'prewarm_interval': STANDBY_PREWARM_INTERVAL_FRAMES,
+        'classifier_backend': 'tflite',
+        'num_threads': None,
+    },
+    # Ground-station laptop: HD capture, heavy pose graph, native-resolution inference
+    'accuracy': {
+        'video_size': (1280, 720),
+        'video_fps': 30.0,
+        'min_detection_confidence': 0.6,
+        'min_tracking_confidence': 0.6,
+        'pose_model_complexity': 2,
+        'hand_model_complexity': 1,
+        'face_model_selection': 1,
+        'inference_heights': {'face': None, 'hands': None, 'pose': None},
+        'face_interval': 1,
+        'standby_interval': 5,
+        'prewarm_interval': 1,
+        'classifier_backend': 'float32',
+        'num_threads': None,
+    },
+}
+# Classifier files per backend name (hand, body); a backend whose files are missing keeps the current models
+CLASSIFIER_BACKENDS = {
+    'tflite': (HAND_MODEL_PATH, BODY_MODEL_PATH),
+    'float32': (HAND_FLOAT32_MODEL_PATH, BODY_FLOAT32_MODEL_PATH),
+    'int8': (HAND_INT8_MODEL_PATH, BODY_INT8_MODEL_PATH),
+    'numpy': (HAND_NUMPY_MODEL_PATH, BODY_NUMPY_MODEL_PATH),
+}
+PROFILE_CYCLE_KEY = '<F3>' # switches to the next performance profile
+PROFILE_BENCHMARK_PATH = 'performance_profiles.json' # measurements written by `benchmark.py profiles`
+
+# Network streaming of the annotated feed and the status values to remote viewers
+STREAM_HTTP_HOST = '127.0.0.1' # set to '0.0.0.0' to let an observer on another machine connect (the feed is unauthenticated)
+STREAM_HTTP_PORT = 8080 # None disables streaming, 0 binds an ephemeral port
+STREAM_MAX_FPS = 15.0 # encoder and per-client frame rate limit; clients may ask for less with ?fps=
+STREAM_QUALITY_LEVELS = ((1.0, 80), (1.0, 60), (0.75, 50), (0.5, 40)) # (scale, JPEG quality), best first
+STREAM_SLOW_SEND_RATIO = 1.0 # a send taking longer than this fraction of the frame interval is falling behind
+STREAM_FAST_SEND_RATIO = 0.25 # a send faster than this fraction of the frame interval has headroom
+STREAM_DOWNGRADE_AFTER = 3 # consecutive slow sends before a client drops to the next quality level
+STREAM_UPGRADE_AFTER = 30 # consecutive fast sends before a client moves back up a level
+STREAM_CLIENT_TIMEOUT = 5.0 # seconds a blocked send may take before the client is dropped
+
+# Classification cache for near-static landmarks
+CLASSIFICATION_CACHE_SIZE = 256 # LRU entries (0 disables the cache)
+CLASSIFICATION_CACHE_STEP = 0.05 # quantization step of the normalized landmark vector used as the cache key
+
+# Motion gate: reuse the previous detections while nothing moves around the operator
+MOTION_GATE_ENABLED = True
+MOTION_GATE_WIDTH = 160 # width in pixels of the grayscale image frames are compared at
+MOTION_GATE_PIXEL_THRESHOLD = 12 # gray levels a pixel must change by to count as changed
+MOTION_GATE_CHANGED_FRACTION = 0.01 # fraction of changed pixels in the operator region that triggers detection
+MOTION_GATE_MAX_INTERVAL = 0.2 # seconds; detection is forced at least this often, bounding the delay of a new gesture
+
+# Load governor: steps through degradation levels to hold the frame rate under CPU/thermal pressure
+GOVERNOR_ENABLED = True
+GOVERNOR_INTERVAL = 1.0 # seconds between load checks
+GOVERNOR_TARGET_FPS_RATIO = 0.9 # processing frame rate to hold, as a fraction of the camera frame rate
+GOVERNOR_MAX_LATENCY = 0.15 # seconds of p95 capture-to-result latency before degrading
+GOVERNOR_MAX_CPU = 90.0 # system CPU utilization (%) before degrading
+GOVERNOR_MAX_TEMPERATURE = 75.0 # hottest thermal zone (deg C) before degrading
+GOVERNOR_RECOVER_LATENCY = 0.1 # the limits below must all hold before stepping back up
+GOVERNOR_RECOVER_CPU = 70.0
+GOVERNOR_RECOVER_TEMPERATURE = 65.0
+GOVERNOR_DEGRADE_AFTER = 3 # consecutive checks under pressure before stepping down a level
+GOVERNOR_RECOVER_AFTER = 10 # consecutive checks with headroom before stepping up (doubled after a bounce, up to 8x)
+GOVERNOR_THERMAL_ZONES = '/sys/class/thermal/thermal_zone*/temp' # millidegrees C; ignored where absent
+# Degradation levels applied on top of the active performance profile; each only ever makes it lighter
+GOVERNOR_LEVELS = (
+    {},
+    {'max_inference_height': 360},
+    {'max_inference_height': 360, 'face_interval': 2, 'standby_interval': 0},
+    {'max_inference_height': 240, 'face_interval': 3, 'standby_interval': 0,
+     'pose_model_complexity': 0, 'hand_model_complexity': 0},
+)
+
+# Labeled-video evaluation (evaluate.py), the acceptance test for models and thresholds
+EVALUATION_MANIFEST_PATH = 'evaluation/clips.json' # labeled clips: video, gesture kind and gesture segments
+EVALUATION_REPORT_PATH = 'evaluation_report.json'
+EVALUATION_CONFIRM_TOLERANCE = 1.0 # seconds after a labeled segment ends that a confirmation still counts for it
+EVALUATION_MIN_RECALL = 0.9 # fraction of labeled gestures that must be confirmed as the right class
+EVALUATION_MAX_FALSE_PER_HOUR = 2.0 # wrong or unlabeled confirmations allowed per hour of video
+EVALUATION_MAX_CONFIRM_P95 = 2.0 # seconds, p95 time from gesture start to confirmation
@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import cv2
+import config
+
+logging.basicConfig(level=logging.INFO)
+
+NO_GESTURE = 0
+# Matrix rows/columns: 0 for no gesture, then the gesture ids of config.GESTURES
+CLASS_IDS = [NO_GESTURE] + sorted(config.GESTURES)
+
+
+def class_name(class_id):
+    return config.GESTURES.get(class_id, 'none')
+
+
+def load_manifest(path):
+    """
+    Read an evaluation manifest:
+        {"clips": [{"video": "clips/up_01.mp4", "kind": "hand", "segments": [[1.2, 3.0, "up"], ...]}, ...]}
+    Segments are [start, end, gesture name] in seconds of video time while the gesture is shown; the rest of a
+    clip is labeled as no gesture. Video paths are relative to the manifest.
+    """
+    gesture_ids = {name: class_id for class_id, name in config.GESTURES.items()}
+    with open(path) as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    clips = []
+    for entry in manifest['clips']:
+        if entry.get('kind') not in ('hand', 'body'):
+            raise ValueError(f"{entry['video']}: kind must be 'hand' or 'body'")
+        segments = []
+        for start, end, name in entry.get('segments', []):
+            if name not in gesture_ids:
+                raise ValueError(f"{entry['video']}: unknown gesture {name!r}")
+            if end <= start:
+                raise ValueError(f"{entry['video']}: segment {name} ends before it starts")
+            segments.append((float(start), float(end), gesture_ids[name]))
+        clips.append({'video': os.path.join(base, entry['video']), 'kind': entry['kind'], 'segments': sorted(segments)})
+    return clips
+
+
+def label_at(segments, timestamp):
+    """Gesture id labeled at timestamp, NO_GESTURE outside the segments."""
+    for start, end, class_id in segments:
+        if start <= timestamp < end:
+            return class_id
+    return NO_GESTURE
+
+
+def run_clip(clip, profile_name=None, threshold=None):
+    """
+    Process-pool worker: replay a clip through Detectors and the gesture debouncer at its frame rate, as
+    image_processing does for the active gesture mode. Times are video time, i.e. assuming frames are
+    processed in real time; the detection cost per frame is reported alongside.
+    """
+    from utils.detectors import Detectors
+    from utils.gesture_debouncer import GestureDebouncer, required_frames
+    from utils.performance_profiles import get_profile
+
+    if threshold is not None:
+        config.GESTURE_ACCURACY_THRESHOLD = threshold
+    profile = get_profile(profile_name)
+    detector = Detectors(profile.min_detection_confidence, profile.min_tracking_confidence)
+    detector.apply_profile(profile)
+    detector.model_registry.commit_pending()
+    detect = detector.detect_hand_gesture if clip['kind'] == 'hand' else detector.detect_body_gesture
+
+    cap = cv2.VideoCapture(clip['video'])
+    fps = cap.get(cv2.CAP_PROP_FPS) or config.VIDEO_FPS
+    needed = required_frames(detector.uses_temporal(clip['kind']), fps)
+    debouncer = GestureDebouncer()
+    labels, predictions, confirmations, detect_ms = [], [], [], []
+    index = 0
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret or frame is None:
+            break
+        timestamp = index / fps
+        start = time.perf_counter()
+        gesture = detect(frame, timestamp)
+        detect_ms.append((time.perf_counter() - start) * 1000)
+        class_id = gesture.class_id if gesture is not None else None
+        confirmed = debouncer.update(class_id, needed)
+        if confirmed is not None:
+            confirmations.append((timestamp, confirmed))
+        labels.append(label_at(clip['segments'], timestamp))
+        predictions.append(class_id or NO_GESTURE)
+        index += 1
+    cap.release()
+    return {
+        'video': clip['video'],
+        'kind': clip['kind'],
+        'segments': clip['segments'],
+        'fps': fps,
+        'frames': index,
+        'duration': index / fps,
+        'labels': labels,
+        'predictions': predictions,
+        'confirmations': confirmations,
+        'detect_ms': detect_ms,
+    }
+
+
+def match_confirmations(segments, confirmations, tolerance):
+    """
+    Match confirmed gestures to labeled segments. A confirmation counts for a segment if it falls between its
+    start and tolerance seconds after its end. Returns the (labeled id, first confirmed id, time to the first
+    correct confirmation or None) of each segment, the false triggers (wrong class, or no gesture labeled) as
+    (time, id), and the number of repeated correct confirmations of a held gesture.
+    """
+    first, time_to_confirm, false_triggers, repeats = {}, {}, [], 0
+    for timestamp, class_id in confirmations:
+        index = next((i for i, (start, end, _) in enumerate(segments) if start <= timestamp <= end + tolerance), None)
+        if index is not None:
+            first.setdefault(index, class_id)
+        if index is None or class_id != segments[index][2]:
+            false_triggers.append((timestamp, class_id))
+        elif index in time_to_confirm:
+            repeats += 1
+        else:
+            time_to_confirm[index] = timestamp - segments[index][0]
+    events = [(class_id, first.get(i, NO_GESTURE), time_to_confirm.get(i)) for i, (_, _, class_id) in enumerate(segments)]
+    return events, false_triggers, repeats
+
+
+def distribution(values):
+    """Count, mean, p50, p95 and max of a list of values (None entries when empty)."""
+    if not values:
+        return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+    return {
+        'count': len(values),
+        'mean': round(float(np.mean(values)), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'max': round(float(np.max(values)), 3),
+    }
+
+
+def confusion_matrix(pairs):
+    """Matrix over CLASS_IDS counting (labeled id, predicted id) pairs; rows are labels."""
+    index = {class_id: i for i, class_id in enumerate(CLASS_IDS)}
+    matrix = np.zeros((len(CLASS_IDS), len(CLASS_IDS)), dtype=np.int64)
+    for label, prediction in pairs:
+        matrix[index[label], index[prediction]] += 1
+    return matrix
+
+
+def summarize(results, tolerance):
+    """Aggregate the per-clip results into confusion matrices, false trigger rate and time-to-confirm per class."""
+    frame_pairs, event_pairs, clips = [], [], []
+    times = {class_id: [] for class_id in config.GESTURES}
+    false_by_class = {class_id: 0 for class_id in config.GESTURES}
+    detect_ms, false_total, repeats_total, duration = [], 0, 0, 0.0
+    for result in results:
+        events, false_triggers, repeats = match_confirmations(result['segments'], result['confirmations'], tolerance)
+        frame_pairs.extend(zip(result['labels'], result['predictions']))
+        event_pairs.extend((label, confirmed) for label, confirmed, _ in events)
+        for label, _, seconds in events:
+            if seconds is not None:
+                times[label].append(seconds)
+        for _, class_id in false_triggers:
+            false_by_class[class_id] += 1
+        false_total += len(false_triggers)
+        repeats_total += repeats
+        duration += result['duration']
+        detect_ms.extend(result['detect_ms'])
+        clips.append({
+            'video': result['video'],
+            'kind': result['kind'],
+            'frames': result['frames'],
+            'duration': round(result['duration'], 2),
+            'gestures': len(events),
+            'confirmed': sum(seconds is not None for _, _, seconds in events),
+            'false_triggers': [(round(t, 2), class_name(c)) for t, c in false_triggers],
+        })
+
+    frame_matrix = confusion_matrix(frame_pairs)
+    event_matrix = confusion_matrix(event_pairs)
+    classes = {}
+    for i, class_id in enumerate(CLASS_IDS):
+        if class_id == NO_GESTURE:
+            continue
+        labeled_frames, predicted_frames = frame_matrix[i].sum(), frame_matrix[:, i].sum()
+        gestures = int(event_matrix[i].sum())
+        if not (labeled_frames or predicted_frames or false_by_class[class_id]):
+            continue
+        classes[class_name(class_id)] = {
+            'frame_recall': round(frame_matrix[i, i] / labeled_frames, 4) if labeled_frames else None,
+            'frame_precision': round(frame_matrix[i, i] / predicted_frames, 4) if predicted_frames else None,
+            'gestures': gestures,
+            'confirmed': len(times[class_id]),
+            'recall': round(len(times[class_id]) / gestures, 4) if gestures else None,
+            'false_triggers': false_by_class[class_id],
+            'time_to_confirm': distribution(times[class_id]),
+        }
+
+    gestures = int(event_matrix[1:].sum())
+    confirmed = sum(len(values) for values in times.values())
+    hours = duration / 3600.0
+    all_times = [t for values in times.values() for t in values]
+    return {
+        'clips': clips,
+        'duration_seconds': round(duration, 1),
+        'gestures': gestures,
+        'recall': round(confirmed / gestures, 4) if gestures else None,
+        'false_triggers': false_total,
+        'false_triggers_per_hour': round(false_total / hours, 2) if hours > 0 else None,
+        'repeats': repeats_total,
+        'time_to_confirm': distribution(all_times),
+        'detect_ms': distribution(detect_ms),
+        'classes': classes,
+        'labels': [class_name(class_id) for class_id in CLASS_IDS],
+        'frame_confusion': frame_matrix.tolist(),
+        'event_confusion': event_matrix.tolist(),
+    }
+
+
+def check_acceptance(report, min_recall, max_false_per_hour, max_confirm_p95):
+    """Return the failed acceptance criteria of a report as readable strings."""
+    failures = []
+    if report['recall'] is not None and report['recall'] < min_recall:
+        failures.append(f"recall {report['recall']:.3f} below {min_recall}")
+    if report['false_triggers_per_hour'] is not None and report['false_triggers_per_hour'] > max_false_per_hour:
+        failures.append(f"{report['false_triggers_per_hour']:.2f} false triggers per hour above {max_false_per_hour}")
+    p95 = report['time_to_confirm']['p95']
+    if p95 is not None and p95 > max_confirm_p95:
+        failures.append(f"time-to-confirm p95 {p95:.2f}s above {max_confirm_p95}s")
+    return failures
+
+
+def print_matrix(title, labels, matrix):
+    """Print the rows and columns of a confusion matrix that have any counts."""
+    matrix = np.asarray(matrix)
+    used = [i for i in range(len(labels)) if matrix[i].sum() or matrix[:, i].sum()]
+    print(f"\n{title} (rows labeled, columns predicted)")
+    print(f"{'':<12}" + "".join(f"{labels[i][:9]:>10}" for i in used))
+    for i in used:
+        print(f"{labels[i][:12]:<12}" + "".join(f"{matrix[i, j]:>10}" for j in used))
+
+
+def print_report(report):
+    print_matrix("Frame confusion", report['labels'], report['frame_confusion'])
+    print_matrix("Gesture confusion, first confirmation per labeled gesture (none = missed)",
+                 report['labels'], report['event_confusion'])
+    print(f"\n{'class':<12}{'frame rec':>10}{'gestures':>9}{'recall':>8}{'false':>7}{'ttc mean':>9}{'ttc p95':>9}")
+    for name, entry in report['classes'].items():
+        ttc = entry['time_to_confirm']
+        frame_recall = f"{entry['frame_recall']:.3f}" if entry['frame_recall'] is not None else '-'
+        recall = f"{entry['recall']:.3f}" if entry['recall'] is not None else '-'
+        mean = f"{ttc['mean']:.2f}" if ttc['mean'] is not None else '-'
+        p95 = f"{ttc['p95']:.2f}" if ttc['p95'] is not None else '-'
+        print(f"{name:<12}{frame_recall:>10}{entry['gestures']:>9}{recall:>8}{entry['false_triggers']:>7}{mean:>9}{p95:>9}")
+    print(f"\n{len(report['clips'])} clips, {report['duration_seconds'] / 60:.1f} min: recall {report['recall']}, "
+          f"{report['false_triggers']} false triggers ({report['false_triggers_per_hour']}/h), "
+          f"{report['repeats']} repeats, detection {report['detect_ms']['mean']} ms/frame")
+
+
+def main():
+    """Command line entry point: evaluate the detectors and gesture confirmation on labeled clips."""
+    parser = argparse.ArgumentParser(description="Accuracy and latency per gesture class on labeled video clips.")
+    parser.add_argument('--manifest', default=config.EVALUATION_MANIFEST_PATH, help="Evaluation manifest (JSON).")
+    parser.add_argument('--profile', choices=list(config.PERFORMANCE_PROFILES), default=config.PERFORMANCE_PROFILE,
+                        help="Performance profile (graphs, confidences, classifier backend) to evaluate.")
+    parser.add_argument('--threshold', type=float, default=config.GESTURE_ACCURACY_THRESHOLD,
+                        help="Classifier accuracy threshold.")
+    parser.add_argument('--tolerance', type=float, default=config.EVALUATION_CONFIRM_TOLERANCE,
+                        help="Seconds after a gesture ends that a confirmation still counts for it.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Clips evaluated in parallel.")
+    parser.add_argument('--min-recall', type=float, default=config.EVALUATION_MIN_RECALL)
+    parser.add_argument('--max-false-per-hour', type=float, default=config.EVALUATION_MAX_FALSE_PER_HOUR)
+    parser.add_argument('--max-confirm-p95', type=float, default=config.EVALUATION_MAX_CONFIRM_P95)
+    parser.add_argument('--output', default=config.EVALUATION_REPORT_PATH, help="Write the report as JSON to this path.")
+    args = parser.parse_args()
+
+    clips = load_manifest(args.manifest)
+    if not clips:
+        logging.error(f"No clips in {args.manifest}")
+        return 1
+    # MediaPipe and TFLite are loaded in the workers only; each clip gets fresh graphs and tracking state
+    workers = max(1, min(args.workers, len(clips)))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_clip, clips, [args.profile] * len(clips), [args.threshold] * len(clips)))
+    logging.info(f"Evaluated {len(clips)} clips on {workers} workers in {time.perf_counter() - start:.1f}s")
+
+    report = summarize(results, args.tolerance)
+    report.update({'manifest': args.manifest, 'profile': args.profile, 'threshold': args.threshold})
+    failures = check_acceptance(report, args.min_recall, args.max_false_per_hour, args.max_confirm_p95)
+    report['passed'] = not failures
+    report['failures'] = failures
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Wrote evaluation report to {args.output}")
+    for failure in failures:
+        logging.error(f"Acceptance failed: {failure}")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
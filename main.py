@@ -1,27 +1,50 @@
-import threading
+import argparse
 from utils.image_processing import ImageProcessingController
 from utils.gui import GUI
+from utils.metrics import metrics, start_metrics_server
+from utils.performance_profiles import profile_names
+from utils.runtime import AsyncRuntime
+from utils.stream_server import start_stream_server, stop_stream_server
+import config
 
 
 def main():
     """Main entry point for the gesture-controlled drone application.
     This script initializes the image processing controller and starts the GUI application."""
 
+    parser = argparse.ArgumentParser(description="Gesture-controlled drone.")
+    parser.add_argument('--profile', choices=profile_names(), default=config.PERFORMANCE_PROFILE,
+                        help=f"Performance profile to start with (switch at runtime with {config.PROFILE_CYCLE_KEY}).")
+    args = parser.parse_args()
+
     # Create the controller object that holds all state and logic
-    controller = ImageProcessingController()
+    controller = ImageProcessingController(profile=args.profile)
+
+    # Serve hot-path metrics and the profiling toggle on the local HTTP endpoint
+    start_metrics_server(metrics)
 
-    # create threads for image processing and control loop
-    im_pro = threading.Thread(target=controller.image_processing)
-    control_loop = threading.Thread(target=controller.control_loop)
+    # Serve the annotated feed and the status values to remote viewers
+    stream_server = start_stream_server(controller.get_status)
+    if stream_server is not None:
+        controller.stream = stream_server.stream
 
-    # Start the threads
-    im_pro.start()
-    control_loop.start()
+    # Image processing and gesture dispatch run as tasks on the asyncio runtime
+    runtime = AsyncRuntime().start()
+    runtime.submit(controller.run_image_processing(runtime))
+    runtime.submit(controller.run_control(runtime))
+    if config.GOVERNOR_ENABLED:
+        runtime.submit(controller.governor.run())
 
-    # Start the GUI application
+    # Start the GUI application; it returns when the window is closed or Esc is pressed
     app = GUI(controller)
-    app.run(app.update_video, app.update_status)
+    try:
+        app.run(app.update_video, app.update_status)
+    finally:
+        runtime.stop()
+        controller.shutdown()
+        if stream_server is not None:
+            stop_stream_server(stream_server)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,81 @@
+from collections import namedtuple
+import numpy as np
+import config
+from utils.classification_cache import ClassificationCache
+from utils.gesture_debouncer import gesture_decisions
+
+Prediction = namedtuple('Prediction', ['class_id', 'accuracy'])
+
+
+class CentroidModel:
+    """Deterministic stand-in for a gesture classifier: softmax over distances to one centroid per class."""
+
+    def __init__(self, centroids, version='v1'):
+        self.centroids = centroids
+        self.labels = [f'gesture_{i}' for i in range(len(centroids))]
+        self.version = version
+        self.calls = 0
+
+    def predict(self, vector):
+        self.calls += 1
+        scores = -np.linalg.norm(self.centroids - vector, axis=1) * 20
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        class_id = int(np.argmax(probabilities))
+        return Prediction(class_id, float(probabilities[class_id]))
+
+
+def held_poses(rng, centroids, frames_per_pose=60, jitter=0.003):
+    """Landmark vectors of an operator holding each pose in turn, with dropouts and moves between poses."""
+    features = []
+    for index in rng.permutation(len(centroids)):
+        features.extend(centroids[index] + rng.normal(0, jitter, centroids.shape[1]) for _ in range(frames_per_pose))
+        features.append(None)
+        start, end = centroids[index], centroids[rng.integers(len(centroids))]
+        features.extend(start + (end - start) * t + rng.normal(0, jitter, centroids.shape[1])
+                        for t in np.linspace(0, 1, 10))
+    return [None if vector is None else vector.astype(np.float32) for vector in features]
+
+
+def test_cached_decisions_match_uncached():
+    rng = np.random.default_rng(7)
+    # 21 hand landmarks normalized to [-1, 1] as (x, y) pairs
+    centroids = rng.uniform(-1, 1, (8, 42))
+    model = CentroidModel(centroids)
+    features = held_poses(rng, centroids)
+
+    def classify(predict):
+        return gesture_decisions([None if vector is None else predict(vector) for vector in features], model)
+
+    decisions, confirmed = classify(model.predict)
+    cache = ClassificationCache(max_size=config.CLASSIFICATION_CACHE_SIZE, step=config.CLASSIFICATION_CACHE_STEP)
+    cached_decisions, cached_confirmed = classify(lambda vector: cache.classify(model.version, vector, model.predict))
+
+    assert cached_decisions == decisions
+    assert cached_confirmed == confirmed
+    assert any(gesture is not None for gesture in confirmed)
+    assert cache.hits > 0
+
+
+def test_new_model_version_misses():
+    centroids = np.eye(4, dtype=np.float32)
+    model = CentroidModel(centroids)
+    cache = ClassificationCache(max_size=8, step=0.05)
+    vector = centroids[2]
+    cache.classify(model.version, vector, model.predict)
+    cache.classify(model.version, vector + 0.001, model.predict)
+    assert model.calls == 1
+    cache.classify('v2', vector, model.predict)
+    assert model.calls == 2
+
+
+def test_size_is_bounded():
+    model = CentroidModel(np.eye(4, dtype=np.float32))
+    cache = ClassificationCache(max_size=3, step=0.05)
+    for i in range(10):
+        cache.classify(model.version, np.full(4, i, dtype=np.float32), model.predict)
+    assert cache.stats()['entries'] == 3
+    # The oldest entries were evicted, the newest is still cached
+    cache.classify(model.version, np.full(4, 9, dtype=np.float32), model.predict)
+    cache.classify(model.version, np.zeros(4, dtype=np.float32), model.predict)
+    assert model.calls == 11
@@ -0,0 +1,92 @@
+import types
+from collections import namedtuple
+import pytest
+
+pytest.importorskip('dronekit')
+pytest.importorskip('pymavlink')
+
+import config
+from utils.drone_movement import Drone_Movement
+
+GESTURE_IDS = {name: gesture_id for gesture_id, name in config.GESTURES.items()}
+
+
+Mode = namedtuple('Mode', ['name'])
+
+
+class FakeVehicle:
+    """Armed vehicle in GUIDED that accepts the mission runner's listeners."""
+
+    def __init__(self):
+        self.armed = True
+        self.mode = Mode('GUIDED')
+
+    def add_message_listener(self, name, callback):
+        pass
+
+    def remove_message_listener(self, name, callback):
+        pass
+
+    def add_attribute_listener(self, name, callback):
+        pass
+
+    def remove_attribute_listener(self, name, callback):
+        pass
+
+
+class FakeDronekitFunctions:
+    """Records the setpoints the controllers send to an armed vehicle with a healthy link."""
+
+    def __init__(self):
+        self.vehicle = FakeVehicle()
+        self.connection = types.SimpleNamespace(ensure_link=lambda: None)
+        self.velocities = []
+
+    def set_ned_velocity(self, *velocity, frame=None):
+        self.velocities.append(velocity)
+
+    def condition_yaw(self, heading, relative=True, settle=0):
+        pass
+
+
+@pytest.fixture
+def movement():
+    movement = Drone_Movement(FakeDronekitFunctions())
+    yield movement
+    movement.stop_continuous_control()
+
+
+@pytest.mark.parametrize('gesture', config.MEDIA_GESTURES)
+def test_camera_gesture_keeps_follow_mode(movement, gesture):
+    assert movement.move(GESTURE_IDS['follow'])
+    assert movement.move(GESTURE_IDS[gesture])
+    assert movement.follow_controller.is_active()
+
+
+def test_control_gesture_replaces_follow_mode(movement):
+    movement.move(GESTURE_IDS['follow'])
+    assert movement.move(GESTURE_IDS['palm'])
+    assert not movement.follow_controller.is_active()
+    assert movement.palm_controller.is_active()
+
+
+def fly_mission(movement):
+    """Put the mission runner in the state start() leaves it in once the vehicle is flying the macro in AUTO."""
+    runner = movement.mission_runner
+    runner.macro = types.SimpleNamespace(name='survey_square')
+    runner.state, runner._vehicle, runner._in_auto = 'running', movement.uav, True
+    movement.uav.mode = Mode('AUTO')
+
+
+@pytest.mark.parametrize('gesture', config.MEDIA_GESTURES)
+def test_camera_gesture_keeps_mission_running(movement, gesture):
+    fly_mission(movement)
+    assert movement.move(GESTURE_IDS[gesture])
+    assert movement.mission_runner.is_active()
+    assert movement.uav.mode.name == 'AUTO'
+
+
+def test_control_gesture_aborts_mission(movement):
+    fly_mission(movement)
+    assert movement.move(GESTURE_IDS['follow'])
+    assert movement.mission_runner.state == 'aborted'
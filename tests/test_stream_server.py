@@ -0,0 +1,152 @@
+import json
+import time
+import socket
+import threading
+import urllib.request
+import numpy as np
+import cv2
+import pytest
+import config
+from utils.stream_server import BOUNDARY, start_stream_server, stop_stream_server
+
+STATUS = {'mode': 'hand', 'armed': False}
+
+
+@pytest.fixture
+def server():
+    server = start_stream_server(lambda: STATUS, host='127.0.0.1', port=0)
+    assert server is not None
+    publish_times = []
+    running = threading.Event()
+    running.set()
+    # Noise does not compress, so every frame is a large JPEG that a slow reader cannot keep up with
+    frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+    def publish():
+        while running.is_set():
+            start = time.perf_counter()
+            server.stream.publish(frame)
+            publish_times.append(time.perf_counter() - start)
+            time.sleep(1.0 / 30)
+
+    publisher = threading.Thread(target=publish, daemon=True)
+    publisher.start()
+    server.publish_times = publish_times
+    yield server
+    running.clear()
+    publisher.join(timeout=2.0)
+    stop_stream_server(server)
+
+
+@pytest.fixture
+def idle_server():
+    """A server that only gets the frames a test publishes."""
+    server = start_stream_server(lambda: STATUS, host='127.0.0.1', port=0)
+    yield server
+    stop_stream_server(server)
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def read_part(response):
+    """Read one MJPEG part and return its JPEG bytes."""
+    assert response.readline() == f'--{BOUNDARY}\r\n'.encode('ascii')
+    headers = {}
+    while True:
+        line = response.readline().decode('ascii').strip()
+        if not line:
+            break
+        name, value = line.split(':', 1)
+        headers[name.lower()] = value.strip()
+    assert headers['content-type'] == 'image/jpeg'
+    jpeg = response.read(int(headers['content-length']))
+    assert response.read(2) == b'\r\n'
+    return jpeg
+
+
+def test_disabled_without_port():
+    assert start_stream_server(lambda: STATUS, port=None) is None
+
+
+def test_status(server):
+    with urllib.request.urlopen(url(server, '/status'), timeout=5) as response:
+        assert response.headers['Content-Type'] == 'application/json'
+        assert json.loads(response.read()) == STATUS
+
+
+def test_snapshot(server):
+    with urllib.request.urlopen(url(server, '/snapshot.jpg'), timeout=5) as response:
+        assert response.headers['Content-Type'] == 'image/jpeg'
+        image = cv2.imdecode(np.frombuffer(response.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+    assert image.shape == (480, 640, 3)
+
+
+def snapshot_color(server):
+    with urllib.request.urlopen(url(server, '/snapshot.jpg'), timeout=5) as response:
+        image = cv2.imdecode(np.frombuffer(response.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+    return image.reshape(-1, 3).mean(axis=0)
+
+
+def test_snapshot_is_current_frame(idle_server):
+    blue = np.zeros((120, 160, 3), dtype=np.uint8)
+    blue[:] = (255, 0, 0)
+    red = np.zeros((120, 160, 3), dtype=np.uint8)
+    red[:] = (0, 0, 255)
+    idle_server.stream.publish(blue)
+    assert np.allclose(snapshot_color(idle_server), (255, 0, 0), atol=5)
+    idle_server.stream.publish(red)
+    assert np.allclose(snapshot_color(idle_server), (0, 0, 255), atol=5)
+
+
+def test_snapshot_without_frames(idle_server):
+    with pytest.raises(urllib.request.HTTPError) as error:
+        urllib.request.urlopen(url(idle_server, '/snapshot.jpg'), timeout=5)
+    assert error.value.code == 503
+
+
+def test_mjpeg_parts(server):
+    with urllib.request.urlopen(url(server, '/stream.mjpg?fps=10'), timeout=5) as response:
+        assert response.headers['Content-Type'] == f'multipart/x-mixed-replace; boundary={BOUNDARY}'
+        for _ in range(3):
+            image = cv2.imdecode(np.frombuffer(read_part(response), dtype=np.uint8), cv2.IMREAD_COLOR)
+            assert image.shape == (480, 640, 3)
+        assert server.stream.clients() == 1
+    assert wait_for(lambda: server.stream.clients() == 0, timeout=5)
+
+
+def test_unknown_path(server):
+    with pytest.raises(urllib.request.HTTPError) as error:
+        urllib.request.urlopen(url(server, '/missing'), timeout=5)
+    assert error.value.code == 404
+
+
+def test_throttled_client_is_downgraded(server):
+    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16 * 1024)
+    client.connect(server.server_address)
+    client.sendall(b'GET /stream.mjpg HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    try:
+        assert wait_for(lambda: server.stream.clients() == 1, timeout=5)
+        start = len(server.publish_times)
+
+        def downgraded():
+            # Read well below the rate of full-quality frames, so sends outlast the frame interval
+            client.recv(16 * 1024)
+            return any(level > 0 for level in server.stream._demand)
+
+        assert wait_for(downgraded, timeout=config.STREAM_CLIENT_TIMEOUT * 3)
+        publish_times = server.publish_times[start:]
+        assert publish_times and max(publish_times) < 0.05
+    finally:
+        client.close()
@@ -0,0 +1,348 @@
+import os
+import json
+import time
+import logging
+import argparse
+import numpy as np
+import config
+
+# Set TensorFlow logging level
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '1'
+
+import tensorflow as tf
+from sklearn.model_selection import train_test_split
+from utils.classifiers import TFLiteClassifier, NumpyClassifier
+from utils.temporal_classifier import TemporalGestureClassifier
+
+logging.basicConfig(level=logging.INFO)
+
+# Per-model settings, mirroring the hand/body classifier notebooks
+MODEL_SPECS = {
+    'hand': {
+        'num_landmarks': 21,
+        'dropout': 0.1,
+        'dataset': config.HAND_DATASET_PATH,
+        'keras': config.HAND_KERAS_MODEL_PATH,
+        'tflite': config.HAND_MODEL_PATH,
+        'float32': config.HAND_FLOAT32_MODEL_PATH,
+        'int8': config.HAND_INT8_MODEL_PATH,
+        'numpy': config.HAND_NUMPY_MODEL_PATH,
+        'report': config.HAND_TRAINING_REPORT_PATH,
+        'temporal_numpy': config.HAND_TEMPORAL_MODEL_PATH,
+        'temporal_tflite': config.HAND_TEMPORAL_TFLITE_PATH,
+    },
+    'body': {
+        'num_landmarks': 6,
+        'dropout': 0.2,
+        'dataset': config.BODY_DATASET_PATH,
+        'keras': config.BODY_KERAS_MODEL_PATH,
+        'tflite': config.BODY_MODEL_PATH,
+        'float32': config.BODY_FLOAT32_MODEL_PATH,
+        'int8': config.BODY_INT8_MODEL_PATH,
+        'numpy': config.BODY_NUMPY_MODEL_PATH,
+        'report': config.BODY_TRAINING_REPORT_PATH,
+        'temporal_numpy': config.BODY_TEMPORAL_MODEL_PATH,
+        'temporal_tflite': config.BODY_TEMPORAL_TFLITE_PATH,
+    },
+}
+
+
+def load_dataset(dataset_path, num_landmarks):
+    """Load the keypoint CSV (label, x0, y0, x1, y1, ...) written by HelperFunc.write_csv."""
+    X_dataset = np.loadtxt(dataset_path, delimiter=',', dtype='float32', usecols=list(range(1, (num_landmarks * 2) + 1)))
+    y_dataset = np.loadtxt(dataset_path, delimiter=',', dtype='int32', usecols=(0))
+    return X_dataset, y_dataset
+
+
+def build_model(input_size, dropout, num_classes):
+    """Build the gesture MLP used by the hand and body classifiers."""
+    return tf.keras.models.Sequential([
+        #input
+        tf.keras.layers.Input((input_size, ), name='gesture_recognizer_input'),
+
+        #hidden layer
+        tf.keras.layers.BatchNormalization(),
+        tf.keras.layers.Dropout(dropout),
+        tf.keras.layers.Dense(24, activation='relu'),
+
+        tf.keras.layers.BatchNormalization(),
+        tf.keras.layers.Dropout(dropout),
+        tf.keras.layers.Dense(16, activation='relu'),
+
+        #output
+        tf.keras.layers.Dense(num_classes, activation='softmax', name='gesture_recognizer_out')
+    ])
+
+
+def build_temporal_windows(X_dataset, y_dataset, window, stride):
+    """
+    Cut sliding windows from runs of consecutive rows with the same label.
+    The keypoint CSV is written in recording order, so each run is a continuous clip of one gesture.
+    """
+    windows, labels = [], []
+    run_start = 0
+    for i in range(1, len(y_dataset) + 1):
+        if i == len(y_dataset) or y_dataset[i] != y_dataset[run_start]:
+            for start in range(run_start, i - window + 1, stride):
+                windows.append(X_dataset[start:start + window])
+                labels.append(y_dataset[run_start])
+            run_start = i
+    return np.array(windows, dtype=np.float32), np.array(labels, dtype=np.int32)
+
+
+def build_temporal_model(window, input_size, dropout, num_classes):
+    """Build the temporal classifier; its structure is what TemporalGestureClassifier streams."""
+    return tf.keras.models.Sequential([
+        tf.keras.layers.Input((window, input_size), name='temporal_gesture_input'),
+        tf.keras.layers.Conv1D(config.TEMPORAL_FILTERS, config.TEMPORAL_KERNEL_SIZE, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling1D(),
+        tf.keras.layers.Dropout(dropout),
+        tf.keras.layers.Dense(num_classes, activation='softmax', name='temporal_gesture_out')
+    ])
+
+
+def export_temporal_numpy_weights(model, npz_path, window):
+    """Export the Conv1D and Dense weights of the temporal model for TemporalGestureClassifier."""
+    conv = next(layer for layer in model.layers if isinstance(layer, tf.keras.layers.Conv1D))
+    dense = next(layer for layer in model.layers if isinstance(layer, tf.keras.layers.Dense))
+    conv_W, conv_b = conv.get_weights()
+    dense_W, dense_b = dense.get_weights()
+    np.savez(npz_path, conv_W=conv_W, conv_b=conv_b, dense_W=dense_W, dense_b=dense_b, window=window)
+    logging.info(f"Exported temporal NumPy weights to {npz_path}")
+
+
+def benchmark_temporal(tflite_path, npz_path, X_test, y_test, latency_samples):
+    """
+    Compare the full-window TFLite model with the streaming NumPy classifier.
+    Streaming latency is the cost of one incremental update once the window is full.
+    """
+    tflite_classifier = TFLiteClassifier(tflite_path)
+    predictions = np.array([tflite_classifier.predict(sample)[0] for sample in X_test])
+    timings = []
+    for i in range(latency_samples):
+        start = time.perf_counter()
+        tflite_classifier.predict(X_test[i % len(X_test)])
+        timings.append((time.perf_counter() - start) * 1e6)
+
+    streaming = TemporalGestureClassifier(npz_path)
+    streaming_predictions = []
+    for sample in X_test:
+        streaming.reset()
+        for vector in sample:
+            prediction = streaming.update(vector)
+        streaming_predictions.append(prediction.class_id)
+    streaming_timings = []
+    for i in range(latency_samples):
+        vector = X_test[i % len(X_test)][-1]
+        start = time.perf_counter()
+        streaming.update(vector)
+        streaming_timings.append((time.perf_counter() - start) * 1e6)
+
+    return {
+        'tflite_full_window': {
+            'path': tflite_path,
+            'accuracy': round(float(np.mean(predictions == y_test)), 4),
+            'latency_mean_us': round(float(np.mean(timings)), 1),
+            'latency_p95_us': round(float(np.percentile(timings, 95)), 1),
+        },
+        'numpy_streaming': {
+            'path': npz_path,
+            'accuracy': round(float(np.mean(np.array(streaming_predictions) == y_test)), 4),
+            'latency_mean_us': round(float(np.mean(streaming_timings)), 1),
+            'latency_p95_us': round(float(np.percentile(streaming_timings, 95)), 1),
+        },
+    }
+
+
+def train_temporal(spec, X_dataset, y_dataset, epochs, batch_size, seed, latency_samples):
+    """Train and export the temporal classifier and return its report section."""
+    window = config.TEMPORAL_WINDOW
+    X_windows, y_windows = build_temporal_windows(X_dataset, y_dataset, window, config.TEMPORAL_TRAIN_STRIDE)
+    if len(X_windows) == 0:
+        logging.warning("No gesture run is long enough for a temporal window; skipping temporal model.")
+        return None
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_windows, y_windows, train_size=config.TRAIN_SPLIT, random_state=seed, shuffle=True
+    )
+    model = build_temporal_model(window, spec['num_landmarks'] * 2, spec['dropout'], config.NUM_CLASSES)
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    es_callback = tf.keras.callbacks.EarlyStopping(patience=config.TRAIN_EARLY_STOPPING_PATIENCE, verbose=1)
+    model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size,
+              validation_data=(X_test, y_test), callbacks=[es_callback])
+
+    export_tflite(model, spec['temporal_tflite'], 'float32')
+    export_temporal_numpy_weights(model, spec['temporal_numpy'], window)
+    report = {'window': window, 'train_windows': int(len(X_train)), 'test_windows': int(len(X_test))}
+    report.update(benchmark_temporal(spec['temporal_tflite'], spec['temporal_numpy'], X_test, y_test, latency_samples))
+    return report
+
+
+def export_tflite(model, tflite_path, quantization, representative_data=None):
+    """
+    Convert the Keras model to TFLite and write it to tflite_path.
+    quantization is 'float32' (no optimization), 'dynamic' (weight-only, as in the notebooks)
+    or 'int8' (full integer post-training quantization calibrated on representative_data).
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization in ('dynamic', 'int8'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'int8':
+        def representative_dataset():
+            for sample in representative_data:
+                yield [np.array([sample], dtype=np.float32)]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    tflite_model = converter.convert()
+    with open(tflite_path, 'wb') as f:
+        f.write(tflite_model)
+    logging.info(f"Exported {quantization} TFLite model to {tflite_path}")
+
+
+def export_numpy_weights(model, npz_path):
+    """
+    Export the Dense layers as NumPy arrays for utils.classifiers.NumpyClassifier.
+    Inference-mode BatchNormalization is folded into the next Dense layer and Dropout is dropped.
+    """
+    weights, biases, activations = [], [], []
+    scale, shift = None, None
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.BatchNormalization):
+            gamma, beta, mean, var = layer.get_weights()
+            bn_scale = gamma / np.sqrt(var + layer.epsilon)
+            bn_shift = beta - mean * bn_scale
+            if scale is None:
+                scale, shift = bn_scale, bn_shift
+            else:
+                scale, shift = scale * bn_scale, shift * bn_scale + bn_shift
+        elif isinstance(layer, tf.keras.layers.Dense):
+            kernel, bias = layer.get_weights()
+            if scale is not None:
+                bias = bias + shift @ kernel
+                kernel = kernel * scale[:, np.newaxis]
+                scale, shift = None, None
+            weights.append(kernel.astype(np.float32))
+            biases.append(bias.astype(np.float32))
+            activations.append(layer.get_config()['activation'])
+    arrays = {'activations': np.array(activations)}
+    for i, (kernel, bias) in enumerate(zip(weights, biases)):
+        arrays[f'W{i}'] = kernel
+        arrays[f'b{i}'] = bias
+    np.savez(npz_path, **arrays)
+    logging.info(f"Exported NumPy weights to {npz_path}")
+
+
+def benchmark_classifier(classifier, X_test, y_test, latency_samples):
+    """Measure test accuracy and single-sample inference latency (as used per frame by Detectors)."""
+    predictions = np.array([classifier.predict(sample)[0] for sample in X_test])
+    accuracy = float(np.mean(predictions == y_test))
+
+    timings = []
+    for i in range(latency_samples):
+        sample = X_test[i % len(X_test)]
+        start = time.perf_counter()
+        classifier.predict(sample)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings = np.array(timings)
+    return {
+        'accuracy': round(accuracy, 4),
+        'latency_mean_us': round(float(np.mean(timings)), 1),
+        'latency_p50_us': round(float(np.percentile(timings, 50)), 1),
+        'latency_p95_us': round(float(np.percentile(timings, 95)), 1),
+        'size_bytes': os.path.getsize(classifier.model_path),
+    }
+
+
+def train(kind, epochs, batch_size, seed, latency_samples, temporal=False):
+    """Train the hand or body gesture MLP, export all model variants and write the comparison report."""
+    spec = MODEL_SPECS[kind]
+    tf.keras.utils.set_random_seed(seed)
+    tf.config.experimental.enable_op_determinism()
+
+    X_dataset, y_dataset = load_dataset(spec['dataset'], spec['num_landmarks'])
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_dataset, y_dataset, train_size=config.TRAIN_SPLIT, random_state=seed, shuffle=True
+    )
+
+    model = build_model(spec['num_landmarks'] * 2, spec['dropout'], config.NUM_CLASSES)
+    model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    cp_callback = tf.keras.callbacks.ModelCheckpoint(spec['keras'], verbose=1, save_weights_only=False)
+    es_callback = tf.keras.callbacks.EarlyStopping(patience=config.TRAIN_EARLY_STOPPING_PATIENCE, verbose=1)
+    model.fit(
+        X_train,
+        y_train,
+        epochs=epochs,
+        batch_size=batch_size,
+        validation_data=(X_test, y_test),
+        callbacks=[cp_callback, es_callback]
+    )
+    model.save(spec['keras'])
+    _, keras_accuracy = model.evaluate(X_test, y_test, batch_size=batch_size, verbose=0)
+
+    export_tflite(model, spec['tflite'], 'dynamic')
+    export_tflite(model, spec['float32'], 'float32')
+    export_tflite(model, spec['int8'], 'int8', representative_data=X_train[:min(len(X_train), 500)])
+    export_numpy_weights(model, spec['numpy'])
+
+    variants = {
+        'dynamic': TFLiteClassifier(spec['tflite']),
+        'float32': TFLiteClassifier(spec['float32']),
+        'int8': TFLiteClassifier(spec['int8']),
+        'numpy': NumpyClassifier(spec['numpy']),
+    }
+    report = {
+        'kind': kind,
+        'seed': seed,
+        'train_samples': int(len(X_train)),
+        'test_samples': int(len(X_test)),
+        'keras_accuracy': round(float(keras_accuracy), 4),
+        'variants': {},
+    }
+    for name, classifier in variants.items():
+        report['variants'][name] = {'path': classifier.model_path}
+        report['variants'][name].update(benchmark_classifier(classifier, X_test, y_test, latency_samples))
+
+    if temporal:
+        report['temporal'] = train_temporal(spec, X_dataset, y_dataset, epochs, batch_size, seed, latency_samples)
+
+    with open(spec['report'], 'w') as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Wrote training report to {spec['report']}")
+    return report
+
+
+def print_report(report):
+    """Print the accuracy/latency comparison of the exported variants."""
+    print(f"\n{report['kind'].upper()} model (keras accuracy {report['keras_accuracy']:.4f}, seed {report['seed']})")
+    print(f"{'variant':<10}{'accuracy':>10}{'mean us':>10}{'p50 us':>10}{'p95 us':>10}{'size KB':>10}")
+    for name, result in report['variants'].items():
+        print(f"{name:<10}{result['accuracy']:>10.4f}{result['latency_mean_us']:>10.1f}"
+              f"{result['latency_p50_us']:>10.1f}{result['latency_p95_us']:>10.1f}{result['size_bytes'] / 1024:>10.1f}")
+    if report.get('temporal'):
+        print(f"temporal model, window {report['temporal']['window']}:")
+        for name in ('tflite_full_window', 'numpy_streaming'):
+            result = report['temporal'][name]
+            print(f"  {name:<20}{result['accuracy']:>10.4f}{result['latency_mean_us']:>10.1f} us mean"
+                  f"{result['latency_p95_us']:>10.1f} us p95")
+
+
+def main():
+    """Command line entry point for training the gesture classifiers."""
+    parser = argparse.ArgumentParser(description="Train the hand/body gesture classifiers and export TFLite/int8/NumPy models.")
+    parser.add_argument('kind', choices=['hand', 'body', 'all'], help="Which gesture model to train.")
+    parser.add_argument('--epochs', type=int, default=config.TRAIN_EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=config.TRAIN_BATCH_SIZE)
+    parser.add_argument('--seed', type=int, default=config.RANDOM_SEED)
+    parser.add_argument('--latency-samples', type=int, default=config.TRAIN_LATENCY_SAMPLES)
+    parser.add_argument('--temporal', action='store_true', help="Also train the sliding-window temporal classifier.")
+    args = parser.parse_args()
+
+    kinds = list(MODEL_SPECS) if args.kind == 'all' else [args.kind]
+    for kind in kinds:
+        report = train(kind, args.epochs, args.batch_size, args.seed, args.latency_samples, args.temporal)
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
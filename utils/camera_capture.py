@@ -0,0 +1,129 @@
+import time
+import logging
+import threading
+from collections import deque, namedtuple
+import cv2
+import config
+from utils.metrics import metrics
+
+# A camera frame stamped with its monotonic capture time and a sequence number
+CapturedFrame = namedtuple('CapturedFrame', ['image', 'timestamp', 'sequence'])
+
+
+class CameraCapture:
+    """
+    Reads the camera on a dedicated thread and keeps only the newest frame, so slow processing
+    skips frames instead of draining a backlog of stale ones from the driver buffer.
+    Resolution, frame rate and pixel format are negotiated with the driver when opening.
+    """
+
+    def __init__(self, device=config.VIDEO_CAPTURE_DEVICE, size=config.VIDEO_SIZE, fps=config.VIDEO_FPS,
+                 formats=config.CAPTURE_FORMATS, rate=None, ring=None):
+        """
+        Opens the capture device and negotiates its settings; rate is an optional RateCounter ticked per frame
+        and ring an optional FrameRing every captured frame is copied into.
+        """
+        self.cap = cv2.VideoCapture(device)
+        self._condition = threading.Condition()
+        self._latest = None
+        self._last_read_sequence = -1
+        self._sequence = 0
+        self._running = False
+        self._thread = None
+        self.dropped_frames = 0
+        self.rate = rate
+        self.ring = ring
+        self.frame_ages = deque(maxlen=config.CAPTURE_AGE_HISTORY)
+        self._negotiate(size, fps, formats)
+        if ring is not None:
+            ring.allocate((self.height, self.width, 3), self.fps)
+
+    def _negotiate(self, size, fps, formats):
+        """Request the configured format, size and rate, then read back what the driver accepted."""
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, config.CAPTURE_BUFFER_SIZE)
+        for fourcc in formats:
+            code = cv2.VideoWriter_fourcc(*fourcc)
+            self.cap.set(cv2.CAP_PROP_FOURCC, code)
+            if int(self.cap.get(cv2.CAP_PROP_FOURCC)) == code:
+                break
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+        self.cap.set(cv2.CAP_PROP_FPS, fps)
+
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or size[0]
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or size[1]
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or fps
+        code = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+        self.fourcc = "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)) if code else "----"
+        if (self.width, self.height) != tuple(size) or abs(self.fps - fps) > 0.5:
+            logging.warning(f"Camera negotiated {self.width}x{self.height}@{self.fps:.1f} {self.fourcc}, "
+                            f"requested {size[0]}x{size[1]}@{fps:.1f}")
+        else:
+            logging.info(f"Camera opened at {self.width}x{self.height}@{self.fps:.1f} {self.fourcc}")
+
+    def start(self):
+        """Start the capture thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running and self.cap.isOpened():
+            start = time.perf_counter()
+            ret, image = self.cap.read()
+            timestamp = time.monotonic()
+            metrics.observe('capture_read_seconds', time.perf_counter() - start)
+            if self.rate is not None and ret:
+                self.rate.tick(timestamp)
+            if not ret or image is None:
+                logging.warning('Ignoring empty camera frame.')
+                break
+            if self.ring is not None:
+                self.ring.push(image, timestamp)
+            with self._condition:
+                if self._latest is not None and self._latest.sequence > self._last_read_sequence:
+                    self.dropped_frames += 1
+                    metrics.count('capture_dropped_frames_total')
+                self._latest = CapturedFrame(image, timestamp, self._sequence)
+                self._sequence += 1
+                self._condition.notify_all()
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Wait for a frame newer than the last one read and return it as a CapturedFrame.
+        Returns None when the camera stopped or no frame arrived within timeout.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self._running or (self._latest is not None and self._latest.sequence > self._last_read_sequence),
+                timeout=timeout,
+            )
+            frame = self._latest
+            if frame is None or frame.sequence <= self._last_read_sequence:
+                return None
+            self._last_read_sequence = frame.sequence
+        age = time.monotonic() - frame.timestamp
+        self.frame_ages.append(age)
+        metrics.observe('capture_frame_age_seconds', age)
+        return frame
+
+    def is_opened(self):
+        """Return True while the capture thread is delivering frames."""
+        return self._running
+
+    def frame_age(self):
+        """Return the mean and maximum driver-to-consumer frame age in seconds over recent frames."""
+        if not self.frame_ages:
+            return 0.0, 0.0
+        return sum(self.frame_ages) / len(self.frame_ages), max(self.frame_ages)
+
+    def stop(self):
+        """Stop the capture thread and release the device."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.cap.release()
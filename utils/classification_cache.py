@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+import numpy as np
+import config
+from utils.metrics import metrics
+
+
+class ClassificationCache:
+    """
+    Bounded LRU cache of classifier results keyed by the model version and the pre-processed landmark vector
+    quantized to step. While the operator holds a pose the normalized vectors stay within one quantization
+    step from frame to frame, so inference is skipped on hits. The time saved by a hit is estimated from the
+    running mean cost of the misses. Used from the detection thread only.
+    """
+
+    def __init__(self, max_size=config.CLASSIFICATION_CACHE_SIZE, step=config.CLASSIFICATION_CACHE_STEP):
+        self.max_size = max_size
+        self.step = step
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._inference_seconds = 0.0
+
+    def key(self, version, vector):
+        """Cache key of a landmark vector classified by model version."""
+        quantized = np.round(np.asarray(vector, dtype=np.float32) / self.step).astype(np.int32)
+        return version, quantized.tobytes()
+
+    def classify(self, version, vector, classify):
+        """Return classify(vector), reusing the result cached for the same version and quantized vector."""
+        key = self.key(version, vector)
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            saved = self._inference_seconds / self.misses
+            self.saved_seconds += saved
+            metrics.count('classification_cache_hits_total')
+            metrics.count('classification_cache_saved_seconds_total', saved)
+            return result
+        start = time.perf_counter()
+        result = classify(vector)
+        self._inference_seconds += time.perf_counter() - start
+        self.misses += 1
+        metrics.count('classification_cache_misses_total')
+        self._entries[key] = result
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        self._entries.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Hits, misses, hit rate, entries and estimated inference time saved."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate(), 4),
+            'entries': len(self._entries),
+            'saved_seconds': round(self.saved_seconds, 4),
+        }
+
+    def gauges(self):
+        """Cache statistics as flat metric gauges."""
+        return {
+            'classification_cache_hit_ratio': round(self.hit_rate(), 4),
+            'classification_cache_entries': len(self._entries),
+        }
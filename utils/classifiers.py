@@ -0,0 +1,86 @@
+import os
+import numpy as np
+import tensorflow as tf
+
+
+class TFLiteClassifier:
+    """
+    Gesture classifier backed by a TensorFlow Lite model.
+    The interpreter is allocated once and reused, and int8 models are quantized/dequantized transparently.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        """Loads the TFLite model and allocates its tensors."""
+        self.model_path = model_path
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.input_size = int(self.input_details['shape'][-1])
+        self.num_classes = int(self.output_details['shape'][-1])
+
+    def predict_proba(self, landmark_list):
+        """Return the class probabilities for a single pre-processed landmark vector."""
+        input_data = np.array([landmark_list], dtype=np.float32)
+        input_dtype = self.input_details['dtype']
+        if input_dtype != np.float32:
+            scale, zero_point = self.input_details['quantization']
+            info = np.iinfo(input_dtype)
+            input_data = np.clip(np.round(input_data / scale + zero_point), info.min, info.max).astype(input_dtype)
+        self.interpreter.set_tensor(self.input_details['index'], input_data)
+        self.interpreter.invoke()
+        result = np.squeeze(self.interpreter.get_tensor(self.output_details['index']))
+        if self.output_details['dtype'] != np.float32:
+            scale, zero_point = self.output_details['quantization']
+            result = (result.astype(np.float32) - zero_point) * scale
+        return result
+
+    def predict(self, landmark_list):
+        """Classify a single pre-processed landmark vector and return (class_id, accuracy)."""
+        result = self.predict_proba(landmark_list)
+        class_id = int(np.argmax(result))
+        accuracy = float(round(result[class_id], 2))
+        return class_id, accuracy
+
+
+class NumpyClassifier:
+    """
+    Gesture classifier that runs the exported MLP weights with plain NumPy.
+    BatchNormalization layers are folded into the following Dense layer at export time.
+    """
+
+    def __init__(self, model_path):
+        """Loads the dense layer weights and activations from an .npz file."""
+        self.model_path = model_path
+        with np.load(model_path) as data:
+            self.activations = [str(a) for a in data['activations']]
+            self.weights = [data[f'W{i}'].astype(np.float32) for i in range(len(self.activations))]
+            self.biases = [data[f'b{i}'].astype(np.float32) for i in range(len(self.activations))]
+        self.input_size = int(self.weights[0].shape[0])
+        self.num_classes = int(self.weights[-1].shape[1])
+
+    def predict_proba(self, landmark_list):
+        """Return the class probabilities for a single pre-processed landmark vector."""
+        x = np.asarray(landmark_list, dtype=np.float32)
+        for weight, bias, activation in zip(self.weights, self.biases, self.activations):
+            x = x @ weight + bias
+            if activation == 'relu':
+                x = np.maximum(x, 0)
+            elif activation == 'softmax':
+                x = np.exp(x - np.max(x))
+                x /= np.sum(x)
+        return x
+
+    def predict(self, landmark_list):
+        """Classify a single pre-processed landmark vector and return (class_id, accuracy)."""
+        result = self.predict_proba(landmark_list)
+        class_id = int(np.argmax(result))
+        accuracy = float(round(result[class_id], 2))
+        return class_id, accuracy
+
+
+def load_classifier(model_path, num_threads=None):
+    """Create the classifier matching the model file type (.npz for NumPy weights, otherwise TFLite)."""
+    if os.path.splitext(model_path)[1] == '.npz':
+        return NumpyClassifier(model_path)
+    return TFLiteClassifier(model_path, num_threads=num_threads)
@@ -0,0 +1,168 @@
+import math
+import logging
+import threading
+from dronekit import connect
+import config
+from utils.metrics import metrics
+from utils.rolling_stats import RateCounter, RollingStats
+
+
+class LinkLostError(Exception):
+    """Raised when a command needs the vehicle link while it is down or stale."""
+
+
+class ConnectionManager:
+    """
+    Owns the DroneKit vehicle connection. Connects with exponential backoff, watches the heartbeat age,
+    marks the link stale when heartbeats stop and reconnects without restarting the application.
+    Every received message updates the message rates and the packet loss estimated from gaps in the
+    per-sender MAVLink sequence numbers. Commands call ensure_link() to fail fast on a stale link.
+    """
+
+    def __init__(self, connection_string, baud=57600, wait_ready=False, on_connect=None):
+        self.connection_string = connection_string
+        self.baud = baud
+        self.wait_ready = wait_ready
+        self.on_connect = on_connect
+        self.vehicle = None
+        self.state = 'disconnected'
+        self.reconnects = 0
+        self.received = 0
+        self.lost = 0
+        self.message_rate = RateCounter()
+        self.type_rates = {}
+        self.gaps = RollingStats(config.CONNECTION_LOSS_WINDOW)
+        self._last_seq = {}
+        self._stop_event = threading.Event()
+        self._monitor_thread = None
+
+    def _on_message(self, vehicle, name, message):
+        self.message_rate.tick()
+        rate = self.type_rates.get(name)
+        if rate is None:
+            rate = self.type_rates[name] = RateCounter()
+        rate.tick()
+        self.received += 1
+        sender = (message.get_srcSystem(), message.get_srcComponent())
+        sequence = message.get_seq()
+        last = self._last_seq.get(sender)
+        gap = (sequence - last - 1) % 256 if last is not None else 0
+        self._last_seq[sender] = sequence
+        self.lost += gap
+        self.gaps.add(gap)
+
+    def connect(self):
+        """Connect, retrying with exponential backoff until it succeeds or the manager is stopped."""
+        delay = config.CONNECTION_RETRY_INITIAL
+        while not self._stop_event.is_set():
+            self.state = 'connecting'
+            try:
+                vehicle = connect(self.connection_string, baud=self.baud, wait_ready=self.wait_ready,
+                                  heartbeat_timeout=config.CONNECTION_HEARTBEAT_TIMEOUT)
+            except Exception as e:
+                metrics.count('link_connect_failures_total')
+                logging.error(f"Vehicle connection to {self.connection_string} failed: {e}. Retrying in {delay:.1f}s.")
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, config.CONNECTION_RETRY_MAX)
+                continue
+            self._last_seq.clear()
+            vehicle.add_message_listener('*', self._on_message)
+            self.vehicle = vehicle
+            self.state = 'connected'
+            if self.on_connect is not None:
+                self.on_connect(vehicle)
+            logging.info(f"Vehicle connected on {self.connection_string}.")
+            return True
+        return False
+
+    def start(self):
+        """
+        Start the link monitor, which also makes the first connection, and return without waiting for it.
+        Commands fail fast through ensure_link() while the state is 'connecting'.
+        """
+        self.state = 'connecting'
+        self._monitor_thread = threading.Thread(target=self._monitor, daemon=True)
+        self._monitor_thread.start()
+        return self
+
+    def stop(self):
+        """Stop monitoring and close the vehicle connection."""
+        self._stop_event.set()
+        if self.vehicle is not None:
+            self.vehicle.close()
+        self.state = 'disconnected'
+
+    def _monitor(self):
+        if not self.connect():
+            return
+        while not self._stop_event.wait(config.CONNECTION_CHECK_INTERVAL):
+            age = self.heartbeat_age()
+            if self.state == 'connected' and age > config.CONNECTION_STALE_TIMEOUT:
+                self.state = 'stale'
+                metrics.count('link_stale_total')
+                logging.warning(f"Vehicle link stale, last heartbeat {age:.1f}s ago.")
+            elif self.state == 'stale' and age <= config.CONNECTION_STALE_TIMEOUT:
+                self.state = 'connected'
+                logging.info("Vehicle link recovered.")
+            if self.state == 'stale' and age > config.CONNECTION_RECONNECT_TIMEOUT:
+                self._reconnect()
+
+    def _reconnect(self):
+        logging.error("Vehicle link lost, reconnecting.")
+        self.reconnects += 1
+        metrics.count('link_reconnects_total')
+        vehicle, self.vehicle = self.vehicle, None
+        try:
+            vehicle.close()
+        except Exception as e:
+            logging.debug(f"Closing the lost vehicle connection failed: {e}")
+        self.connect()
+
+    def heartbeat_age(self):
+        """Seconds since the last heartbeat (infinite while not connected)."""
+        vehicle = self.vehicle
+        if vehicle is None:
+            return math.inf
+        return vehicle.last_heartbeat
+
+    def is_healthy(self):
+        return self.state == 'connected' and self.heartbeat_age() <= config.CONNECTION_STALE_TIMEOUT
+
+    def ensure_link(self):
+        """Raise LinkLostError unless the link is connected with a recent heartbeat."""
+        if not self.is_healthy():
+            metrics.count('link_failed_commands_total')
+            raise LinkLostError(f"Vehicle link {self.state}, last heartbeat {self.heartbeat_age():.1f}s ago")
+
+    def packet_loss(self):
+        """Fraction of messages lost over the recent window, from sequence number gaps."""
+        self.gaps.expire()
+        lost = self.gaps.sum()
+        total = lost + self.gaps.count()
+        return lost / total if total else 0.0
+
+    def health(self):
+        """Link state, heartbeat age, message rate, packet loss and reconnect count."""
+        age = self.heartbeat_age()
+        return {
+            'state': self.state,
+            'heartbeat_age': round(age, 2) if math.isfinite(age) else None,
+            'messages_per_second': round(self.message_rate.rate(), 1),
+            'packet_loss': round(self.packet_loss(), 4),
+            'reconnects': self.reconnects,
+        }
+
+    def message_rates(self):
+        """Received messages per second by message type."""
+        return {name: round(rate.rate(), 2) for name, rate in sorted(self.type_rates.items())}
+
+    def gauges(self):
+        """Link health as flat metric gauges."""
+        health = self.health()
+        return {
+            'link_connected': 1 if self.is_healthy() else 0,
+            'link_heartbeat_age_seconds': health['heartbeat_age'] if health['heartbeat_age'] is not None else -1,
+            'link_rx_messages_per_second': health['messages_per_second'],
+            'link_packet_loss_ratio': health['packet_loss'],
+            'link_reconnects': health['reconnects'],
+        }
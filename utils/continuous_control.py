@@ -0,0 +1,261 @@
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import namedtuple
+import numpy as np
+from pymavlink import mavutil
+import config
+from utils.metrics import metrics
+from utils.rolling_stats import RollingStats
+
+# Latest operator observation handed from image processing to the follow controller
+FollowTarget = namedtuple('FollowTarget', ['bearing', 'distance', 'timestamp'])
+# Palm centre in normalized image coordinates (-1..1, right/down positive), palm size relative to the
+# frame height, and the capture time of the frame it was measured on
+PalmObservation = namedtuple('PalmObservation', ['x', 'y', 'scale', 'captured_at'])
+
+
+class FixedRateController(ABC):
+    """
+    Runs step() on its own thread at a fixed rate, independent of the camera frame rate.
+    Deadlines advance by a fixed period, so a slow step delays the next one instead of drifting the rate;
+    when a step overruns a whole period the missed ticks are skipped. Subclasses implement step().
+    """
+
+    name = 'controller'
+
+    def __init__(self, rate_hz):
+        self.period = 1.0 / rate_hz
+        self._running = False
+        self._thread = None
+
+    def is_active(self):
+        return self._running
+
+    def start(self):
+        """Start the control thread if it is not already running."""
+        if self._running:
+            return False
+        self._running = True
+        self.on_start()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logging.info(f"{self.name} control started at {1.0 / self.period:.0f} Hz.")
+        return True
+
+    def stop(self):
+        """Stop the control thread and let the subclass bring the vehicle to a hold."""
+        if not self._running:
+            return False
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2 * self.period + 1.0)
+        try:
+            self.on_stop()
+        except Exception as e:
+            logging.error(f"{self.name} control could not hold the vehicle: {e}")
+        logging.info(f"{self.name} control stopped.")
+        return True
+
+    def _run(self):
+        deadline = time.monotonic()
+        while self._running:
+            now = time.monotonic()
+            try:
+                with metrics.timer(f'{self.name}_step_seconds'):
+                    self.step(now)
+            except Exception as e:
+                logging.error(f"{self.name} control step failed: {e}")
+            deadline += self.period
+            now = time.monotonic()
+            if deadline < now:
+                metrics.count(f'{self.name}_overruns_total')
+                deadline = now
+            time.sleep(deadline - now)
+
+    def on_start(self):
+        pass
+
+    def on_stop(self):
+        pass
+
+    @abstractmethod
+    def step(self, now):
+        """One control update at monotonic time now, called on the control thread."""
+
+
+class FollowController(FixedRateController):
+    """
+    Keeps the locked operator centred and at FOLLOW_TARGET_DISTANCE by streaming relative yaw
+    commands through condition_yaw and body-frame forward velocity setpoints through set_ned_velocity.
+    The vehicle holds position when no fresh operator observation arrived within the timeout.
+    """
+
+    name = 'follow'
+
+    def __init__(self, dronekit_functions, rate_hz=config.FOLLOW_CONTROL_RATE):
+        super().__init__(rate_hz)
+        self.dronekit_functions = dronekit_functions
+        self.target = None
+        self.last_yaw_command = 0.0
+        self.holding = True
+
+    def update_target(self, bearing, distance, timestamp):
+        """Hand over the operator bearing (degrees, positive right) and distance (cm) seen at timestamp."""
+        self.target = FollowTarget(bearing, distance, timestamp)
+
+    def on_start(self):
+        self.target = None
+        self.holding = True
+
+    def on_stop(self):
+        self.hold()
+
+    def hold(self):
+        """Zero the velocity setpoint."""
+        self.dronekit_functions.set_ned_velocity(0, 0, 0, frame=mavutil.mavlink.MAV_FRAME_BODY_OFFSET_NED)
+        self.holding = True
+
+    def step(self, now):
+        target = self.target
+        if target is None or now - target.timestamp > config.FOLLOW_TARGET_TIMEOUT:
+            if not self.holding:
+                logging.warning("Follow target lost, holding position.")
+                self.hold()
+            return
+
+        if abs(target.bearing) > config.FOLLOW_YAW_DEADBAND and now - self.last_yaw_command >= config.FOLLOW_YAW_INTERVAL:
+            self.dronekit_functions.condition_yaw(target.bearing * config.FOLLOW_YAW_GAIN, relative=True, settle=0)
+            self.last_yaw_command = now
+
+        forward = 0.0
+        error = target.distance - config.FOLLOW_TARGET_DISTANCE
+        if abs(error) > config.FOLLOW_DISTANCE_DEADBAND:
+            forward = max(-config.FOLLOW_MAX_SPEED, min(config.FOLLOW_MAX_SPEED, error * config.FOLLOW_DISTANCE_GAIN))
+        self.dronekit_functions.set_ned_velocity(forward, 0, 0, frame=mavutil.mavlink.MAV_FRAME_BODY_OFFSET_NED)
+        self.holding = forward == 0.0
+
+
+class PID:
+    """PID controller on one axis with a deadband on the error and clamped integral and output."""
+
+    def __init__(self, kp, ki, kd, limit, deadband=0.0):
+        self.kp, self.ki, self.kd = kp, ki, kd
+        self.limit = limit
+        self.deadband = deadband
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.last_error = None
+
+    def update(self, error, dt):
+        """Return the clamped output for error over dt seconds."""
+        if abs(error) <= self.deadband:
+            error = 0.0
+        else:
+            error -= self.deadband if error > 0 else -self.deadband
+        if self.ki:
+            self.integral = max(-self.limit / self.ki, min(self.limit / self.ki, self.integral + error * dt))
+        derivative = (error - self.last_error) / dt if self.last_error is not None and dt > 0 else 0.0
+        self.last_error = error
+        output = self.kp * error + self.ki * self.integral + self.kd * derivative
+        return max(-self.limit, min(self.limit, output))
+
+
+class PalmController(FixedRateController):
+    """
+    Moves the drone in 3D from the palm position: the hand-landmark centroid offset from the image centre
+    drives the lateral and vertical velocity, and the palm size relative to its size when the mode started
+    drives the forward velocity (hand closer to the camera moves the drone back). Each axis goes through a
+    PID with a deadband and the setpoints stream at a fixed rate in the body frame.
+    A watchdog zeroes the velocity as soon as the hand has not been seen for PALM_WATCHDOG_TIMEOUT.
+    The latency from the camera frame to the MAVLink setpoint is measured on every step.
+    """
+
+    name = 'palm'
+
+    def __init__(self, dronekit_functions, rate_hz=config.PALM_CONTROL_RATE):
+        super().__init__(rate_hz)
+        self.dronekit_functions = dronekit_functions
+        self.observation = None
+        self.last_observation = None
+        self.reference_scale = None
+        self.last_step = None
+        self.holding = True
+        self.latency = RollingStats(config.PALM_LATENCY_WINDOW)
+        self.last_budget_warning = 0.0
+        kp, ki, kd = config.PALM_PID_GAINS
+        self.pids = [PID(kp, ki, kd, config.PALM_MAX_SPEED, config.PALM_DEADBAND) for _ in range(3)]
+
+    def update_hand(self, points, frame_size, captured_at):
+        """Hand over the hand landmark points (pixels) measured on the frame captured at captured_at."""
+        if points is None:
+            return
+        points = np.asarray(points, dtype=np.float64)
+        width, height = frame_size
+        centre_x, centre_y = points.mean(axis=0)
+        # Palm size: wrist (0) to middle finger MCP (9)
+        scale = float(np.hypot(*(points[9] - points[0]))) / height
+        self.observation = PalmObservation(float(2.0 * centre_x / width - 1.0), float(2.0 * centre_y / height - 1.0),
+                                           scale, captured_at)
+
+    def on_start(self):
+        self.observation = None
+        self.reference_scale = None
+        self.last_step = None
+        self.holding = True
+        for pid in self.pids:
+            pid.reset()
+
+    def on_stop(self):
+        self.hold()
+
+    def hold(self):
+        """Zero the velocity setpoint and the controller state."""
+        self.dronekit_functions.set_ned_velocity(0, 0, 0, frame=mavutil.mavlink.MAV_FRAME_BODY_OFFSET_NED)
+        self.holding = True
+        for pid in self.pids:
+            pid.reset()
+
+    def step(self, now):
+        observation = self.observation
+        if observation is None or now - observation.captured_at > config.PALM_WATCHDOG_TIMEOUT:
+            if not self.holding:
+                logging.warning("Palm lost, velocity zeroed.")
+                metrics.count('palm_watchdog_total')
+                self.hold()
+            self.last_step = now
+            return
+        if self.reference_scale is None:
+            self.reference_scale = observation.scale
+
+        dt = now - self.last_step if self.last_step is not None else self.period
+        self.last_step = now
+        forward = self.pids[0].update(-(observation.scale / self.reference_scale - 1.0), dt)
+        right = self.pids[1].update(observation.x, dt)
+        down = self.pids[2].update(observation.y, dt)
+        self.dronekit_functions.set_ned_velocity(forward, right, down, frame=mavutil.mavlink.MAV_FRAME_BODY_OFFSET_NED)
+        self.holding = False
+        if observation is not self.last_observation:
+            # Latency of the first setpoint computed from each new camera frame
+            self.last_observation = observation
+            self._record_latency(time.monotonic() - observation.captured_at)
+
+    def _record_latency(self, latency):
+        self.latency.add(latency)
+        metrics.observe('palm_frame_to_setpoint_seconds', latency)
+        now = time.monotonic()
+        if latency > config.PALM_LATENCY_BUDGET and now - self.last_budget_warning > 5.0:
+            self.last_budget_warning = now
+            logging.warning(f"Palm control latency {latency * 1000:.0f}ms exceeds the "
+                            f"{config.PALM_LATENCY_BUDGET * 1000:.0f}ms budget.")
+
+    def latency_report(self):
+        """Frame-to-setpoint latency statistics in milliseconds and the share of steps within budget."""
+        summary = self.latency.summary()
+        report = {key: round(value * 1000, 1) for key, value in summary.items() if key != 'count'}
+        report['count'] = summary['count']
+        report['budget_ms'] = config.PALM_LATENCY_BUDGET * 1000
+        return report
@@ -0,0 +1,59 @@
+import logging
+from collections import deque
+import config
+
+
+class DetectorLifecycle:
+    """
+    Manages the hand and pose MediaPipe graphs around hand/body mode switches.
+    Only the graph of the active mode runs every frame. The inactive graph is kept in warm standby by
+    feeding it a downscaled frame every few frames, more often while the distance is close to the switch
+    distance, so its tracking state is seeded when the mode flips. The time from a switch to the first
+    valid landmarks of the newly active graph is recorded for each mode.
+    """
+
+    def __init__(self, detector, standby_interval=config.STANDBY_INTERVAL_FRAMES,
+                 prewarm_interval=config.STANDBY_PREWARM_INTERVAL_FRAMES, prewarm_band=config.STANDBY_PREWARM_BAND):
+        self.detector = detector
+        self.standby_interval = standby_interval
+        self.prewarm_interval = prewarm_interval
+        self.prewarm_band = prewarm_band
+        self.active_mode = None
+        self.frame_count = 0
+        self.switch_time = None
+        self.time_to_first_landmarks = {1: deque(maxlen=50), 2: deque(maxlen=50)}
+
+    def before_detection(self, frame, mode, distance, timestamp):
+        """Track mode switches and run the inactive graph on this frame if it is due."""
+        self.frame_count += 1
+        if mode != self.active_mode:
+            if self.active_mode is not None:
+                self.switch_time = timestamp
+            self.active_mode = mode
+
+        inactive_mode = 2 if mode == 1 else 1
+        near_switch = abs(distance - config.GESTURE_SWITCH_DISTANCE) <= self.prewarm_band
+        interval = self.prewarm_interval if near_switch else self.standby_interval
+        if interval > 0 and self.frame_count % interval == 0:
+            self.detector.warm(inactive_mode, frame)
+
+    def after_detection(self, mode, landmarks_found, timestamp):
+        """Record the time to first valid landmarks once the newly active graph produces them."""
+        if self.switch_time is None or not landmarks_found:
+            return
+        elapsed = timestamp - self.switch_time
+        self.time_to_first_landmarks[mode].append(elapsed)
+        self.switch_time = None
+        logging.info(f"{config.GESTURE_TYPES[mode]} graph: first landmarks {elapsed * 1000:.0f}ms after mode switch")
+
+    def report(self):
+        """Return the mean and last time to first landmarks (seconds) after a switch, per gesture type."""
+        report = {}
+        for mode, samples in self.time_to_first_landmarks.items():
+            if samples:
+                report[config.GESTURE_TYPES[mode]] = {
+                    'switches': len(samples),
+                    'mean': sum(samples) / len(samples),
+                    'last': samples[-1],
+                }
+        return report
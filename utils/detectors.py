@@ -1,13 +1,20 @@
 import os
-import csv
+import time
 import cv2
 import mediapipe as mp
-import tensorflow as tf
 import numpy as np
 import logging
+from collections import namedtuple
 import config
 from utils.helper_func import HelperFunc
 from utils.distance_estimation import DistanceEstimator
+from utils.model_registry import ModelRegistry
+from utils.landmark_filter import create_landmark_filter
+from utils.temporal_classifier import load_temporal_classifier
+from utils.inference_frames import as_inference_frames
+from utils.performance_profiles import classifier_paths
+from utils.classification_cache import ClassificationCache
+from utils.metrics import metrics
 
 # Set TensorFlow logging level
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '1'
@@ -16,22 +23,14 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '1'
 BODY_MODEL_PATH = config.BODY_MODEL_PATH
 HAND_MODEL_PATH = config.HAND_MODEL_PATH
 
-def load_labels(label_path):
-    """Load gesture labels from a CSV file."""
-    try:
-        with open(label_path, encoding='utf-8-sig') as f:
-            return [row[0] for row in csv.reader(f)]
-    except Exception as e:
-        logging.error(f"Failed to load labels from {label_path}: {e}")
-        return []
-
-BODY_GESTURE_LABELS = load_labels(config.BODY_LABELS_PATH)
-HAND_GESTURE_LABELS = load_labels(config.HAND_LABELS_PATH)
-
 functions = HelperFunc()
 
+# Detection results; drawing is left to utils.overlay.OverlayRenderer
+GestureDetection = namedtuple('GestureDetection', ['kind', 'class_id', 'label', 'accuracy', 'model_version',
+                                                   'brect', 'landmarks', 'points'])
+FaceDetection = namedtuple('FaceDetection', ['rect', 'score', 'distance'])
+
 # Initialize MediaPipe solutions
-mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 mp_hands = mp.solutions.hands
 mp_face_detection = mp.solutions.face_detection
@@ -48,105 +47,243 @@ class Detectors:
         """ Initializes the Detectors with specified confidence thresholds for detection and tracking."""
         self.min_detection_confidence = min_detection_confidence
         self.min_tracking_confidence = min_tracking_confidence
-        self.pose = mp_pose.Pose(
-            min_detection_confidence=self.min_detection_confidence,
-            min_tracking_confidence=self.min_tracking_confidence
-        )
-        self.hands = mp_hands.Hands(
-            max_num_hands=1,
-            min_detection_confidence=self.min_detection_confidence,
-            min_tracking_confidence=self.min_tracking_confidence
-        )
-        self.face_detector = mp_face_detection.FaceDetection(
-            model_selection=1,
-            min_detection_confidence=self.min_detection_confidence
-        )
-
-    def classify_gesture(self, model_path, landmark_list):
-        """Run gesture classification using a TFLite model and return (class_id, accuracy)."""
+        self.pose = self.hands = self.face_detector = None
+        self.graph_options = {}
+        self._build_graphs({
+            'pose': (1, min_detection_confidence, min_tracking_confidence),
+            'hands': (1, min_detection_confidence, min_tracking_confidence),
+            'face': (1, min_detection_confidence),
+        })
+        self.model_registry = ModelRegistry({
+            'hand': (HAND_MODEL_PATH, config.HAND_LABELS_PATH, config.HAND_INPUT_SIZE),
+            'body': (BODY_MODEL_PATH, config.BODY_LABELS_PATH, config.BODY_INPUT_SIZE),
+        })
+        self.last_predictions = {'hand': None, 'body': None}
+        self.shoulder_width_px = None
+        self.landmarks_found = {'hand': False, 'body': False}
+        self.last_points = {'hand': None, 'body': None}
+        self.last_features = {'hand': None, 'body': None}
+        self.classification_cache = ClassificationCache() if config.CLASSIFICATION_CACHE_SIZE > 0 else None
+        if self.classification_cache is not None:
+            metrics.register_collector(self.classification_cache.gauges)
+        self.inference_heights = dict(config.INFERENCE_HEIGHTS)
+        self.landmark_filters = {'hand': create_landmark_filter(), 'body': create_landmark_filter()}
+        self.temporal_classifiers = {
+            'hand': load_temporal_classifier(config.HAND_TEMPORAL_MODEL_PATH),
+            'body': load_temporal_classifier(config.BODY_TEMPORAL_MODEL_PATH),
+        }
+
+    def _build_graphs(self, options):
+        """(Re)create the MediaPipe graphs whose options changed; options maps a graph name to its settings."""
+        if options['pose'] != self.graph_options.get('pose'):
+            complexity, detection, tracking = options['pose']
+            if self.pose is not None:
+                self.pose.close()
+            self.pose = mp_pose.Pose(
+                model_complexity=complexity,
+                min_detection_confidence=detection,
+                min_tracking_confidence=tracking
+            )
+        if options['hands'] != self.graph_options.get('hands'):
+            complexity, detection, tracking = options['hands']
+            if self.hands is not None:
+                self.hands.close()
+            self.hands = mp_hands.Hands(
+                max_num_hands=1,
+                model_complexity=complexity,
+                min_detection_confidence=detection,
+                min_tracking_confidence=tracking
+            )
+        if options['face'] != self.graph_options.get('face'):
+            selection, detection = options['face']
+            if self.face_detector is not None:
+                self.face_detector.close()
+            self.face_detector = mp_face_detection.FaceDetection(
+                model_selection=selection,
+                min_detection_confidence=detection
+            )
+        self.graph_options = options
+
+    def apply_profile(self, profile):
+        """
+        Reconfigure for a PerformanceProfile: rebuild the graphs whose model or confidences changed, set the
+        inference heights and stage the profile's classifier backend in the model registry.
+        Call between frames on the thread that runs detection.
+        """
+        self.min_detection_confidence = profile.min_detection_confidence
+        self.min_tracking_confidence = profile.min_tracking_confidence
+        self._build_graphs({
+            'pose': (profile.pose_model_complexity, profile.min_detection_confidence, profile.min_tracking_confidence),
+            'hands': (profile.hand_model_complexity, profile.min_detection_confidence, profile.min_tracking_confidence),
+            'face': (profile.face_model_selection, profile.min_detection_confidence),
+        })
+        self.inference_heights = dict(profile.inference_heights)
+        self.model_registry.switch_models(classifier_paths(profile.classifier_backend), profile.num_threads)
+
+    def predict_gesture(self, kind, landmark_list):
+        """Classify with the active registry model of kind and return (Prediction, ModelVersion)."""
+        model = self.model_registry.active(kind)
+        if model is None:
+            return None, None
         try:
-            interpreter = tf.lite.Interpreter(model_path=model_path)
-            interpreter.allocate_tensors()
-            input_details = interpreter.get_input_details()
-            output_details = interpreter.get_output_details()
-            interpreter.set_tensor(input_details[0]['index'], np.array([landmark_list], dtype=np.float32))
-            interpreter.invoke()
-            result = interpreter.get_tensor(output_details[0]['index'])
-            result = np.squeeze(result)
-            class_id = int(np.argmax(result))
-            accuracy = float(round(result[class_id], 2))
-            return class_id, accuracy
+            if self.classification_cache is not None:
+                prediction = self.classification_cache.classify(model.version, landmark_list, self._timed(model.predict))
+            else:
+                prediction = self._timed(model.predict)(landmark_list)
         except Exception as e:
             logging.error(f"Gesture classification failed: {e}")
-            return -1, 0.0
+            return None, model
+        self.last_predictions[kind] = prediction
+        return prediction, model
+
+    @staticmethod
+    def _timed(predict):
+        """Wrap a classifier call so each inference is recorded in classify_gesture_seconds."""
+        def timed(landmark_list):
+            with metrics.timer('classify_gesture_seconds'):
+                return predict(landmark_list)
+        return timed
+
+    def predict_temporal(self, kind, landmark_list):
+        """
+        Push the landmark vector into the temporal classifier of kind.
+        Returns (Prediction, ModelVersion) once its window is full, otherwise (None, None).
+        """
+        temporal = self.temporal_classifiers[kind]
+        if temporal is None:
+            return None, None
+        with metrics.timer('classify_temporal_seconds'):
+            prediction = temporal.update(landmark_list)
+        model = self.model_registry.active(kind)
+        if prediction is None or model is None:
+            return None, None
+        self.last_predictions[kind] = prediction
+        return prediction, model
+
+    def uses_temporal(self, kind):
+        """Return True while decisions for kind come from the temporal classifier."""
+        temporal = self.temporal_classifiers[kind]
+        return temporal is not None and temporal.is_ready()
 
-    def detect_body_gesture(self, frame):
+    def _filter_landmarks(self, kind, image, landmarks, use_pose, timestamp):
         """
-        Detects body gesture from the given frame, draws bounding box and label if confident.
-        Returns the gesture class index or None if not detected/confident.
+        Return the landmark points passed through the temporal filter of kind as a float array.
+        When landmarks is None the filter predicts the points for a short dropout, or returns None.
         """
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.pose.process(rgb_frame)
+        landmark_filter = self.landmark_filters[kind]
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if landmarks is None:
+            return landmark_filter.predict(timestamp)
+        points = functions.calc_landmark_array(image, landmarks, use_pose)
+        return landmark_filter.update(points, timestamp)
+
+    def _classify_landmarks(self, kind, image, landmarks, use_pose, timestamp):
+        """Compute, optionally filter, pre-process and classify landmarks. Returns (points, Prediction, ModelVersion)."""
+        with metrics.timer('landmark_math_seconds'):
+            if self.landmark_filters[kind] is not None:
+                points = self._filter_landmarks(kind, image, landmarks, use_pose, timestamp)
+                preprocessed = functions.pre_process_landmark_array(points) if points is not None else None
+            elif landmarks is not None:
+                points = functions.calc_landmark_list(image, landmarks, use_pose=use_pose)
+                preprocessed = functions.pre_process_landmark(points)
+            else:
+                points = preprocessed = None
+        self.last_features[kind] = preprocessed
+        if preprocessed is None:
+            self.last_points[kind] = None
+            if self.temporal_classifiers[kind] is not None:
+                self.temporal_classifiers[kind].reset()
+            return None, None, None
+        self.last_points[kind] = points
+        prediction, model = self.predict_temporal(kind, preprocessed)
+        if prediction is None:
+            prediction, model = self.predict_gesture(kind, preprocessed)
+        return points, prediction, model
+
+    def _gesture_detection(self, kind, frame, landmarks, points, prediction, model):
+        """Build the GestureDetection for a confident prediction, or return None."""
+        if prediction is None:
+            return None
+        class_id, accuracy = prediction.class_id, prediction.accuracy
+        if not (accuracy > config.GESTURE_ACCURACY_THRESHOLD and 0 <= class_id < len(model.labels)):
+            return None
+        if landmarks is not None:
+            brect = functions.calc_bounding_rect(frame, landmarks)
+        else:
+            brect = list(cv2.boundingRect(np.asarray(points, dtype=np.int32)))
+        return GestureDetection(kind, class_id, model.label(class_id), accuracy, prediction.model_version,
+                                brect, landmarks, points)
+
+    def detect_body_gesture(self, frame, timestamp=None):
+        """
+        Detects body gesture from the given frame.
+        Returns a GestureDetection or None if not detected/confident. The frame is not drawn on.
+        """
+        frames = as_inference_frames(frame, self.inference_heights)
+        frame = frames.frame
+        rgb = frames.rgb('pose')
+        with metrics.timer('mediapipe_pose_seconds'):
+            results = self.pose.process(rgb)
+        self.landmarks_found['body'] = results.pose_landmarks is not None
         if results.pose_landmarks:
-            landmark_list = functions.calc_landmark_list(rgb_frame, results.pose_landmarks, use_pose=True)
-            preprocessed = functions.pre_process_landmark(landmark_list)
-            class_id, accuracy = self.classify_gesture(BODY_MODEL_PATH, preprocessed)
-            if accuracy > config.GESTURE_ACCURACY_THRESHOLD and 0 <= class_id < len(BODY_GESTURE_LABELS):
-                brect = functions.calc_bounding_rect(rgb_frame, results.pose_landmarks)
-                frame = functions.rect_corners(frame, brect)
-                frame.flags.writeable = True
-                mp_drawing.draw_landmarks(
-                    frame,
-                    results.pose_landmarks,
-                    mp_pose.POSE_CONNECTIONS,
-                    connection_drawing_spec=mp_drawing.DrawingSpec(color=(121, 44, 250), thickness=2),
-                    landmark_drawing_spec=mp_drawing.DrawingSpec(color=(121, 22, 76), thickness=2, circle_radius=2)
-                )
-                label = BODY_GESTURE_LABELS[class_id-1] if 0 <= class_id-1 < len(BODY_GESTURE_LABELS) else "Unknown"
-                info_text = f"{label} {accuracy:.2f}"
-                frame = functions.text_with_background(frame, info_text, (brect[0], brect[1]))
-                return class_id
-        return None
-
-    def detect_hand_gesture(self, frame):
+            self.shoulder_width_px = functions.calc_shoulder_width(frame, results.pose_landmarks)
+        else:
+            self.shoulder_width_px = None
+        points, prediction, model = self._classify_landmarks('body', frame, results.pose_landmarks, True, timestamp)
+        return self._gesture_detection('body', frame, results.pose_landmarks, points, prediction, model)
+
+    def detect_hand_gesture(self, frame, timestamp=None):
         """
-        Detects right hand gesture from the given frame, draws bounding box and label if confident.
-        Returns the gesture class index or None if not detected/confident.
+        Detects right hand gesture from the given frame.
+        Returns a GestureDetection or None if not detected/confident. The frame is not drawn on.
         """
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
+        frames = as_inference_frames(frame, self.inference_heights)
+        frame = frames.frame
+        rgb = frames.rgb('hands')
+        with metrics.timer('mediapipe_hands_seconds'):
+            results = self.hands.process(rgb)
+        hand_landmarks = None
         if results.multi_hand_landmarks:
-            for idx, hand_landmarks in enumerate(results.multi_hand_landmarks):
+            for idx, landmarks in enumerate(results.multi_hand_landmarks):
                 # Use the handedness info for each hand
                 hand_label = results.multi_handedness[idx].classification[0].label if hasattr(results, 'multi_handedness') else None
                 if hand_label == 'Left': # in flipped image, right hand is considered left hand in MediaPipe
-                    landmark_list = functions.calc_landmark_list(rgb_frame, hand_landmarks, use_pose=False)
-                    preprocessed = functions.pre_process_landmark(landmark_list)
-                    class_id, accuracy = self.classify_gesture(HAND_MODEL_PATH, preprocessed)
-                    if accuracy > config.GESTURE_ACCURACY_THRESHOLD and 0 <= class_id < len(HAND_GESTURE_LABELS):
-                        brect = functions.calc_bounding_rect(rgb_frame, hand_landmarks)
-                        frame = functions.rect_corners(frame, brect)
-                        frame.flags.writeable = True
-                        mp_drawing.draw_landmarks(
-                            frame,
-                            hand_landmarks,
-                            mp_hands.HAND_CONNECTIONS,
-                            mp_drawing.DrawingSpec(color=(121, 22, 76), thickness=2, circle_radius=3),
-                            mp_drawing.DrawingSpec(color=(121, 44, 250), thickness=2)
-                        )
-                        label = HAND_GESTURE_LABELS[class_id-1] if 0 <= class_id-1 < len(HAND_GESTURE_LABELS) else "Unknown"
-                        info_text = f"{label} {accuracy:.2f}"
-                        frame = functions.text_with_background(frame, info_text, (brect[0], brect[1]))
-                        return class_id
-        return None
+                    hand_landmarks = landmarks
+                    break
+        self.landmarks_found['hand'] = hand_landmarks is not None
+        points, prediction, model = self._classify_landmarks('hand', frame, hand_landmarks, False, timestamp)
+        return self._gesture_detection('hand', frame, hand_landmarks, points, prediction, model)
+
+    def warm(self, gesture_type, frame):
+        """
+        Run the hand (1) or pose (2) graph on a downscaled copy of frame without classifying,
+        keeping its tracking state warm while the other gesture mode is active.
+        """
+        frames = as_inference_frames(frame, self.inference_heights)
+        name = 'hands' if gesture_type == 1 else 'pose'
+        height = self.inference_heights.get(name) or frames.height
+        graph = self.hands if gesture_type == 1 else self.pose
+        rgb = frames.rgb_at(int(min(height, frames.height) * config.STANDBY_SCALE))
+        with metrics.timer('mediapipe_standby_seconds'):
+            graph.process(rgb)
 
     def detect_face(self, frame):
         """Detects faces in the given frame and estimates distance to the face if detected.
-        Returns the estimated distance in centimeters or None if no face is detected."""
+        Returns a FaceDetection or None if no face is detected. The frame is not drawn on."""
+
+        faces = self.detect_faces(frame)
+        return faces[0] if faces else None
 
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_detector.process(rgb_frame)
-        frame_height, frame_width = frame.shape[:2]
+    def detect_faces(self, frame):
+        """Detects all faces in the given frame and estimates their distances.
+        Returns a list of FaceDetection, empty if no face is detected."""
+
+        frames = as_inference_frames(frame, self.inference_heights)
+        frame_height, frame_width = frames.height, frames.width
+        rgb = frames.rgb('face')
+        with metrics.timer('mediapipe_face_seconds'):
+            results = self.face_detector.process(rgb)
+        faces = []
         if results.detections:
             for face in results.detections:
                 bbox = face.location_data.relative_bounding_box
@@ -155,15 +292,10 @@ class Detectors:
                     [frame_width, frame_height, frame_width, frame_height]
                 ).astype(int)
                 accuracy = round(face.score[0], 2) if face.score else 0.0
-                functions.rect_corners(frame, face_rect, (121, 44, 250), th=3)
                 try:
-                    distance = DistanceEstimator().distance_estimator(
-                        frame, face_rect, config.KNOWN_FACE_WIDTH, cv2.FONT_HERSHEY_PLAIN
-                    )
+                    distance = DistanceEstimator().estimate_distance(face_rect, frame_width, config.KNOWN_FACE_WIDTH)
                 except Exception as e:
                     logging.error(f"Face distance estimation failed: {e}")
                     distance = None
-                return distance
-        return None
-
-
+                faces.append(FaceDetection(face_rect, accuracy, distance))
+        return faces
@@ -1,3 +1,4 @@
+import numpy as np
 import config
 from utils.helper_func import HelperFunc
 import logging
@@ -17,12 +18,21 @@ class DistanceEstimator:
             return 0
         return (known_face_width_cm * focal_length) / face_height_in_frame_px
 
+    def focal_length(self, frame_width):
+        """Return the focal length in pixels for a frame width, scaled from the calibration resolution."""
+
+        return config.FOCAL_LENGTH * frame_width / config.FOCAL_LENGTH_REFERENCE_WIDTH
+
+    def estimate_distance(self, face_rect, frame_width, known_face_width):
+        """Estimates the distance to a face from its bounding box in a frame of the given width."""
+
+        return self.calc_dist(self.focal_length(frame_width), known_face_width, face_rect[3])
+
     def distance_estimator(self, frame, face_rect, known_face_width, font):
         """ Estimates the distance to a face in the frame and displays it on the frame."""
 
         x, y, w, h = face_rect
-        focal = config.FOCAL_LENGTH
-        distance = self.calc_dist(focal, known_face_width, h)
+        distance = self.estimate_distance(face_rect, frame.shape[1], known_face_width)
         functions.text_with_background(
             frame,
             f"Distance: {int(distance)}cm",
@@ -31,3 +41,116 @@ class DistanceEstimator:
             color=(121, 44, 250),
         )
         return distance
+
+
+class DistanceTracker:
+    """
+    Constant-velocity Kalman filter over the distance to the operator (cm).
+    Fuses face-box and shoulder-width distance measurements, each weighted by its relative
+    noise, and reports a confidence that decays while no measurement arrives.
+    """
+
+    def __init__(self, accel_std=config.DISTANCE_ACCEL_STD, gate=config.DISTANCE_GATE,
+                 max_rel_std=config.DISTANCE_MAX_REL_STD):
+        self.accel_std = accel_std
+        self.gate = gate
+        self.max_rel_std = max_rel_std
+        self.reset()
+
+    def reset(self):
+        """Forget the current estimate."""
+        self.x = None  # [distance cm, velocity cm/s]
+        self.P = None
+        self.t = None
+        self.rejected = 0
+
+    def _predict(self, timestamp):
+        dt = max(timestamp - self.t, 0.0)
+        F = np.array([[1.0, dt], [0.0, 1.0]])
+        q = self.accel_std ** 2
+        Q = q * np.array([[dt ** 4 / 4, dt ** 3 / 2], [dt ** 3 / 2, dt ** 2]])
+        self.x = F @ self.x
+        self.P = F @ self.P @ F.T + Q
+        self.t = timestamp
+
+    def add_measurement(self, distance, rel_std, timestamp):
+        """Fuse a distance measurement whose standard deviation is rel_std * distance."""
+        if distance is None or distance <= 0:
+            return
+        R = (rel_std * distance) ** 2
+        if self.x is None or self.rejected >= 3:
+            # (Re)initialize on the first measurement or after repeated outliers (e.g. a different face)
+            self.x = np.array([distance, 0.0])
+            self.P = np.diag([R, self.accel_std ** 2])
+            self.t = timestamp
+            self.rejected = 0
+            return
+        self._predict(timestamp)
+        innovation = distance - self.x[0]
+        S = self.P[0, 0] + R
+        if innovation * innovation / S > self.gate ** 2:
+            self.rejected += 1
+            return
+        self.rejected = 0
+        K = self.P[:, 0] / S
+        self.x = self.x + K * innovation
+        self.P = self.P - np.outer(K, self.P[0, :])
+
+    def add_face(self, face_distance, timestamp):
+        """Fuse a distance estimated from the face-box height."""
+        self.add_measurement(face_distance, config.DISTANCE_FACE_REL_STD, timestamp)
+
+    def add_shoulders(self, shoulder_width_px, timestamp, frame_width=config.FOCAL_LENGTH_REFERENCE_WIDTH):
+        """Fuse a distance estimated from the pose shoulder width in pixels."""
+        if shoulder_width_px is None or shoulder_width_px <= 0:
+            return
+        estimator = DistanceEstimator()
+        distance = estimator.calc_dist(estimator.focal_length(frame_width), config.KNOWN_SHOULDER_WIDTH, shoulder_width_px)
+        self.add_measurement(distance, config.DISTANCE_SHOULDER_REL_STD, timestamp)
+
+    def estimate(self, timestamp):
+        """Return (distance cm, confidence 0..1) predicted to timestamp, or (0, 0.0) before any measurement."""
+        if self.x is None:
+            return 0, 0.0
+        self._predict(timestamp)
+        distance = max(float(self.x[0]), 0.0)
+        if distance == 0:
+            return 0, 0.0
+        rel_std = np.sqrt(self.P[0, 0]) / distance
+        confidence = float(np.clip(1.0 - rel_std / self.max_rel_std, 0.0, 1.0))
+        return distance, confidence
+
+
+class GestureModeSelector:
+    """
+    Chooses hand (1) or body (2) gesture mode from the filtered distance with hysteresis
+    around the switch distance and a minimum dwell time in each mode.
+    """
+
+    def __init__(self, switch_distance=config.GESTURE_SWITCH_DISTANCE, band=config.GESTURE_SWITCH_HYSTERESIS,
+                 min_dwell=config.GESTURE_SWITCH_MIN_DWELL, min_confidence=config.GESTURE_SWITCH_MIN_CONFIDENCE):
+        self.switch_distance = switch_distance
+        self.band = band
+        self.min_dwell = min_dwell
+        self.min_confidence = min_confidence
+        self.mode = None
+        self.mode_since = None
+
+    def update(self, distance, confidence, timestamp):
+        """Return the gesture mode for this frame."""
+        if self.mode is None:
+            self.mode = 1 if distance < self.switch_distance else 2
+            self.mode_since = timestamp
+            return self.mode
+        if timestamp - self.mode_since < self.min_dwell or confidence < self.min_confidence:
+            return self.mode
+        if self.mode == 1 and distance > self.switch_distance + self.band:
+            self._switch(2, distance, timestamp)
+        elif self.mode == 2 and distance < self.switch_distance - self.band:
+            self._switch(1, distance, timestamp)
+        return self.mode
+
+    def _switch(self, mode, distance, timestamp):
+        logging.info(f"Gesture mode {self.mode} -> {mode} at {distance:.0f}cm")
+        self.mode = mode
+        self.mode_since = timestamp
@@ -1,21 +1,45 @@
-import time
 import logging
 from utils.dronekit_func import Dronekit_Func
+from utils.connection_manager import LinkLostError
+from utils.continuous_control import FollowController, PalmController
+from utils.mission_macros import MissionRunner, load_macros
 from dronekit import LocationGlobalRelative
 import config
+from utils.metrics import metrics
 
 class Drone_Movement:
     """Class for controlling drone movements using DroneKit.
     It provides methods to move the drone in various directions, take off, land, and perform other actions based on gestures."""
 
-    def __init__(self):
-        """Initializes the Drone_Movement class with a Dronekit_Func instance."""
-        self.dronekit_functions = Dronekit_Func(
-            config.DRONEKIT_CONNECTION_STRING,
-            wait_ready=config.DRONEKIT_WAIT_READY,
-            baud=config.DRONEKIT_BAUD
-        )
-        self.uav = self.dronekit_functions.vehicle
+    def __init__(self, dronekit_functions=None):
+        """Initializes the Drone_Movement class with a Dronekit_Func instance (connected from config if not given)."""
+        if dronekit_functions is None:
+            dronekit_functions = Dronekit_Func(
+                config.DRONEKIT_CONNECTION_STRING,
+                wait_ready=config.DRONEKIT_WAIT_READY,
+                baud=config.DRONEKIT_BAUD
+            )
+        self.dronekit_functions = dronekit_functions
+        self.follow_controller = FollowController(self.dronekit_functions)
+        self.palm_controller = PalmController(self.dronekit_functions)
+        # Gestures bound to a macro in config.GESTURE_MACROS fly it as a mission instead of their single move
+        self.macros = load_macros()
+        self.mission_runner = MissionRunner(self.dronekit_functions)
+
+    @property
+    def uav(self):
+        """The connected vehicle; replaced when the connection manager reconnects."""
+        return self.dronekit_functions.vehicle
+
+    def wait(self, seconds):
+        """Sleep while polling a movement, failing fast with LinkLostError when the link is stale."""
+        self.dronekit_functions.wait(seconds)
+
+    def stop_continuous_control(self):
+        """Stops any running continuous-control mode (follow, palm) or macro mission so another command can take over."""
+        self.follow_controller.stop()
+        self.palm_controller.stop()
+        self.mission_runner.stop()
 
     def move(self, gesture_id):
         """Dispatches the gesture to the corresponding drone movement method using config.GESTURES."""
@@ -23,12 +47,37 @@ class Drone_Movement:
         if not gesture_name or gesture_name == "no_class":
             logging.info(f"No movement for gesture_id: {gesture_id} ({gesture_name})")
             return None
-        method = getattr(self, gesture_name, None)
+        if gesture_name in self.macros:
+            macro = self.macros[gesture_name]
+            method = lambda: self.run_macro(macro)
+        else:
+            method = getattr(self, gesture_name, None)
         if callable(method):
-            return method()
+            # Flight commands (including any gesture bound to a macro) take over from continuous control and
+            # running missions; camera gestures run alongside them
+            if gesture_name not in ('follow', 'palm') and (gesture_name in self.macros
+                                                           or gesture_name not in config.MEDIA_GESTURES):
+                self.stop_continuous_control()
+            metrics.count('commands_dispatched_total')
+            try:
+                self.dronekit_functions.connection.ensure_link()
+                with metrics.timer('command_dispatch_seconds'):
+                    return method()
+            except LinkLostError as e:
+                logging.error(f"Gesture {gesture_name} aborted: {e}")
+                return False
         logging.warning(f"No method found for gesture: {gesture_name}")
         return None
 
+    def run_macro(self, macro):
+        """Flies a gesture macro as an uploaded mission; returns once the autopilot started it in AUTO."""
+
+        logging.info(f"Macro {macro.name} triggered.")
+        if not self.uav.armed:
+            logging.warning(f"Cannot run macro {macro.name}: vehicle not armed.")
+            return False
+        return self.mission_runner.start(macro)
+
     def up(self):
         """Moves the drone up by a default distance defined in config."""
 
@@ -41,10 +90,10 @@ class Drone_Movement:
         desired_alt = k.alt + meters_up
         cmd = LocationGlobalRelative(k.lat, k.lon, desired_alt)
         self.uav.simple_goto(cmd)
-        time.sleep(0.1)
-        while self.uav.location.global_relative_frame.alt < desired_alt - 0.2:
-            logging.info("Ascending...")
-            time.sleep(0.5)
+        logging.info("Ascending...")
+        self.dronekit_functions.wait_for(
+            'location.global_relative_frame',
+            lambda uav: uav.location.global_relative_frame.alt >= desired_alt - 0.2)
         logging.info("Reached desired altitude.")
         return True
 
@@ -63,9 +112,10 @@ class Drone_Movement:
         desired_alt = max(0, k.alt - meters_down)
         cmd = LocationGlobalRelative(k.lat, k.lon, desired_alt)
         self.uav.simple_goto(cmd)
-        while self.uav.location.global_relative_frame.alt > desired_alt + 0.2:
-            logging.info("Descending...")
-            time.sleep(0.5)
+        logging.info("Descending...")
+        self.dronekit_functions.wait_for(
+            'location.global_relative_frame',
+            lambda uav: uav.location.global_relative_frame.alt <= desired_alt + 0.2)
         logging.info("Reached desired altitude.")
         return True
 
@@ -81,7 +131,7 @@ class Drone_Movement:
         distance = config.DEFAULT_MOVE_DISTANCE
         des_time = int(distance / speed)
         self.dronekit_functions.send_ned_velocity(0, -speed, 0, des_time)
-        time.sleep(des_time+0.5)  
+        self.wait(des_time+0.5)  
         logging.info("Move right complete.")
         return True
 
@@ -97,7 +147,7 @@ class Drone_Movement:
         distance = config.DEFAULT_MOVE_DISTANCE
         des_time = int(distance / speed)
         self.dronekit_functions.send_ned_velocity(0, speed, 0, des_time)
-        time.sleep(des_time+0.5)  
+        self.wait(des_time+0.5)  
         logging.info("Move left complete.")
         return True
 
@@ -113,7 +163,7 @@ class Drone_Movement:
         distance = config.DEFAULT_MOVE_DISTANCE
         des_time = int(distance / speed)
         self.dronekit_functions.send_ned_velocity(-speed, 0, 0, des_time)
-        time.sleep(des_time+0.5) 
+        self.wait(des_time+0.5) 
         logging.info("Move further complete.")
         return True
 
@@ -130,7 +180,7 @@ class Drone_Movement:
         distance = config.DEFAULT_MOVE_DISTANCE
         des_time = int(distance / speed)
         self.dronekit_functions.send_ned_velocity(speed, 0, 0, des_time)
-        time.sleep(des_time+0.5)  
+        self.wait(des_time+0.5)  
         logging.info("Move closer complete.")
         return True
 
@@ -144,11 +194,10 @@ class Drone_Movement:
         self.uav.mode = "LAND"
 
         logging.info("Vehicle mode set to LAND.")
-        while self.uav.location.global_relative_frame.alt > 0.5:
-            logging.info(f"Current altitude: {self.uav.location.global_relative_frame.alt}")
-            time.sleep(1)
-            if not self.uav.armed:
-                break
+        # Woken by position updates; disarming on touchdown also ends the wait
+        self.dronekit_functions.wait_for(
+            'location.global_relative_frame',
+            lambda uav: uav.location.global_relative_frame.alt <= 0.5 or not uav.armed)
         logging.info("Landing completed.")
         return True
 
@@ -158,11 +207,9 @@ class Drone_Movement:
         logging.info("Takeoff initiated.")
         take_off_alt = config.DEFAULT_TAKEOFF_ALTITUDE
         self.dronekit_functions.arm_and_takeoff(take_off_alt)
-        while True:
-            current_alt = self.uav.location.global_relative_frame.alt
-            if current_alt >= take_off_alt * 0.8:
-                break
-            time.sleep(1)
+        self.dronekit_functions.wait_for(
+            'location.global_relative_frame',
+            lambda uav: uav.location.global_relative_frame.alt >= take_off_alt * 0.8)
         return True
 
     def photo(self):
@@ -216,10 +263,12 @@ class Drone_Movement:
             logging.warning("Cannot initiate follow mode: vehicle not armed.")
             return False
         logging.info("Follow mode initiated.")
+        self.palm_controller.stop()
+        self.mission_runner.stop()
 
-        # TODO: Implement follow mode logic here
-        # follow mode will be desgigned to follow a person or object
-
+        # Image processing feeds the locked operator's bearing and distance to the follow controller,
+        # which streams yaw and velocity setpoints at a fixed rate until another gesture is dispatched
+        self.follow_controller.start()
         return True
 
     def palm(self):
@@ -229,10 +278,12 @@ class Drone_Movement:
             logging.warning("Cannot initiate palm mode: vehicle not armed.")
             return False
         logging.info("Palm mode initiated.")
+        self.follow_controller.stop()
+        self.mission_runner.stop()
 
-        # TODO: Implement palm mode logic here
-        # palm mode only available for hand gesture, and will be desgigned to move the drone in 3D space based on palm position
-
+        # Palm mode is only available for hand gestures: image processing feeds the hand landmarks to the
+        # palm controller, which streams velocity setpoints at a fixed rate until another gesture is dispatched
+        self.palm_controller.start()
         return True
 
 
@@ -1,14 +1,126 @@
 import time, math
 
-from dronekit import connect, VehicleMode, LocationGlobal, LocationGlobalRelative
+from dronekit import VehicleMode, LocationGlobal, LocationGlobalRelative
 from pymavlink import mavutil  
 import logging
+import threading
+import config
+from utils.metrics import metrics
+from utils.rolling_stats import RateCounter
+from utils.connection_manager import ConnectionManager
+from utils.mavlink_templates import MessageTemplates, SetpointCoalescer, POSITION_MASK, VELOCITY_MASK
 
 logging.basicConfig(level=logging.INFO)
 class Dronekit_Func:
     def __init__(self, serial_address, wait_ready=False, baud = 57600):
-        
-        self.vehicle = connect(serial_address, baud=baud, wait_ready=wait_ready)
+
+        # Templates are patched in place, so patch-and-send is serialized between threads
+        self._send_lock = threading.RLock()
+        self.templates = None
+        self.coalescer = SetpointCoalescer()
+        self.message_rate = RateCounter()
+        self.connection = ConnectionManager(serial_address, baud=baud, wait_ready=wait_ready, on_connect=self._on_connect)
+        self.connection.start()
+        metrics.register_collector(self.mavlink_stats)
+        metrics.register_collector(self.connection.gauges)
+
+    @property
+    def vehicle(self):
+        """The currently connected DroneKit vehicle (None while reconnecting)."""
+        return self.connection.vehicle
+
+    def _on_connect(self, vehicle):
+        """Rebuild the message templates for a new connection."""
+        with self._send_lock:
+            self.templates = MessageTemplates(vehicle.message_factory)
+            self.coalescer.reset()
+
+    def wait(self, seconds):
+        """Sleep between polls of a blocking command, raising LinkLostError if the link is stale."""
+        self.connection.ensure_link()
+        time.sleep(seconds)
+
+    def wait_for(self, attribute, condition, timeout=None):
+        """
+        Block until condition(vehicle) holds, re-checking it whenever DroneKit reports an update of attribute
+        (e.g. 'armed', 'location.global_relative_frame') instead of sleeping on a fixed poll interval.
+        Raises LinkLostError if the link goes stale meanwhile; returns False if timeout seconds elapse.
+        """
+        vehicle = self.vehicle
+        updated = threading.Event()
+
+        def on_update(_vehicle, _name, _value):
+            updated.set()
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        vehicle.add_attribute_listener(attribute, on_update)
+        try:
+            while True:
+                updated.clear()
+                if condition(vehicle):
+                    return True
+                self.connection.ensure_link()
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                updated.wait(config.CONNECTION_CHECK_INTERVAL)
+        finally:
+            vehicle.remove_attribute_listener(attribute, on_update)
+
+    def send_mavlink(self, msg):
+        """Send a MAVLink message to the vehicle, timing the send and counting messages.
+        Raises LinkLostError instead of queueing messages on a stale link."""
+        self.connection.ensure_link()
+        with metrics.timer('mavlink_send_seconds'):
+            self.vehicle.send_mavlink(msg)
+        metrics.count('mavlink_messages_total')
+        self.message_rate.tick()
+
+    def mavlink_stats(self):
+        """Messages per second sent to the vehicle and the number of coalesced setpoints."""
+        return {
+            'mavlink_messages_per_second': round(self.message_rate.rate(), 2),
+            'mavlink_coalesced_setpoints': self.coalescer.coalesced,
+        }
+
+    def send_command_long(self, command, *params):
+        """Send a COMMAND_LONG from its template, patching params 1-7 (missing params are 0)."""
+        params = tuple(params) + (0,) * (7 - len(params))
+        with self._send_lock:
+            self.connection.ensure_link()
+            start = time.perf_counter()
+            msg = self.templates.command_long(command)
+            (msg.param1, msg.param2, msg.param3, msg.param4, msg.param5, msg.param6, msg.param7) = params
+            metrics.observe('mavlink_encode_seconds', time.perf_counter() - start)
+            self.send_mavlink(msg)
+
+    def send_local_ned(self, frame, type_mask, position=(0, 0, 0), velocity=(0, 0, 0), stream=None):
+        """
+        Send a SET_POSITION_TARGET_LOCAL_NED from its template, patching position and velocity.
+        With a stream name, a setpoint identical to the last one on that stream is coalesced (not sent)
+        until the keep-alive interval elapsed. Returns True if the message was sent.
+        """
+        with self._send_lock:
+            self.connection.ensure_link()
+            if stream is not None and not self.coalescer.should_send((stream, frame, type_mask), (position, velocity)):
+                return False
+            start = time.perf_counter()
+            msg = self.templates.local_ned(frame, type_mask)
+            msg.x, msg.y, msg.z = position
+            msg.vx, msg.vy, msg.vz = velocity
+            metrics.observe('mavlink_encode_seconds', time.perf_counter() - start)
+            self.send_mavlink(msg)
+            return True
+
+    def send_global_int(self, frame, type_mask, position=(0, 0, 0), velocity=(0, 0, 0)):
+        """Send a SET_POSITION_TARGET_GLOBAL_INT from its template, patching (lat_int, lon_int, alt) and velocity."""
+        with self._send_lock:
+            self.connection.ensure_link()
+            start = time.perf_counter()
+            msg = self.templates.global_int(frame, type_mask)
+            msg.lat_int, msg.lon_int, msg.alt = position
+            msg.vx, msg.vy, msg.vz = velocity
+            metrics.observe('mavlink_encode_seconds', time.perf_counter() - start)
+            self.send_mavlink(msg)
 
     def arm_and_takeoff(self, aTargetAltitude):
         """
@@ -20,16 +132,15 @@ class Dronekit_Func:
             logging.info("Waiting for vehicle to initialise...")
             self.vehicle.mode = "GUIDED"
             logging.info(self.vehicle.mode)
-            time.sleep(1)
+            self.wait(1)
 
         logging.info("Arming motors")
         # Copter should arm in GUIDED mode
         self.vehicle.mode = VehicleMode("GUIDED")
         self.vehicle.armed = True
 
-        while not self.vehicle.armed:
-            logging.info("Waiting for arming...")
-            time.sleep(1)
+        logging.info("Waiting for arming...")
+        self.wait_for('armed', lambda vehicle: vehicle.armed)
 
         logging.info("Taking off!")
         self.vehicle.simple_takeoff(aTargetAltitude)  # Take off to target altitude
@@ -37,17 +148,13 @@ class Dronekit_Func:
         # Wait until the vehicle reaches a safe height before processing the goto (otherwise the command
         #  after Vehicle.simple_takeoff will execute immediately).
 
-        while True:
-            logging.info(f"Altitude: {self.vehicle.location.global_relative_frame.alt}")
-            if (
-                self.vehicle.location.global_relative_frame.alt
-                >= aTargetAltitude * 0.95
-            ):  # Trigger just below target alt.
-                logging.info("Reached target altitude")
-                break
-            time.sleep(1)
+        self.wait_for(
+            'location.global_relative_frame',
+            lambda vehicle: vehicle.location.global_relative_frame.alt >= aTargetAltitude * 0.95,
+        )  # Trigger just below target alt.
+        logging.info("Reached target altitude")
 
-    def condition_yaw(self, heading, relative=False):
+    def condition_yaw(self, heading, relative=False, settle=0.2):
         """
         Send MAV_CMD_CONDITION_YAW message to point vehicle at a specified heading (in degrees).
 
@@ -60,29 +167,26 @@ class Dronekit_Func:
 
         For more information see:
         http://copter.ardupilot.com/wiki/common-mavlink-mission-command-messages-mav_cmd/#mav_cmd_condition_yaw
-        
+
+        A negative relative heading turns counter-clockwise. `settle` is the time to wait after sending;
+        pass 0 when streaming yaw commands from a fixed-rate control loop.
         """
+        direction = 1
         if relative:
             is_relative = 1  # yaw relative to direction of travel
+            if heading < 0:
+                direction = -1
+                heading = -heading
         else:
             is_relative = 0  # yaw is an absolute angle
-        # create the CONDITION_YAW command using command_long_encode()
-        msg = self.vehicle.message_factory.command_long_encode(
-            0,
-            0,  # target system, target component
-            mavutil.mavlink.MAV_CMD_CONDITION_YAW,  # command
-            0,  # confirmation
-            heading,  # param 1, yaw in degrees
-            0,  # param 2, yaw speed deg/s
-            1,  # param 3, direction -1 ccw, 1 cw
-            is_relative,  # param 4, relative offset 1, absolute angle 0
-            0,
-            0,
-            0,
-        )  # param 5 ~ 7 not used
-        # send command to vehicle
-        self.vehicle.send_mavlink(msg)
-        time.sleep(0.2)
+        # send the CONDITION_YAW command from the COMMAND_LONG template
+        self.send_command_long(mavutil.mavlink.MAV_CMD_CONDITION_YAW,
+                               heading,  # param 1, yaw in degrees
+                               0,  # param 2, yaw speed deg/s
+                               direction,  # param 3, direction -1 ccw, 1 cw
+                               is_relative)  # param 4, relative offset 1, absolute angle 0; params 5 ~ 7 not used
+        if settle:
+            time.sleep(settle)
         
     def set_roi(self, location):
         """
@@ -94,21 +198,9 @@ class Dronekit_Func:
         http://copter.ardupilot.com/common-mavlink-mission-command-messages-mav_cmd/#mav_cmd_do_set_roi
         """
         # create the MAV_CMD_DO_SET_ROI command
-        msg = self.vehicle.message_factory.command_long_encode(
-            0,
-            0,  # target system, target component
-            mavutil.mavlink.MAV_CMD_DO_SET_ROI,  # command
-            0,  # confirmation
-            0,
-            0,
-            0,
-            0,  # params 1-4
-            location.lat,
-            location.lon,
-            location.alt,
-        )
-        # send command to vehicle
-        self.vehicle.send_mavlink(msg)
+        self.send_command_long(mavutil.mavlink.MAV_CMD_DO_SET_ROI,
+                               0, 0, 0, 0,  # params 1-4
+                               location.lat, location.lon, location.alt)
 
     def get_location_metres(self, original_location, dNorth, dEast):
         """
@@ -179,26 +271,8 @@ class Dronekit_Func:
         See the above link for information on the type_mask (0=enable, 1=ignore).
         At time of writing, acceleration and yaw bits are ignored.
         """
-        msg = self.vehicle.message_factory.set_position_target_global_int_encode(
-            0,  # time_boot_ms (not used)
-            0,
-            0,  # target system, target component
-            mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT,  # frame
-            0b0000111111111000,  # type_mask (only speeds enabled)
-            aLocation.lat * 1e7,  # lat_int - X Position in WGS84 frame in 1e7 * meters
-            aLocation.lon * 1e7,  # lon_int - Y Position in WGS84 frame in 1e7 * meters
-            aLocation.alt,  # alt - Altitude in meters in AMSL altitude, not WGS84 if absolute or relative, above terrain if GLOBAL_TERRAIN_ALT_INT
-            0,  # X velocity in NED frame in m/s
-            0,  # Y velocity in NED frame in m/s
-            0,  # Z velocity in NED frame in m/s
-            0,
-            0,
-            0,  # afx, afy, afz acceleration (not supported yet, ignored in GCS_Mavlink)
-            0,
-            0,
-        )  # yaw, yaw_rate (not supported yet, ignored in GCS_Mavlink)
-        # send command to vehicle
-        self.vehicle.send_mavlink(msg)
+        self.send_global_int(mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT, POSITION_MASK,
+                             position=(int(aLocation.lat * 1e7), int(aLocation.lon * 1e7), aLocation.alt))
 
     def goto_position_target_local_ned(self, north, east, down):
         """
@@ -216,26 +290,7 @@ class Dronekit_Func:
         At time of writing, acceleration and yaw bits are ignored.
 
         """
-        msg = self.vehicle.message_factory.set_position_target_local_ned_encode(
-            0,  # time_boot_ms (not used)
-            0,
-            0,  # target system, target component
-            mavutil.mavlink.MAV_FRAME_LOCAL_NED,  # frame
-            0b0000111111111000,  # type_mask (only positions enabled)
-            north,
-            east,
-            down,  # x, y, z positions (or North, East, Down in the MAV_FRAME_BODY_NED frame
-            0,
-            0,
-            0,  # x, y, z velocity in m/s  (not used)
-            0,
-            0,
-            0,  # x, y, z acceleration (not supported yet, ignored in GCS_Mavlink)
-            0,
-            0,
-        )  # yaw, yaw_rate (not supported yet, ignored in GCS_Mavlink)
-        # send command to vehicle
-        self.vehicle.send_mavlink(msg)
+        self.send_local_ned(mavutil.mavlink.MAV_FRAME_LOCAL_NED, POSITION_MASK, position=(north, east, down))
 
     def goto(self, dNorth, dEast):
         """
@@ -267,7 +322,16 @@ class Dronekit_Func:
             if remainingDistance <= 0.5:  # Just below target, in case of undershoot.
                 logging.info("Reached target")
                 break
-            time.sleep(2)
+            self.wait(2)
+
+    def set_ned_velocity(self, velocity_x, velocity_y, velocity_z, frame=mavutil.mavlink.MAV_FRAME_LOCAL_NED):
+        """
+        Send a single SET_POSITION_TARGET_LOCAL_NED velocity setpoint without waiting.
+
+        Use MAV_FRAME_BODY_OFFSET_NED for velocities relative to the vehicle heading. The setpoint has to be
+        re-sent continuously (see send_ned_velocity), which is what the fixed-rate controllers do.
+        """
+        self.send_local_ned(frame, VELOCITY_MASK, velocity=(velocity_x, velocity_y, velocity_z), stream='velocity')
 
     def send_ned_velocity(self, velocity_x, velocity_y, velocity_z, duration):
         """
@@ -286,28 +350,10 @@ class Dronekit_Func:
         See the above link for information on the type_mask (0=enable, 1=ignore).
         At time of writing, acceleration and yaw bits are ignored.
         """
-        msg = self.vehicle.message_factory.set_position_target_local_ned_encode(
-            0,  # time_boot_ms (not used)
-            0,
-            0,  # target system, target component
-            mavutil.mavlink.MAV_FRAME_LOCAL_NED,  # frame
-            0b0000111111000111,  # type_mask (only speeds enabled)
-            0,
-            0,
-            0,  # x, y, z positions (not used)
-            velocity_x,
-            velocity_y,
-            velocity_z,  # x, y, z velocity in m/s
-            0,
-            0,
-            0,  # x, y, z acceleration (not supported yet, ignored in GCS_Mavlink)
-            0,
-            0,
-        )  # yaw, yaw_rate (not supported yet, ignored in GCS_Mavlink)
-
         # send command to vehicle on 1 Hz cycle
         for x in range(0, duration):
-            self.vehicle.send_mavlink(msg)
+            self.send_local_ned(mavutil.mavlink.MAV_FRAME_LOCAL_NED, VELOCITY_MASK,
+                                velocity=(velocity_x, velocity_y, velocity_z))
             time.sleep(0.25)
 
     def send_global_velocity(self, velocity_x, velocity_y, velocity_z, duration):
@@ -326,29 +372,10 @@ class Dronekit_Func:
         See the above link for information on the type_mask (0=enable, 1=ignore).
         At time of writing, acceleration and yaw bits are ignored.
         """
-        msg = self.vehicle.message_factory.set_position_target_global_int_encode(
-            0,  # time_boot_ms (not used)
-            0,
-            0,  # target system, target component
-            mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT,  # frame
-            0b0000111111000111,  # type_mask (only speeds enabled)
-            0,  # lat_int - X Position in WGS84 frame in 1e7 * meters
-            0,  # lon_int - Y Position in WGS84 frame in 1e7 * meters
-            0,  # alt - Altitude in meters in AMSL altitude(not WGS84 if absolute or relative)
-            # altitude above terrain if GLOBAL_TERRAIN_ALT_INT
-            velocity_x,  # X velocity in NED frame in m/s
-            velocity_y,  # Y velocity in NED frame in m/s
-            velocity_z,  # Z velocity in NED frame in m/s
-            0,
-            0,
-            0,  # afx, afy, afz acceleration (not supported yet, ignored in GCS_Mavlink)
-            0,
-            0,
-        )  # yaw, yaw_rate (not supported yet, ignored in GCS_Mavlink)
-
         # send command to vehicle on 1 Hz cycle
         for x in range(0, duration):
-            self.vehicle.send_mavlink(msg)
+            self.send_global_int(mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT, VELOCITY_MASK,
+                                 velocity=(velocity_x, velocity_y, velocity_z))
             time.sleep(1)
 
 
@@ -0,0 +1,54 @@
+import datetime
+import threading
+import config
+
+
+class FlightStatus:
+    """
+    Computes the status values shown to the operator (altitude, speed, flight time, distance, gesture,
+    arm state and link health) from the image processing controller. Shared by the GUI and the stream
+    server, so both show the same flight time; safe to call from several threads.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.flight_begin = None
+        self.current_gesture = '-'
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """Return the current status as a dict of display values."""
+        controller = self.controller
+        armed = controller.get_arm_status()
+        gesture_type = controller.get_gesture_type()
+        now = datetime.datetime.now()
+        with self._lock:
+            # The flight timer starts at the first arming
+            if armed and self.flight_begin is None:
+                self.flight_begin = now
+            flight_time = '00:00'
+            if armed and self.flight_begin is not None:
+                flight_time = str(now - self.flight_begin)[2:7]
+
+            if gesture_type == 1:
+                gesture_id = controller.get_hand_gesture_id()
+                self.current_gesture = config.GESTURES[gesture_id].upper() if gesture_id else '-'
+            elif gesture_type == 2:
+                gesture_id = controller.get_body_gesture_id()
+                self.current_gesture = config.GESTURES[gesture_id].upper() if gesture_id else '-'
+            current_gesture = self.current_gesture
+
+        return {
+            'altitude': round(controller.get_altitude() or 0, 1),
+            'speed': round(controller.get_speed() or 0, 1),
+            'flight_time': flight_time,
+            'distance': round(controller.get_distance(), 1),
+            'gesture_type': config.GESTURE_TYPES[gesture_type].upper() if gesture_type else '-',
+            'gesture': current_gesture,
+            # 1 armed, 2 disarmed, 0 unknown (no arm state received yet)
+            'arm_status': 1 if armed else (2 if armed is not None else 0),
+            'link': controller.get_link_health(),
+            'profile': controller.get_profile().name,
+            'fps': round(controller.get_frame_stats().processing_fps(), 1),
+            'mission': controller.get_mission_progress(),
+        }
@@ -0,0 +1,59 @@
+import config
+
+
+def required_frames(temporal, fps):
+    """Consecutive detections needed to confirm a gesture: the temporal model's count, otherwise about one second of frames."""
+    if temporal:
+        return config.TEMPORAL_CONFIRM_FRAMES
+    return max(1, int(fps))
+
+
+class GestureDebouncer:
+    """
+    Confirms a gesture once the same gesture id has been detected on enough consecutive frames.
+    """
+
+    def __init__(self):
+        self.last_gesture_id = None
+        self.count = 0
+
+    def reset(self):
+        """Forget the gesture currently being counted."""
+        self.last_gesture_id = None
+        self.count = 0
+
+    def update(self, gesture_id, required_frames):
+        """
+        Count a frame's detection (None when nothing was detected).
+        Returns the gesture id when it has been seen on required_frames consecutive frames, otherwise None.
+        """
+        if gesture_id is None:
+            self.reset()
+            return None
+        if gesture_id == self.last_gesture_id:
+            self.count += 1
+        else:
+            self.count = 1
+            self.last_gesture_id = gesture_id
+        if self.count >= required_frames:
+            self.count = 0
+            return gesture_id
+        return None
+
+
+def gesture_decisions(predictions, model, required=int(config.VIDEO_FPS)):
+    """
+    Replay classifier predictions (None for frames without landmarks) through the accuracy threshold and a
+    debouncer. Returns the per-frame gesture id accepted by the threshold (None otherwise) and the ids confirmed.
+    """
+    debouncer = GestureDebouncer()
+    decisions, confirmed = [], []
+    for prediction in predictions:
+        decision = None
+        if prediction is not None:
+            class_id, accuracy = prediction.class_id, prediction.accuracy
+            if accuracy > config.GESTURE_ACCURACY_THRESHOLD and 0 <= class_id < len(model.labels):
+                decision = class_id
+        decisions.append(decision)
+        confirmed.append(debouncer.update(decision, required))
+    return decisions, confirmed
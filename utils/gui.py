@@ -1,6 +1,8 @@
 import argparse
 import customtkinter
 from tkinter import *
+import os
+import logging
 import config
 import cv2
 import datetime
@@ -8,6 +10,7 @@ import imutils
 from PIL import Image, ImageTk
 
 from utils.image_processing import ImageProcessingController
+from utils.metrics import metrics
 
 class GUI(customtkinter.CTk):
     """
@@ -24,14 +27,13 @@ class GUI(customtkinter.CTk):
         self.gestures = config.GESTURES  
         self.controller = image_pro
 
-        self.flight_begin = None
-        self.time_taken = False
-        self.gui_armstatus = 0
-        self.gui_curges = '-'
-
         self.title("Gesture Controlled Drone GUI")
         self.geometry("1200x700")
         self.bind('<Escape>', lambda e: self.quit())
+        self.protocol('WM_DELETE_WINDOW', self.quit)
+        self.bind(config.DEBUG_PANEL_KEY, lambda e: self.toggle_debug_panel())
+        self.bind(config.PROFILE_KEY, lambda e: self.toggle_profiler())
+        self.bind(config.PROFILE_CYCLE_KEY, lambda e: self.controller.cycle_profile())
         self.label_widget = Label(self, bd=3, bg='#8d2ac9')
         self.label_widget.pack(ipadx=0, ipady=0, expand=True)
         # Status labels (static)
@@ -65,6 +67,12 @@ class GUI(customtkinter.CTk):
         self.label_curges_value.place(relx=0.5, rely=0.5, x=-570, y=133)
         self.label_arm = customtkinter.CTkLabel(master=self, text="", fg_color='grey', text_color='white', width=200, height=30, corner_radius=8, anchor="center", font=('', 25))
         self.label_arm.place(relx=0.5, rely=0.5, x=-100, y=290)
+        self.label_link = customtkinter.CTkLabel(master=self, text="", fg_color='grey', text_color='white', width=170, height=50, corner_radius=8, anchor="center", font=('', 14))
+        self.label_link.place(relx=0.5, rely=0.5, x=400, y=240)
+
+        # Metrics debug panel (hidden until toggled)
+        self.debug_panel_visible = False
+        self.label_debug = customtkinter.CTkLabel(master=self, text="", fg_color='black', text_color='white', corner_radius=8, anchor='nw', justify='left', font=('Courier', 12))
 
     def run(self, frame_func, status_func):
         """Starts the GUI and sets up periodic updates for status and frame functions."""
@@ -73,7 +81,7 @@ class GUI(customtkinter.CTk):
         self.after(10000, frame_func)
         self.mainloop()
 
-    def status(self, altitude, speed, flight_time, dis_to_drone, ges_type, cur_ges, arm_status):
+    def status(self, altitude, speed, flight_time, dis_to_drone, ges_type, cur_ges, arm_status, link=None):
         """Updates the status labels with current values."""
 
         self.label_alt_value.configure(text=str(altitude))
@@ -88,6 +96,65 @@ class GUI(customtkinter.CTk):
             self.label_arm.configure(text='DISARMED', fg_color='red')
         else:
             self.label_arm.configure(text='UNKNOWN', fg_color='grey')
+        if link is not None:
+            self.link_status(link)
+
+    def link_status(self, link):
+        """Updates the link health label: state, heartbeat age, packet loss and message rate."""
+
+        colors = {'connected': 'green', 'stale': 'orange', 'connecting': 'red', 'disconnected': 'red'}
+        age = f"{link['heartbeat_age']:.1f}s" if link['heartbeat_age'] is not None else '-'
+        text = (f"LINK {link['state'].upper()}\n"
+                f"HB {age}  LOSS {link['packet_loss'] * 100:.1f}%  {link['messages_per_second']:.0f}/s")
+        self.label_link.configure(text=text, fg_color=colors.get(link['state'], 'grey'))
+
+    def toggle_debug_panel(self):
+        """Shows or hides the hot-path timing panel."""
+
+        self.debug_panel_visible = not self.debug_panel_visible
+        if self.debug_panel_visible:
+            self.label_debug.place(relx=0.0, rely=1.0, x=10, y=-10, anchor='sw')
+            self.update_debug_panel()
+        else:
+            self.label_debug.place_forget()
+
+    def update_debug_panel(self):
+        """Refreshes the debug panel with mean/p95 timings in milliseconds."""
+
+        if not self.debug_panel_visible:
+            return
+        stats = self.controller.get_frame_stats()
+        latency = stats.latency.summary()
+        lines = [
+            f"profile {self.controller.get_profile().name}  load level {self.controller.get_degradation_level()}",
+            f"camera {stats.camera_fps():.1f} fps  processing {stats.processing_fps():.1f} fps",
+            f"latency ms mean {latency['mean'] * 1000:.1f} p95 {latency['p95'] * 1000:.1f} max {latency['max'] * 1000:.1f}",
+        ]
+        gate = self.controller.get_motion_gate_report()
+        lines.append(f"motion gate skipped {gate['skip_ratio'] * 100:.0f}%  saved {gate['saved_seconds']:.1f}s CPU")
+        preroll = self.controller.get_preroll_stats()
+        if preroll is not None:
+            lines.append(f"pre-roll {preroll['seconds']:.1f}s {preroll['bytes'] / 1e6:.1f} MB  encode {preroll['encode_ms']:.1f} ms")
+        lines.append(f"{'timer':<28}{'n':>7}{'mean':>8}{'p95':>8}")
+        for name, timer in self.controller.get_metrics_summary().items():
+            lines.append(f"{name.replace('_seconds', ''):<28}{timer['count']:>7}{timer['mean'] * 1000:>8.2f}{timer['p95'] * 1000:>8.2f}")
+        if metrics.is_profiling():
+            lines.append("profiling...")
+        self.label_debug.configure(text="\n".join(lines))
+        self.after(1000, self.update_debug_panel)
+
+    def toggle_profiler(self):
+        """Starts the sampling profiler, or stops it and writes the report to the output directory."""
+
+        if not metrics.is_profiling():
+            metrics.start_profile('sampling')
+            return
+        report = metrics.stop_profile()
+        time_now = datetime.datetime.now()
+        profile_path = os.path.join(config.OUTPUT_DIR, f"profile_{time_now.strftime('%d-%m-%y-%I-%M-%S')}.txt")
+        with open(profile_path, 'w') as f:
+            f.write(report)
+        logging.info(f"Profile written to {profile_path}")
 
     def update_video(self):
         """Updates the video frame in the GUI."""
@@ -105,32 +172,9 @@ class GUI(customtkinter.CTk):
     def update_status(self):
         """Updates the status labels with current information."""
 
-        gui_alt = round(self.controller.get_altitude(),1) if hasattr(self.controller, "get_altitude") else 0
-        gui_speed = round(self.controller.get_speed(), 1) if hasattr(self.controller, "get_speed") else 0
-        armed = self.controller.get_arm_status() if hasattr(self.controller, "get_arm_status") else 0
-        
-        if armed and not self.time_taken:
-            self.gui_armstatus = 1
-            self.flight_begin = datetime.datetime.now()
-            self.time_taken = True
-        elif not armed:
-            self.gui_armstatus = 2
-
-        current_time = datetime.datetime.now()
-        gui_fltime = '00:00'
-        if armed and self.flight_begin:
-            flight_time = current_time - self.flight_begin
-            gui_fltime = str(flight_time)[2:7]
-
-        gui_dis = round(self.controller.get_distance(), 1) if hasattr(self.controller, "get_distance") else 0
-        gui_gestype = self.gesture_types[self.controller.get_gesture_type()].upper() if self.controller.get_gesture_type() else '-'
-
-        
-        if self.controller.get_gesture_type() == 1:
-            self.gui_curges = self.gestures[self.controller.get_hand_gesture_id()].upper() if self.controller.get_hand_gesture_id() else '-'
-        elif self.controller.get_gesture_type() == 2:
-            self.gui_curges = self.gestures[self.controller.get_body_gesture_id()].upper() if self.controller.get_body_gesture_id() else '-'
-
-        self.status(gui_alt, gui_speed, gui_fltime, gui_dis, gui_gestype, self.gui_curges, self.gui_armstatus)
+        # Computed by the controller's FlightStatus, which also backs the remote /status endpoint
+        status = self.controller.get_status()
+        self.status(status['altitude'], status['speed'], status['flight_time'], status['distance'],
+                    status['gesture_type'], status['gesture'], status['arm_status'], status['link'])
         self.after(500, self.update_status)
 
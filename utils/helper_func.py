@@ -42,6 +42,33 @@ class HelperFunc():
                     landmark_point.append([landmark_x, landmark_y])
         return landmark_point
 
+    def calc_landmark_array(self, image, landmarks, use_pose):
+        """Calculate the landmark points as a float (N, 2) array, keeping sub-pixel precision."""
+
+        image_width, image_height = image.shape[1], image.shape[0]
+        points = np.array([(landmark.x, landmark.y) for landmark in landmarks.landmark], dtype=np.float64)
+        if use_pose:
+            points = points[[11, 12, 13, 14, 15, 16]]  # arms landmark points
+        points *= (image_width, image_height)
+        np.minimum(points, (image_width - 1, image_height - 1), out=points)
+        return points
+
+    def pre_process_landmark_array(self, points):
+        """Vectorized pre_process_landmark for a float (N, 2) landmark array."""
+
+        flat = (np.asarray(points, dtype=np.float32) - points[0]).ravel()
+        max_value = np.max(np.abs(flat))
+        if max_value == 0:
+            return flat
+        return flat / max_value
+
+    def calc_shoulder_width(self, image, landmarks):
+        """Calculate the distance in pixels between the left and right shoulder pose landmarks."""
+
+        image_width, image_height = image.shape[1], image.shape[0]
+        left, right = landmarks.landmark[11], landmarks.landmark[12]
+        return float(np.hypot((left.x - right.x) * image_width, (left.y - right.y) * image_height))
+
     def pre_process_landmark(self, landmark_list):
         """Pre-process the landmark list by normalizing and centering it."""
 
@@ -80,10 +107,14 @@ class HelperFunc():
             [[x + w, (y + h) - h // DIV], [x + w, y + h], [(x + w) - w // DIV, y + h]], dtype=np.int32,
         )
         if draw_overlay:
-            overlay = image.copy()
-            cv2.rectangle(overlay, rect_points, color, -1)
-            new_img = cv2.addWeighted(overlay, opacity, image, 1 - opacity, 0)
-            image = new_img
+            # Blend only the rectangle's region in place instead of copying the whole frame
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + w + 1, image.shape[1]), min(y + h + 1, image.shape[0])
+            if x1 > x0 and y1 > y0:
+                roi = image[y0:y1, x0:x1]
+                fill = np.empty_like(roi)
+                fill[:] = color
+                cv2.addWeighted(fill, opacity, roi, 1 - opacity, 0, dst=roi)
         cv2.polylines(image, [bottom_left_corner], False, color, th)
         return image
 
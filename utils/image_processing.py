@@ -1,18 +1,30 @@
 import os
 import time
-import datetime
+import asyncio
 import logging
-import cv2
 import config
-from utils.cvfpscalc import CvFpsCalc
 from utils.drone_movement import Drone_Movement
 from utils.detectors import Detectors
+from utils.gesture_debouncer import GestureDebouncer, required_frames
+from utils.distance_estimation import DistanceTracker, GestureModeSelector
+from utils.detector_lifecycle import DetectorLifecycle
+from utils.camera_capture import CameraCapture
+from utils.inference_frames import InferenceFrames
+from utils.overlay import OverlayRenderer
+from utils.metrics import metrics
+from utils.rolling_stats import FrameStats
+from utils.operator_tracker import OperatorTracker
+from utils.flight_status import FlightStatus
+from utils.motion_gate import MotionGate
+from utils.photo_capture import FrameRing, PhotoService
+from utils.video_recorder import PrerollBuffer, VideoRecorder
+from utils.performance_profiles import get_profile, next_profile, apply_thread_settings, load_benchmark, degrade
+from utils.load_governor import LoadGovernor
 import config
 
 gesture_types = config.GESTURE_TYPES
 gestures = config.GESTURES
 
-drone_movement = Drone_Movement()
 detector = Detectors(config.DEFAULT_MIN_DETECTION_CONFIDENCE, config.DEFAULT_MIN_TRACKING_CONFIDENCE)
 
 class ImageProcessingController:
@@ -20,9 +32,11 @@ class ImageProcessingController:
     It manages the state of the drone, processes video frames, and handles gesture recognition.
     It also provides methods to control the drone based on detected gestures."""
 
-    def __init__(self):
+    def __init__(self, profile=None):
+        """profile names the performance profile to start with (config.PERFORMANCE_PROFILE by default)."""
         self.detector = detector
-        self.move_functions = drone_movement
+        # Connects to the vehicle in the background; commands fail fast until the link is up
+        self.move_functions = Drone_Movement()
         self.gesture_types = gesture_types
         self.gestures = gestures
 
@@ -31,146 +45,352 @@ class ImageProcessingController:
         self.hand_gesture_id = 0
         self.body_gesture_id = 0
         self.distance = 0
+        self.distance_confidence = 0.0
+        self.distance_tracker = DistanceTracker()
+        self.mode_selector = GestureModeSelector()
+        self.profile = get_profile(profile)
+        self.base_profile = self.profile # selected profile before load governor degradation
+        self.degradation = (0, {}) # (level, settings) from the load governor
+        self.pending_profile = None
+        self.detector.apply_profile(self.profile)
+        self.detector.model_registry.commit_pending()
+        apply_thread_settings(self.profile)
+        self.detector_lifecycle = DetectorLifecycle(self.detector, self.profile.standby_interval,
+                                                    self.profile.prewarm_interval)
+        self.frame_index = 0
+        self.operator_face = None
+        self.last_gesture = None
+        self.motion_gate = MotionGate()
         self.frame = None
         self.video_record = False
-        self.take_photo = False
+        self.gesture_confirmed_at = None # capture time of the frame that confirmed the last gesture
+        self.frame_ring = FrameRing()
+        self.photos = PhotoService(self.frame_ring)
+        self.recorder = VideoRecorder()
+        self.preroll = PrerollBuffer() if config.PREROLL_SECONDS > 0 else None
         self.stop_video_record = False
-        self.last_hand_gesture_id = None
-        self.hand_gesture_count = 0
-        self.last_body_gesture_id = None
-        self.body_gesture_count = 0
+        self.hand_debouncer = GestureDebouncer()
+        self.body_debouncer = GestureDebouncer()
         self.gui_frame = None
+        self.camera = None
+        self.runtime = None
+        self.gesture_event = None
+        self.stream = None # FrameStream of the remote viewer server, if streaming is enabled
+        self.flight_status = FlightStatus(self)
+        self.overlay = OverlayRenderer()
+        self.frame_stats = FrameStats()
+        self.operator_tracker = OperatorTracker()
+        metrics.register_collector(self.frame_stats.gauges)
+        metrics.register_collector(self.motion_gate.gauges)
+        if self.preroll is not None:
+            metrics.register_collector(self.preroll.gauges)
+        self.governor = LoadGovernor(self)
+        metrics.register_collector(self.governor.gauges)
+        self.log_profile()
 
-    def image_processing(self):
-        """Main loop for image processing and gesture detection."""
+    def required_frames(self, kind, fps):
+        """Number of consecutive detections needed to confirm a gesture of kind (about one second of frames)."""
+        return required_frames(self.detector.uses_temporal(kind), fps if fps > 0 else self.profile.video_fps)
 
-        cap = cv2.VideoCapture(config.VIDEO_CAPTURE_DEVICE)
-        indicator_pos = (30, 30)
-        photo_indicator_timer = 0
-        wait_for_pose = 5
-        
+    def start_capture(self):
+        """Opens the camera, starts the media workers and the model registry watcher."""
+
+        self.camera = CameraCapture(size=self.profile.video_size, fps=self.profile.video_fps,
+                                    rate=self.frame_stats.camera, ring=self.frame_ring).start()
+        self.frame_size = (self.camera.width, self.camera.height)
 
         if not os.path.exists(config.OUTPUT_DIR):
             os.makedirs(config.OUTPUT_DIR)
+        self.photos.start()
+        self.recorder.start_worker()
+        if self.preroll is not None:
+            self.preroll.start()
+        self.detector.model_registry.start()
+
+    def start_recording(self):
+        """Starts a new recording at the current capture size, beginning with the pre-roll frames."""
+
+        preroll = self.preroll.drain() if self.preroll is not None else []
+        self.recorder.start(self.frame_size, self.profile.video_fps, preroll)
+
+    def stop_capture(self):
+        """Stops the camera, the registry watcher and the media workers, finishing the current recording."""
+
+        if self.camera is not None:
+            self.camera.stop()
+        self.photos.stop()
+        self.detector.model_registry.stop()
+        self.recorder.close()
+        if self.preroll is not None:
+            self.preroll.stop()
+
+    def process_next_frame(self):
+        """Waits for the next camera frame and runs gesture detection on it. Returns False when the camera stopped."""
+
+        # Switch profiles and swap in hot-reloaded models only between frames
+        if self.pending_profile is not None:
+            self.apply_profile(self.pending_profile)
+        self.detector.model_registry.commit_pending()
+        metrics.profile_checkpoint()
+        captured = self.camera.read()
+        if captured is None:
+            return self.camera.is_opened()
+        self.process_frame(captured)
+        return True
+
+    def set_profile(self, name):
+        """Requests a switch to the performance profile called name; it is applied before the next frame."""
+
+        self.base_profile = get_profile(name)
+        self.pending_profile = degrade(self.base_profile, self.degradation[1])
+        logging.info(f"Switching to performance profile {name}")
+        return self.pending_profile
+
+    def cycle_profile(self):
+        """Requests a switch to the next configured performance profile."""
+
+        return self.set_profile(next_profile(self.base_profile.name).name)
+
+    def set_degradation(self, level, settings):
+        """Requests the selected profile lightened by a load governor level; it is applied before the next frame."""
+
+        self.degradation = (level, settings)
+        self.pending_profile = degrade(self.base_profile, settings)
+
+    def apply_profile(self, profile):
+        """Applies a performance profile on the vision thread, reopening the camera if the capture settings changed."""
+
+        self.pending_profile = None
+        previous, self.profile = self.profile, profile
+        self.detector.apply_profile(profile)
+        apply_thread_settings(profile)
+        self.detector_lifecycle.standby_interval = profile.standby_interval
+        self.detector_lifecycle.prewarm_interval = profile.prewarm_interval
+        if (profile.video_size, profile.video_fps) != (previous.video_size, previous.video_fps):
+            self.camera.stop()
+            self.camera = CameraCapture(size=profile.video_size, fps=profile.video_fps,
+                                        rate=self.frame_stats.camera, ring=self.frame_ring).start()
+            self.frame_size = (self.camera.width, self.camera.height)
+            # Operator boxes are in pixels of the old resolution; recording continues in a new file
+            self.operator_tracker.reset()
+            self.operator_face = None
+            self.motion_gate.reset()
+            if self.preroll is not None:
+                self.preroll.clear()
+            if self.recorder.is_recording():
+                self.start_recording()
+        if profile.name != previous.name:
+            self.log_profile()
+
+    def log_profile(self):
+        """Logs the active profile with its last benchmarked FPS, latency and CPU usage."""
+
+        measured = load_benchmark(self.profile.name)
+        if measured is None:
+            logging.info(f"Performance profile {self.profile.name} active (not benchmarked)")
+            return
+        logging.info(f"Performance profile {self.profile.name} active: benchmarked {measured['fps']:.1f} fps, "
+                     f"latency p95 {measured['latency']['p95_ms']:.1f} ms, CPU {measured['cpu_percent']:.0f}%")
+
+    def detect_operator(self, frames, now):
+        """
+        Runs face detection every profile.face_interval frames and feeds the operator's face to the distance
+        tracker. Returns (face, fresh): the operator's FaceDetection, reused from the last detection on skipped
+        frames, and whether it was detected on this frame.
+        """
+
+        self.frame_index += 1
+        if self.frame_index % self.profile.face_interval:
+            return self.operator_face, False
+        faces = self.detector.detect_faces(frames)
+        operator_index = self.operator_tracker.update(frames.frame, [f.rect for f in faces], now)
+        # Only the operator's face drives distance, mode switching and follow mode
+        self.operator_face = faces[operator_index] if operator_index is not None else None
+        self.distance_tracker.add_face(self.operator_face.distance if self.operator_face is not None else None, now)
+        return self.operator_face, True
+
+    def process_frame(self, captured):
+        """Runs detection, gesture confirmation, overlay, recording and photos for one captured frame."""
+
+        frame_start = time.perf_counter()
+        camera = self.camera
+        # Detection never draws, so the captured frame stays clean for recording and photos
+        frame = captured.image
+        record = frame
+
+        fps = self.frame_stats.processing_fps()
+        photo_indicator = self.photos.is_pending()
+
+        now = captured.timestamp
+        frames = InferenceFrames(frame, self.detector.inference_heights)
+        # While nothing moves around the operator, the previous frame's detections are reused
+        detect = self.motion_gate.should_detect(frame, self.operator_tracker.box, now)
+        detect_start = time.perf_counter()
+        face, fresh = self.detect_operator(frames, now) if detect else (self.operator_face, False)
+        self.distance, self.distance_confidence = self.distance_tracker.estimate(now)
+        if face is not None and fresh:
+            self.move_functions.follow_controller.update_target(
+                self.operator_tracker.target(camera.width), self.distance, now)
+        mode = self.mode_selector.update(self.distance, self.distance_confidence, now)
+        # The newly active graph has to run after a mode switch
+        detect = detect or mode != self.detector_lifecycle.active_mode
+        if detect:
+            self.detector_lifecycle.before_detection(frames, mode, self.distance, now)
+
+        if mode == 1:
+            self.gesture_type = 1
+            if detect:
+                gesture = self.detector.detect_hand_gesture(frames, now)
+                self.detector_lifecycle.after_detection(mode, self.detector.landmarks_found['hand'], now)
+            else:
+                gesture = self.last_gesture
+            if self.move_functions.palm_controller.is_active():
+                self.move_functions.palm_controller.update_hand(self.detector.last_points['hand'], self.frame_size, now)
+            gesture_id = gesture.class_id if gesture is not None else None
+            confirmed_id = self.hand_debouncer.update(gesture_id, self.required_frames('hand', fps))
+            if confirmed_id is not None:
+                self.hand_gesture_id = confirmed_id
+                self.gesture_confirmed_at = now
+                logging.info(f"Hand gesture {confirmed_id} confirmed by model {self.detector.last_predictions['hand'].model_version}")
+                self.notify_gesture()
+        else:
+            self.gesture_type = 2
+            if detect:
+                gesture = self.detector.detect_body_gesture(frames, now)
+                self.detector_lifecycle.after_detection(mode, self.detector.landmarks_found['body'], now)
+                # MediaPipe Pose returns a single person; ignore it unless it is the locked operator
+                if self.operator_tracker.matches_pose(self.detector.last_points['body']):
+                    self.distance_tracker.add_shoulders(self.detector.shoulder_width_px, now, camera.width)
+                elif gesture is not None:
+                    metrics.count('operator_rejected_gestures_total')
+                    gesture = None
+            else:
+                gesture = self.last_gesture
+            gesture_id = gesture.class_id if gesture is not None else None
+            confirmed_id = self.body_debouncer.update(gesture_id, self.required_frames('body', fps))
+            if confirmed_id is not None:
+                self.body_gesture_id = confirmed_id
+                self.gesture_confirmed_at = now
+                logging.info(f"Body gesture {confirmed_id} confirmed by model {self.detector.last_predictions['body'].model_version}")
+                self.notify_gesture()
+
+        self.last_gesture = gesture
+        if detect:
+            self.motion_gate.detected(now, time.perf_counter() - detect_start)
+        else:
+            self.motion_gate.skipped()
+
+        self.gui_frame = frame
+        if config.OVERLAY_DISPLAY or config.OVERLAY_RECORD:
+            annotated = self.overlay.render(frame, face, gesture, fps, self.video_record, photo_indicator)
+            if config.OVERLAY_DISPLAY:
+                self.gui_frame = annotated
+            if config.OVERLAY_RECORD:
+                record = annotated
+
+        if self.stream is not None:
+            self.stream.publish(self.gui_frame)
+
+        # Encoding happens on the recorder and pre-roll threads; only frame references are handed over here
+        if self.video_record and not self.recorder.is_recording():
+            self.start_recording()
+        if self.stop_video_record:
+            self.recorder.stop()
+            self.video_record = False
+            self.stop_video_record = False
+        if record is not None:
+            if self.recorder.is_recording():
+                self.recorder.write(record)
+            elif self.preroll is not None:
+                self.preroll.offer(record, now)
 
-        time_now = datetime.datetime.now()
-        video_path = os.path.join(config.OUTPUT_DIR, f"video_{time_now.strftime('%d-%m-%y-%I-%M-%S')}.avi")
-        fourcc = cv2.VideoWriter_fourcc(*config.VIDEO_CODEC)
-        out = cv2.VideoWriter(video_path, fourcc, config.VIDEO_FPS, config.VIDEO_SIZE)
-
-        cvFpsCalc = CvFpsCalc(buffer_len=10)
-        while cap.isOpened():
-            ret, frame = cap.read()
-            record = frame.copy() if frame is not None else None
-            if not ret or frame is None:
-                logging.warning('Ignoring empty camera frame.')
-                break
-            
-            
-            fps = cvFpsCalc.get()
-            cv2.putText(frame, f"FPS: {fps}", (int(cap.get(4)/2), 30), cv2.FONT_HERSHEY_SIMPLEX,
-                        1.0, (255, 255, 255), 4, cv2.LINE_AA)
-
-            if self.video_record:
-                cv2.circle(frame, indicator_pos, 12, (0, 0, 255), -1)
-
-            if photo_indicator_timer > 0:
-                cv2.circle(frame, indicator_pos, 12, (0, 255, 0), -1)
-                photo_indicator_timer -= 1
-                wait_for_pose -= 1
-
-            detected_distance = self.detector.detect_face(frame)
-            if detected_distance is not None:
-                self.distance = detected_distance
-
-            if self.distance < config.GESTURE_SWITCH_DISTANCE:
-                self.gesture_type = 1
-                gesture_id = self.detector.detect_hand_gesture(frame)
-                if gesture_id is not None:
-                    if gesture_id == self.last_hand_gesture_id:
-                        self.hand_gesture_count += 1
-                    else:
-                        self.hand_gesture_count = 1
-                        self.last_hand_gesture_id = gesture_id
-                    if self.hand_gesture_count >= int(fps):
-                        self.hand_gesture_id = gesture_id
-                        self.hand_gesture_count = 0
-                else:
-                    self.hand_gesture_count = 0
-                    self.last_hand_gesture_id = None
-            elif self.distance >= config.GESTURE_SWITCH_DISTANCE:
-                self.gesture_type = 2
-                gesture_id = self.detector.detect_body_gesture(frame)
-                if gesture_id is not None:
-                    if gesture_id == self.last_body_gesture_id:
-                        self.body_gesture_count += 1
-                    else:
-                        self.body_gesture_count = 1
-                        self.last_body_gesture_id = gesture_id
-                    if self.body_gesture_count >= int(fps):
-                        self.body_gesture_id = gesture_id
-                        self.body_gesture_count = 0
-                else:
-                    self.body_gesture_count = 0
-                    self.last_body_gesture_id = None
-
-            self.gui_frame = frame
-
-            if self.video_record and record is not None:
-                out.write(record)
-
-            if self.take_photo and record is not None:
-                wait_for_pose = int(fps) if fps > 0 else 15
-                photo_indicator_timer = int(fps) if fps > 0 else 15
-                self.take_photo = False
-
-            if wait_for_pose < 5 and record is not None:
-                time_now = datetime.datetime.now()
-                photo_path = os.path.join(config.OUTPUT_DIR, f"photo_{time_now.strftime('%d-%m-%y-%I-%M-%S')}.jpg")
-                cv2.imwrite(photo_path, record)
-                wait_for_pose = 10
-
-            if self.stop_video_record:
-                out.release()
-                self.video_record = False
-                self.stop_video_record = False
-                time_now = datetime.datetime.now()
-                video_path = os.path.join(config.OUTPUT_DIR, f"video_{time_now.strftime('%d-%m-%y-%I-%M-%S')}.avi")
-                out = cv2.VideoWriter(video_path, fourcc, config.VIDEO_FPS, config.VIDEO_SIZE)
-
-    def control_loop(self):
-        """Control loop for managing drone actions based on detected gestures."""
+        metrics.observe('frame_processing_seconds', time.perf_counter() - frame_start)
+        self.frame_stats.frame_done(captured.timestamp)
 
+    async def run_image_processing(self, runtime):
+        """Image processing task: every frame is read and processed on the single vision worker thread."""
+
+        self.runtime = runtime
+        await runtime.run_blocking(self.start_capture, executor='vision')
+        try:
+            while await runtime.run_blocking(self.process_next_frame, executor='vision'):
+                pass
+        finally:
+            # Queued behind any in-flight frame, so the writer is never released mid-write
+            runtime.executor('vision').submit(self.stop_capture)
+
+    def notify_gesture(self):
+        """Wakes the control task for a newly confirmed gesture (called from the vision thread)."""
+
+        if self.runtime is not None and self.gesture_event is not None:
+            self.runtime.call_soon(self.gesture_event.set)
+
+    async def run_control(self, runtime):
+        """
+        Control task: dispatches confirmed gestures to the drone as soon as they are confirmed.
+        A failed drone command is logged and the task keeps waiting for the next gesture.
+        """
+
+        self.gesture_event = asyncio.Event()
         while True:
-            time.sleep(0.2)
+            await self.gesture_event.wait()
+            self.gesture_event.clear()
             if self.gesture_type == 1 and self.hand_gesture_id is not None and self.hand_gesture_id > 0:
-                self.move_functions.move(self.hand_gesture_id)
-                if self.hand_gesture_id == 9:
-                    time.sleep(2)
-                    self.take_photo = True
-                elif self.hand_gesture_id == 10:
-                    self.video_record = True
-                elif self.hand_gesture_id == 11:
-                    self.stop_video_record = True
+                await self.try_dispatch_gesture(runtime, self.hand_gesture_id)
                 self.hand_gesture_id = 0
-
             elif self.gesture_type == 2 and self.body_gesture_id is not None and self.body_gesture_id > 0:
-                self.move_functions.move(self.body_gesture_id)
-                if self.body_gesture_id == 9:
-                    time.sleep(2)
-                    self.take_photo = True
-                elif self.body_gesture_id == 10:
-                    self.video_record = True
-                elif self.body_gesture_id == 11:
-                    self.stop_video_record = True
+                await self.try_dispatch_gesture(runtime, self.body_gesture_id)
                 self.body_gesture_id = 0
 
+    async def try_dispatch_gesture(self, runtime, gesture_id):
+        """Dispatches gesture_id, logging rather than raising a failed command so gesture control stays up."""
+
+        try:
+            await self.dispatch_gesture(runtime, gesture_id)
+        except Exception:
+            metrics.count('gesture_dispatch_errors_total')
+            logging.exception(f"Gesture {config.GESTURES.get(gesture_id, gesture_id)} failed")
+
+    async def dispatch_gesture(self, runtime, gesture_id):
+        """Runs the drone movement for gesture_id on an I/O worker and updates the media state."""
+
+        confirmed_at = self.gesture_confirmed_at
+        if gesture_id == 12:
+            # Record the lead-up to the emergency from the pre-roll buffer on, before the landing blocks dispatch
+            self.video_record = True
+        await runtime.run_blocking(self.move_functions.move, gesture_id)
+        if gesture_id == 9:
+            # Taken from the frame ring at a fixed offset from the confirming frame, without waiting here
+            self.photos.request(confirmed_at if confirmed_at is not None else time.monotonic())
+        elif gesture_id == 10:
+            self.video_record = True
+        elif gesture_id == 11:
+            self.stop_video_record = True
+
+    def shutdown(self):
+        """Brings continuous control to a hold and closes the vehicle connection."""
+
+        self.move_functions.stop_continuous_control()
+        self.move_functions.dronekit_functions.connection.stop()
+
+    def get_status(self):
+        return self.flight_status.snapshot()
+
     def get_gui_frame(self):
         return self.gui_frame
     
     def get_distance(self):
         return self.distance
     
+    def get_distance_confidence(self):
+        return self.distance_confidence
+
+    def get_switch_report(self):
+        return self.detector_lifecycle.report()
+
+    def get_frame_age(self):
+        return self.camera.frame_age() if self.camera is not None else (0.0, 0.0)
+
     def get_gesture_type(self):
         return self.gesture_type    
     
@@ -180,6 +400,39 @@ class ImageProcessingController:
     def get_body_gesture_id(self):
         return self.body_gesture_id
     
+    def get_mission_progress(self):
+        return self.move_functions.mission_runner.progress()
+
+    def get_palm_latency(self):
+        return self.move_functions.palm_controller.latency_report()
+
+    def get_preroll_stats(self):
+        return self.preroll.stats() if self.preroll is not None else None
+
+    def get_motion_gate_report(self):
+        return self.motion_gate.report()
+
+    def get_frame_stats(self):
+        return self.frame_stats
+
+    def get_metrics_summary(self):
+        return metrics.summary()
+
+    def get_model_versions(self):
+        return self.detector.model_registry.versions()
+
+    def rollback_model(self, kind):
+        return self.detector.model_registry.rollback(kind)
+
+    def get_profile(self):
+        return self.profile
+
+    def get_degradation_level(self):
+        return self.degradation[0]
+
+    def get_link_health(self):
+        return self.move_functions.dronekit_functions.connection.health()
+
     def get_altitude(self):
         try:
             return self.move_functions.uav.location.global_relative_frame.alt
@@ -0,0 +1,49 @@
+import time
+import cv2
+import config
+from utils.metrics import metrics
+
+
+class InferenceFrames:
+    """
+    Per-frame cache of the downscaled RGB images the MediaPipe graphs run on.
+    Each distinct inference size is resized and converted once per frame and shared between detectors.
+    Detections come back in normalized coordinates, so results are mapped onto the full-resolution
+    frame for drawing, recording and distance estimation.
+    """
+
+    def __init__(self, frame, heights=None):
+        """Wraps a full-resolution BGR frame; heights maps a detector name to its inference height."""
+        self.frame = frame
+        self.height, self.width = frame.shape[:2]
+        self.heights = heights if heights is not None else config.INFERENCE_HEIGHTS
+        self._cache = {}
+
+    def rgb_at(self, height):
+        """Return the frame as RGB scaled to height (keeping aspect ratio), or at native size for None."""
+        if height is None or height >= self.height:
+            size = (self.width, self.height)
+        else:
+            size = (max(1, round(self.width * height / self.height)), int(height))
+        rgb = self._cache.get(size)
+        if rgb is None:
+            start = time.perf_counter()
+            if size == (self.width, self.height):
+                rgb = cv2.cvtColor(self.frame, cv2.COLOR_BGR2RGB)
+            else:
+                small = cv2.resize(self.frame, size, interpolation=cv2.INTER_AREA)
+                rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+            self._cache[size] = rgb
+            metrics.observe('cvtcolor_resize_seconds', time.perf_counter() - start)
+        return rgb
+
+    def rgb(self, detector):
+        """Return the RGB inference image for a detector name ('face', 'hands' or 'pose')."""
+        return self.rgb_at(self.heights.get(detector))
+
+
+def as_inference_frames(frame, heights=None):
+    """Wrap a BGR frame in InferenceFrames unless it already is one."""
+    if isinstance(frame, InferenceFrames):
+        return frame
+    return InferenceFrames(frame, heights)
@@ -0,0 +1,82 @@
+import math
+import numpy as np
+import config
+
+
+class OneEuroLandmarkFilter:
+    """
+    One-Euro filter applied to all landmarks of a hand or arm at once.
+    Works on float (N, 2) pixel arrays, so sub-pixel precision is kept, and extrapolates the
+    landmarks with the filtered velocity for a few frames when detection drops out. After a gap
+    longer than max_gap_seconds (e.g. while the other gesture mode ran) the state is stale and the
+    filter starts over instead of extrapolating across it.
+    """
+
+    def __init__(self, min_cutoff=config.LANDMARK_FILTER_MIN_CUTOFF, beta=config.LANDMARK_FILTER_BETA,
+                 d_cutoff=config.LANDMARK_FILTER_D_CUTOFF, max_predicted_frames=config.LANDMARK_MAX_PREDICTED_FRAMES,
+                 max_gap_seconds=config.LANDMARK_MAX_GAP_SECONDS):
+        """Initializes the filter with the One-Euro parameters, the prediction horizon in frames and the longest gap in seconds."""
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.max_predicted_frames = max_predicted_frames
+        self.max_gap_seconds = max_gap_seconds
+        self.reset()
+
+    def reset(self):
+        """Forget the filter state."""
+        self._x = None
+        self._dx = None
+        self._t = None
+        self.missed_frames = 0
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        """Smoothing factor for a cutoff frequency (Hz) and time step (s); cutoff may be an array."""
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, points, timestamp):
+        """Filter a new (N, 2) measurement taken at timestamp (seconds) and return the smoothed points."""
+        points = np.asarray(points, dtype=np.float64)
+        if self._x is None or self._x.shape != points.shape or timestamp - self._t > self.max_gap_seconds:
+            self._x = points.copy()
+            self._dx = np.zeros_like(points)
+            self._t = timestamp
+            self.missed_frames = 0
+            return self._x.copy()
+
+        dt = max(timestamp - self._t, 1e-3)
+        dx = (points - self._x) / dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        self._dx = a_d * dx + (1 - a_d) * self._dx
+        cutoff = self.min_cutoff + self.beta * np.abs(self._dx)
+        a = self._alpha(cutoff, dt)
+        self._x = a * points + (1 - a) * self._x
+        self._t = timestamp
+        self.missed_frames = 0
+        return self._x.copy()
+
+    def predict(self, timestamp):
+        """
+        Extrapolate the landmarks to timestamp with the filtered velocity while detection is missing.
+        Returns None when there is no state, the prediction horizon is exhausted or the last
+        frame is older than max_gap_seconds.
+        """
+        if self._x is None:
+            return None
+        if self.missed_frames >= self.max_predicted_frames or timestamp - self._t > self.max_gap_seconds:
+            self.reset()
+            return None
+        dt = max(timestamp - self._t, 0.0)
+        self._x = self._x + self._dx * dt
+        self._t = timestamp
+        self.missed_frames += 1
+        return self._x.copy()
+
+
+def create_landmark_filter():
+    """Create the landmark filter selected by config.LANDMARK_FILTER, or None if filtering is disabled."""
+    if config.LANDMARK_FILTER == 'one_euro':
+        return OneEuroLandmarkFilter()
+    return None
@@ -0,0 +1,154 @@
+import os
+import glob
+import time
+import asyncio
+import logging
+from collections import deque
+import config
+from utils.metrics import metrics
+
+
+def read_temperature(pattern=config.GOVERNOR_THERMAL_ZONES):
+    """Hottest thermal zone in degrees C, or None where /sys/class/thermal is not available."""
+    temperatures = []
+    for path in glob.glob(pattern):
+        try:
+            with open(path) as f:
+                temperatures.append(int(f.read().strip()) / 1000.0)
+        except (OSError, ValueError):
+            continue
+    return max(temperatures) if temperatures else None
+
+
+class CpuMonitor:
+    """System-wide CPU utilization between calls from /proc/stat, falling back to this process's CPU time."""
+
+    def __init__(self):
+        self._last = self._read()
+
+    def _read(self):
+        """Return (total, idle) CPU time counters."""
+        try:
+            with open('/proc/stat') as f:
+                fields = [float(v) for v in f.readline().split()[1:]]
+            return sum(fields), fields[3] + fields[4]
+        except (OSError, ValueError, IndexError):
+            total = time.monotonic() * (os.cpu_count() or 1)
+            return total, total - time.process_time()
+
+    def percent(self):
+        """CPU utilization in percent since the previous call."""
+        total, idle = self._read()
+        last_total, last_idle = self._last
+        self._last = (total, idle)
+        elapsed = total - last_total
+        return 100.0 * (1.0 - (idle - last_idle) / elapsed) if elapsed > 0 else 0.0
+
+
+class LoadGovernor:
+    """
+    Holds the processing frame rate on hardware that throttles under sustained load. Every interval it
+    checks the processing FPS against the camera rate, the p95 frame latency, the CPU utilization and the
+    hottest thermal zone. After degrade_after consecutive checks under pressure it steps down one of
+    config.GOVERNOR_LEVELS (smaller inference frames, less frequent face detection and standby, lighter
+    graphs); after recover_after checks with headroom it steps back up. A step up that is followed by
+    pressure soon after doubles the wait before the next one. Every transition is logged with its cause.
+    """
+
+    def __init__(self, controller, levels=config.GOVERNOR_LEVELS, interval=config.GOVERNOR_INTERVAL,
+                 degrade_after=config.GOVERNOR_DEGRADE_AFTER, recover_after=config.GOVERNOR_RECOVER_AFTER):
+        self.controller = controller
+        self.levels = levels
+        self.interval = interval
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+        self.level = 0
+        self.cpu = CpuMonitor()
+        self.transitions = deque(maxlen=20)
+        self.last_sample = {}
+        self._pressure = 0
+        self._headroom = 0
+        self._backoff = 1
+        self._last_recovery = None
+
+    def sample(self):
+        """Current load measurements."""
+        stats = self.controller.get_frame_stats()
+        return {
+            'fps': stats.processing_fps(),
+            'camera_fps': stats.camera_fps(),
+            'latency': stats.latency.percentile(95),
+            'cpu': self.cpu.percent(),
+            'temperature': read_temperature(),
+        }
+
+    def evaluate(self, sample):
+        """Return (causes of pressure, whether there is headroom to step up) for a sample."""
+        target = sample['camera_fps'] * config.GOVERNOR_TARGET_FPS_RATIO
+        temperature = sample['temperature']
+        causes = []
+        if sample['fps'] < target:
+            causes.append(f"processing {sample['fps']:.1f} fps below target {target:.1f}")
+        if sample['latency'] > config.GOVERNOR_MAX_LATENCY:
+            causes.append(f"p95 latency {sample['latency'] * 1000:.0f} ms")
+        if sample['cpu'] > config.GOVERNOR_MAX_CPU:
+            causes.append(f"CPU {sample['cpu']:.0f}%")
+        if temperature is not None and temperature > config.GOVERNOR_MAX_TEMPERATURE:
+            causes.append(f"temperature {temperature:.1f} C")
+        headroom = (not causes and sample['latency'] < config.GOVERNOR_RECOVER_LATENCY
+                    and sample['cpu'] < config.GOVERNOR_RECOVER_CPU
+                    and (temperature is None or temperature < config.GOVERNOR_RECOVER_TEMPERATURE))
+        return causes, headroom
+
+    def update(self, now=None):
+        """Take one sample and change the degradation level if pressure or headroom persisted."""
+        now = time.monotonic() if now is None else now
+        sample = self.sample()
+        self.last_sample = sample
+        if sample['camera_fps'] <= 0:
+            return self.level
+        causes, headroom = self.evaluate(sample)
+        self._pressure = self._pressure + 1 if causes else 0
+        self._headroom = self._headroom + 1 if headroom else 0
+
+        if self._pressure >= self.degrade_after and self.level < len(self.levels) - 1:
+            if self._last_recovery is not None and now - self._last_recovery < self.recover_after * self.interval * self._backoff:
+                self._backoff = min(self._backoff * 2, 8)
+            self._set_level(self.level + 1, ", ".join(causes), now)
+        elif self._headroom >= self.recover_after * self._backoff and self.level > 0:
+            self._last_recovery = now
+            self._set_level(self.level - 1, "headroom: " + self.describe(sample), now)
+        return self.level
+
+    def _set_level(self, level, cause, now):
+        previous, self.level = self.level, level
+        self._pressure = self._headroom = 0
+        self.transitions.append((now, previous, level, cause))
+        metrics.count('governor_transitions_total')
+        log = logging.warning if level > previous else logging.info
+        log(f"Load governor: degradation level {previous} -> {level} ({cause})")
+        self.controller.set_degradation(level, self.levels[level])
+
+    @staticmethod
+    def describe(sample):
+        temperature = f", {sample['temperature']:.1f} C" if sample['temperature'] is not None else ""
+        return (f"{sample['fps']:.1f}/{sample['camera_fps']:.1f} fps, p95 {sample['latency'] * 1000:.0f} ms, "
+                f"CPU {sample['cpu']:.0f}%{temperature}")
+
+    async def run(self):
+        """Governor task for the asyncio runtime."""
+        while True:
+            try:
+                self.update()
+            except Exception as e:
+                logging.error(f"Load governor check failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def gauges(self):
+        """Degradation level and the last load sample as flat metric gauges."""
+        gauges = {'governor_level': self.level}
+        if self.last_sample:
+            gauges['governor_cpu_percent'] = round(self.last_sample['cpu'], 1)
+            if self.last_sample['temperature'] is not None:
+                gauges['governor_temperature_celsius'] = self.last_sample['temperature']
+        return gauges
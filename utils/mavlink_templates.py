@@ -0,0 +1,76 @@
+import time
+import config
+from utils.metrics import metrics
+
+# SET_POSITION_TARGET_* type masks (0=enable, 1=ignore)
+POSITION_MASK = 0b0000111111111000  # only positions enabled
+VELOCITY_MASK = 0b0000111111000111  # only speeds enabled
+
+
+class MessageTemplates:
+    """
+    Pre-built MAVLink messages keyed by message type and the fields that stay constant (frame, type_mask,
+    command). Callers patch only the changing fields in place instead of running the *_encode constructors
+    for every setpoint; pymavlink serializes the message from its attributes on each send.
+    A template is shared, so patching and sending must happen under the owner's send lock.
+    """
+
+    def __init__(self, message_factory):
+        self.message_factory = message_factory
+        self._templates = {}
+
+    def local_ned(self, frame, type_mask):
+        """SET_POSITION_TARGET_LOCAL_NED template for frame and type_mask."""
+        key = ('local_ned', frame, type_mask)
+        msg = self._templates.get(key)
+        if msg is None:
+            msg = self.message_factory.set_position_target_local_ned_encode(
+                0, 0, 0, frame, type_mask, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+            self._templates[key] = msg
+        return msg
+
+    def global_int(self, frame, type_mask):
+        """SET_POSITION_TARGET_GLOBAL_INT template for frame and type_mask."""
+        key = ('global_int', frame, type_mask)
+        msg = self._templates.get(key)
+        if msg is None:
+            msg = self.message_factory.set_position_target_global_int_encode(
+                0, 0, 0, frame, type_mask, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+            self._templates[key] = msg
+        return msg
+
+    def command_long(self, command):
+        """COMMAND_LONG template for command."""
+        key = ('command_long', command)
+        msg = self._templates.get(key)
+        if msg is None:
+            msg = self.message_factory.command_long_encode(0, 0, command, 0, 0, 0, 0, 0, 0, 0, 0)
+            self._templates[key] = msg
+        return msg
+
+
+class SetpointCoalescer:
+    """
+    Drops a setpoint identical to the last one sent on the same stream unless the keep-alive interval
+    elapsed, so a fixed-rate loop holding a constant command does not flood the link. Changed values
+    always go out immediately.
+    """
+
+    def __init__(self, keepalive=config.MAVLINK_SETPOINT_KEEPALIVE):
+        self.keepalive = keepalive
+        self._last = {}
+        self.coalesced = 0
+
+    def should_send(self, stream, values, now=None):
+        """Return True if values must be sent on stream now, recording it as sent."""
+        now = time.monotonic() if now is None else now
+        last = self._last.get(stream)
+        if last is not None and last[0] == values and now - last[1] < self.keepalive:
+            self.coalesced += 1
+            metrics.count('mavlink_coalesced_total')
+            return False
+        self._last[stream] = (values, now)
+        return True
+
+    def reset(self):
+        self._last.clear()
@@ -0,0 +1,331 @@
+import io
+import sys
+import time
+import bisect
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import config
+
+# Latency buckets in seconds, 50us doubling up to ~6.5s
+DEFAULT_BUCKETS = tuple(0.00005 * 2 ** i for i in range(18))
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Every thread records into its own shard, so observing takes no lock;
+    readers sum the shards, which may be off by an in-flight observation.
+    """
+
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []
+        self._register_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            # bucket counts (+inf last), then sum and count
+            shard = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            self._local.shard = shard
+            with self._register_lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, value):
+        """Record one value."""
+        shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def snapshot(self):
+        """Return (bucket counts, sum, count) summed over all threads."""
+        counts = [0] * (len(self.buckets) + 1)
+        total, count = 0.0, 0
+        for shard in list(self._shards):
+            for i in range(len(counts)):
+                counts[i] += shard[i]
+            total += shard[-2]
+            count += shard[-1]
+        return counts, total, count
+
+    def quantile(self, q, snapshot=None):
+        """Estimate the q-quantile by linear interpolation inside the bucket."""
+        counts, _, count = snapshot or self.snapshot()
+        if count == 0:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1] * 2
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class Counter:
+    """Monotonic counter, sharded per thread like Histogram."""
+
+    def __init__(self, name):
+        self.name = name
+        self._local = threading.local()
+        self._shards = []
+        self._register_lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """Increase the counter."""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = [0]
+            self._local.shard = shard
+            with self._register_lock:
+                self._shards.append(shard)
+        shard[0] += amount
+
+    def value(self):
+        return sum(shard[0] for shard in list(self._shards))
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads at a fixed interval and counts the innermost frames."""
+
+    def __init__(self, interval=config.PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = StackCounter()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                code = frame.f_code
+                self.samples[f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, limit=30):
+        """Stop sampling and return a text report of the most sampled locations."""
+        self._stop_event.set()
+        self._thread.join()
+        total = sum(self.samples.values()) or 1
+        lines = [f"{count:>7} {100.0 * count / total:5.1f}%  {location}" for location, count in self.samples.most_common(limit)]
+        return f"{total} samples every {self.interval * 1000:.1f}ms\n" + "\n".join(lines) + "\n"
+
+
+class Metrics:
+    """Registry of hot-path timers, counters and gauges, with optional runtime profiling."""
+
+    def __init__(self, enabled=config.METRICS_ENABLED):
+        self.enabled = enabled
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._profiler = None
+        self._profile_mode = None
+        self._cprofile_request = None
+        self._cprofile = None
+        self.last_profile_report = ""
+
+    def histogram(self, name):
+        """Return the histogram called name, creating it on first use."""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(name))
+        return histogram
+
+    def counter(self, name):
+        """Return the counter called name, creating it on first use."""
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, Counter(name))
+        return counter
+
+    def observe(self, name, value):
+        """Record a duration (seconds) or other value into a histogram."""
+        if self.enabled:
+            self.histogram(name).observe(value)
+
+    def count(self, name, amount=1):
+        """Increase a counter."""
+        if self.enabled:
+            self.counter(name).inc(amount)
+
+    def set_gauge(self, name, value):
+        """Set a gauge to its current value."""
+        self._gauges[name] = value
+
+    def register_collector(self, collector):
+        """Register a callable returning {name: value} gauges, evaluated at every export."""
+        self._collectors.append(collector)
+
+    def gauges(self):
+        """Return the set gauges merged with the registered collectors' values."""
+        gauges = dict(self._gauges)
+        for collector in self._collectors:
+            gauges.update(collector())
+        return gauges
+
+    @contextmanager
+    def timer(self, name):
+        """Time the enclosed block into the histogram called name."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name).observe(time.perf_counter() - start)
+
+    def summary(self):
+        """Return {name: {count, mean, p50, p95, p99}} for all histograms (seconds)."""
+        summary = {}
+        for name, histogram in sorted(self._histograms.items()):
+            snapshot = histogram.snapshot()
+            _, total, count = snapshot
+            summary[name] = {
+                'count': count,
+                'mean': total / count if count else 0.0,
+                'p50': histogram.quantile(0.5, snapshot),
+                'p95': histogram.quantile(0.95, snapshot),
+                'p99': histogram.quantile(0.99, snapshot),
+            }
+        return summary
+
+    def prometheus_text(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        prefix = config.METRICS_PREFIX
+        lines = []
+        for name, histogram in sorted(self._histograms.items()):
+            counts, total, count = histogram.snapshot()
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{prefix}{name}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{prefix}{name}_bucket{{le="+Inf"}} {count}')
+            lines.append(f"{prefix}{name}_sum {total}")
+            lines.append(f"{prefix}{name}_count {count}")
+        for name, counter in sorted(self._counters.items()):
+            lines.append(f"# TYPE {prefix}{name} counter")
+            lines.append(f"{prefix}{name} {counter.value()}")
+        for name, value in sorted(self.gauges().items()):
+            lines.append(f"# TYPE {prefix}{name} gauge")
+            lines.append(f"{prefix}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def start_profile(self, mode='sampling'):
+        """
+        Start profiling. 'sampling' samples all threads; 'cprofile' runs cProfile in the image
+        processing thread, which enables it at its next profile_checkpoint().
+        """
+        if self._profile_mode is not None:
+            return False
+        self._profile_mode = mode
+        if mode == 'sampling':
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        else:
+            self._cprofile_request = True
+        logging.info(f"Started {mode} profiling.")
+        return True
+
+    def stop_profile(self):
+        """Stop profiling and return the text report."""
+        mode, self._profile_mode = self._profile_mode, None
+        if mode == 'sampling':
+            self.last_profile_report = self._profiler.stop()
+            self._profiler = None
+        elif mode == 'cprofile':
+            self._cprofile_request = False
+            # The report is produced by the profiled thread at its next checkpoint
+            deadline = time.monotonic() + 2.0
+            while self._cprofile is not None and time.monotonic() < deadline:
+                time.sleep(0.01)
+        logging.info(f"Stopped {mode} profiling.")
+        return self.last_profile_report
+
+    def is_profiling(self):
+        return self._profile_mode is not None
+
+    def profile_checkpoint(self):
+        """Apply a pending cProfile start/stop in the calling (image processing) thread."""
+        if self._cprofile_request is True and self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        elif self._cprofile_request is False and self._cprofile is not None:
+            self._cprofile.disable()
+            stream = io.StringIO()
+            pstats.Stats(self._cprofile, stream=stream).sort_stats('cumulative').print_stats(30)
+            self.last_profile_report = stream.getvalue()
+            self._cprofile = None
+            self._cprofile_request = None
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves /metrics, /profile/start?mode=sampling|cprofile and /profile/stop."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        registry = self.server.metrics
+        if url.path == '/metrics':
+            body = registry.prometheus_text()
+        elif url.path == '/profile/start':
+            mode = parse_qs(url.query).get('mode', ['sampling'])[0]
+            if mode not in ('sampling', 'cprofile'):
+                self.send_error(400, "mode must be sampling or cprofile")
+                return
+            body = "started\n" if registry.start_profile(mode) else "already profiling\n"
+        elif url.path == '/profile/stop':
+            body = registry.stop_profile() if registry.is_profiling() else "not profiling\n"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.debug("metrics: " + format % args)
+
+
+def start_metrics_server(registry, host=config.METRICS_HTTP_HOST, port=config.METRICS_HTTP_PORT):
+    """Serve the metrics endpoint on a daemon thread. Returns the server, or None if disabled."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    except OSError as e:
+        logging.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.metrics = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Metrics endpoint on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+# Process-wide registry used by the hot paths
+metrics = Metrics()
@@ -0,0 +1,213 @@
+import time
+import logging
+import threading
+from dronekit import Command, VehicleMode, LocationGlobalRelative
+from pymavlink import mavutil
+import config
+from utils.metrics import metrics
+
+FRAME = mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT
+# Steps that become NAV items; the autopilot reports MISSION_ITEM_REACHED for these only
+NAV_STEPS = ('waypoint', 'hold', 'land', 'rtl')
+STEP_ARGS = {
+    'waypoint': (3, 4),  # north, east, up metres from the macro start [, hold seconds]
+    'hold': (1, 1),  # seconds at the previous waypoint
+    'yaw': (1, 2),  # heading degrees [, relative (default True)]
+    'speed': (1, 1),  # ground speed m/s
+    'roi': (3, 3),  # north, east, up metres from the macro start
+    'land': (0, 0),
+    'rtl': (0, 0),
+}
+
+
+class MissionMacro:
+    """
+    A gesture macro from config.MACROS: a sequence of steps validated once at startup and compiled into
+    mission commands relative to the vehicle position when it is triggered. Offsets are metres north,
+    east and up from that position.
+    """
+
+    def __init__(self, name, steps):
+        self.name = name
+        self.steps = []
+        for step in steps:
+            kind, args = step[0], tuple(step[1:])
+            if kind not in STEP_ARGS:
+                raise ValueError(f"Macro {name}: unknown step {kind!r}, expected one of {', '.join(STEP_ARGS)}")
+            low, high = STEP_ARGS[kind]
+            if not low <= len(args) <= high:
+                raise ValueError(f"Macro {name}: step {kind!r} takes {low}-{high} arguments, got {len(args)}")
+            self.steps.append((kind, args))
+        if not any(kind in NAV_STEPS for kind, _ in self.steps):
+            raise ValueError(f"Macro {name}: needs at least one waypoint, hold, land or rtl step")
+
+    def compile(self, origin, get_location_metres):
+        """Return the DroneKit Commands of the macro flown from origin (a LocationGlobalRelative)."""
+        def location(north, east, up):
+            target = get_location_metres(origin, north, east)
+            return LocationGlobalRelative(target.lat, target.lon, origin.alt + up)
+
+        def command(cmd, params=(0, 0, 0, 0), target=None):
+            lat, lon, alt = (target.lat, target.lon, target.alt) if target is not None else (0, 0, 0)
+            return Command(0, 0, 0, FRAME, cmd, 0, 0, *params, lat, lon, alt)
+
+        last = LocationGlobalRelative(origin.lat, origin.lon, origin.alt)
+        commands = []
+        for kind, args in self.steps:
+            if kind == 'waypoint':
+                last = location(*args[:3])
+                hold = args[3] if len(args) > 3 else 0
+                commands.append(command(mavutil.mavlink.MAV_CMD_NAV_WAYPOINT, (hold, 0, 0, 0), last))
+            elif kind == 'hold':
+                commands.append(command(mavutil.mavlink.MAV_CMD_NAV_LOITER_TIME, (args[0], 0, 0, 0), last))
+            elif kind == 'yaw':
+                heading, relative = args[0], args[1] if len(args) > 1 else True
+                direction = -1 if relative and heading < 0 else 1
+                commands.append(command(mavutil.mavlink.MAV_CMD_CONDITION_YAW,
+                                        (abs(heading) if relative else heading, 0, direction, int(relative))))
+            elif kind == 'speed':
+                commands.append(command(mavutil.mavlink.MAV_CMD_DO_CHANGE_SPEED, (1, args[0], -1, 0)))
+            elif kind == 'roi':
+                commands.append(command(mavutil.mavlink.MAV_CMD_DO_SET_ROI, target=location(*args)))
+            elif kind == 'land':
+                commands.append(command(mavutil.mavlink.MAV_CMD_NAV_LAND, target=last))
+            elif kind == 'rtl':
+                commands.append(command(mavutil.mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH))
+        return commands
+
+
+def load_macros(macros=config.MACROS, bindings=config.GESTURE_MACROS):
+    """Validate config.MACROS and return {gesture name: MissionMacro} for the bound gestures."""
+    compiled = {name: MissionMacro(name, steps) for name, steps in macros.items()}
+    bound = {}
+    for gesture, name in bindings.items():
+        if gesture not in config.GESTURES.values():
+            raise ValueError(f"GESTURE_MACROS: unknown gesture {gesture!r}")
+        if name not in compiled:
+            raise ValueError(f"GESTURE_MACROS: gesture {gesture!r} bound to unknown macro {name!r}")
+        bound[gesture] = compiled[name]
+    return bound
+
+
+class MissionRunner:
+    """
+    Flies a macro as an autopilot mission: the compiled commands are uploaded in one batch, the vehicle is
+    switched to AUTO and start() returns. Progress is followed from MISSION_ITEM_REACHED messages and mode
+    changes reported by DroneKit; when the last item is reached the vehicle is put back in GUIDED so
+    gestures control it again. Leaving AUTO (pilot override, failsafe) or stop() ends the mission.
+    """
+
+    def __init__(self, dronekit_functions):
+        self.dronekit_functions = dronekit_functions
+        self.macro = None
+        self.state = 'idle'
+        self.reached = 0
+        self.last_seq = 0
+        self.started_at = None
+        self._vehicle = None
+        self._in_auto = False
+        self._lock = threading.Lock()
+
+    def is_active(self):
+        return self.state in ('uploading', 'running')
+
+    def start(self, macro):
+        """
+        Upload macro as a mission from the current position and start it in AUTO. Blocks for the upload and
+        the mode change only. Returns False if either failed.
+        """
+        vehicle = self.dronekit_functions.vehicle
+        self.stop()
+        origin = vehicle.location.global_relative_frame
+        commands = macro.compile(origin, self.dronekit_functions.get_location_metres)
+        with self._lock:
+            self.macro, self.state, self.reached = macro, 'uploading', 0
+            # Sequence numbers count the home location as item 0
+            self.last_seq = max(i + 1 for i, cmd in enumerate(commands) if self._is_nav(cmd))
+
+        try:
+            self.dronekit_functions.connection.ensure_link()
+            with metrics.timer('mission_upload_seconds'):
+                cmds = vehicle.commands
+                cmds.clear()
+                for cmd in commands:
+                    cmds.add(cmd)
+                cmds.upload(timeout=config.MISSION_UPLOAD_TIMEOUT)
+        except Exception as e:
+            logging.error(f"Macro {macro.name}: mission upload failed: {e}")
+            self._finish('failed')
+            return False
+        logging.info(f"Macro {macro.name}: uploaded {len(commands)} mission items from "
+                     f"({origin.lat:.6f}, {origin.lon:.6f}, {origin.alt:.1f} m)")
+
+        self._vehicle = vehicle
+        vehicle.add_message_listener('MISSION_ITEM_REACHED', self._on_item_reached)
+        vehicle.add_attribute_listener('mode', self._on_mode)
+        with self._lock:
+            self.state, self.started_at, self._in_auto = 'running', time.monotonic(), False
+        vehicle.commands.next = 0
+        vehicle.mode = VehicleMode('AUTO')
+        if not self.dronekit_functions.wait_for('mode', lambda v: v.mode.name == 'AUTO',
+                                                timeout=config.MISSION_MODE_TIMEOUT):
+            logging.error(f"Macro {macro.name}: vehicle did not switch to AUTO")
+            self._finish('failed')
+            return False
+        metrics.count('missions_started_total')
+        return True
+
+    @staticmethod
+    def _is_nav(cmd):
+        return cmd.command in (mavutil.mavlink.MAV_CMD_NAV_WAYPOINT, mavutil.mavlink.MAV_CMD_NAV_LOITER_TIME,
+                               mavutil.mavlink.MAV_CMD_NAV_LAND, mavutil.mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH)
+
+    def _on_item_reached(self, vehicle, name, message):
+        with self._lock:
+            if self.state != 'running':
+                return
+            self.reached = message.seq
+            done = message.seq >= self.last_seq
+        logging.info(f"Macro {self.macro.name}: reached item {message.seq}/{self.last_seq}")
+        if done:
+            self._finish('completed')
+            # Landing and RTL end disarmed or on their way home; otherwise hand control back to gestures
+            if vehicle.armed and vehicle.mode.name == 'AUTO':
+                vehicle.mode = VehicleMode('GUIDED')
+
+    def _on_mode(self, vehicle, name, mode):
+        # The listener is registered before AUTO is requested; only a change away from AUTO ends the mission
+        if mode.name == 'AUTO':
+            self._in_auto = True
+        elif self._in_auto and self.state == 'running':
+            logging.warning(f"Macro {self.macro.name}: interrupted by mode change to {mode.name}")
+            self._finish('interrupted')
+
+    def stop(self):
+        """Abort a running mission and hold position in GUIDED."""
+        if not self.is_active():
+            return False
+        vehicle = self._vehicle
+        self._finish('aborted')
+        if vehicle is not None and vehicle.mode.name == 'AUTO':
+            vehicle.mode = VehicleMode('GUIDED')
+        logging.info(f"Macro {self.macro.name}: aborted")
+        return True
+
+    def _finish(self, state):
+        with self._lock:
+            if not self.is_active():
+                return
+            self.state = state
+            vehicle, self._vehicle = self._vehicle, None
+        if vehicle is not None:
+            vehicle.remove_message_listener('MISSION_ITEM_REACHED', self._on_item_reached)
+            vehicle.remove_attribute_listener('mode', self._on_mode)
+        metrics.count(f'missions_{state}_total')
+        if self.started_at is not None and state == 'completed':
+            metrics.observe('mission_seconds', time.monotonic() - self.started_at)
+            logging.info(f"Macro {self.macro.name}: completed in {time.monotonic() - self.started_at:.1f}s")
+
+    def progress(self):
+        """Name, state and reached/total NAV items of the current or last macro, or None if none ran."""
+        if self.macro is None:
+            return None
+        return {'macro': self.macro.name, 'state': self.state, 'reached': self.reached, 'total': self.last_seq}
@@ -0,0 +1,226 @@
+import os
+import csv
+import hashlib
+import logging
+import threading
+from collections import deque, namedtuple
+import numpy as np
+import config
+from utils.classifiers import load_classifier
+
+# A classification result tagged with the model version that produced it
+Prediction = namedtuple('Prediction', ['class_id', 'accuracy', 'model_version'])
+
+
+def read_labels(label_path):
+    """Read gesture labels from a CSV file, raising on failure."""
+    with open(label_path, encoding='utf-8-sig') as f:
+        return [row[0] for row in csv.reader(f) if row]
+
+
+def file_digest(*paths):
+    """Return a SHA-1 digest over the contents of the given files."""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ModelVersion:
+    """A loaded and validated classifier together with its labels. Never mutated after creation."""
+
+    def __init__(self, kind, model_path, labels_path, classifier, labels, digest):
+        self.kind = kind
+        self.model_path = model_path
+        self.labels_path = labels_path
+        self.classifier = classifier
+        self.labels = labels
+        self.digest = digest
+        self.version = digest[:10]
+
+    def predict(self, landmark_list):
+        """Classify a pre-processed landmark vector and return a Prediction tagged with this version."""
+        class_id, accuracy = self.classifier.predict(landmark_list)
+        return Prediction(class_id, accuracy, self.version)
+
+    def label(self, class_id):
+        """Return the label for a gesture id (ids start from 1)."""
+        return self.labels[class_id - 1] if 0 <= class_id - 1 < len(self.labels) else "Unknown"
+
+
+class ModelRegistry:
+    """
+    Keeps the active hand/body gesture models and hot-reloads them when the files change on disk.
+    A background thread watches the model and label files (mtime first, then content hash), loads and
+    validates new versions, and stages them. Staged versions are only swapped in by commit_pending(),
+    which the image processing loop calls between frames. switch_models() points a kind at a different
+    model file (e.g. another classifier backend) and stages it the same way.
+    """
+
+    def __init__(self, sources, poll_interval=config.MODEL_REGISTRY_POLL_INTERVAL,
+                 history_size=config.MODEL_REGISTRY_HISTORY, num_threads=None):
+        """
+        Initializes the registry and synchronously loads the initial versions.
+        sources maps a kind ('hand'/'body') to (model_path, labels_path, expected_input_size).
+        num_threads is the TFLite interpreter thread count (None for the default).
+        """
+        self.sources = sources
+        self.poll_interval = poll_interval
+        self.num_threads = num_threads
+        self._lock = threading.Lock()
+        # Serializes polling with switch_models so a poll never stages a version of a replaced source
+        self._source_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._active = {}
+        self._pending = {}
+        self._history = {kind: deque(maxlen=history_size) for kind in sources}
+        self._stamps = {}
+        self._rejected = {}
+        for kind in sources:
+            self._stamps[kind] = self._file_stamp(kind)
+            try:
+                self._active[kind] = self._load(kind)
+                logging.info(f"Loaded {kind} model version {self._active[kind].version}")
+            except Exception as e:
+                logging.error(f"Failed to load {kind} model: {e}")
+
+    def _file_stamp(self, kind):
+        model_path, labels_path, _ = self.sources[kind]
+        try:
+            return (os.path.getmtime(model_path), os.path.getmtime(labels_path))
+        except OSError:
+            return None
+
+    def _load(self, kind, digest=None):
+        """Load and validate the model currently on disk for kind."""
+        model_path, labels_path, input_size = self.sources[kind]
+        digest = digest or file_digest(model_path, labels_path)
+        labels = read_labels(labels_path)
+        classifier = load_classifier(model_path, num_threads=self.num_threads)
+        if classifier.input_size != input_size:
+            raise ValueError(f"{model_path} expects {classifier.input_size} inputs, expected {input_size}")
+        # Gesture ids start from 1, so the model has one more output than there are labels
+        if classifier.num_classes != len(labels) + 1:
+            raise ValueError(f"{model_path} has {classifier.num_classes} outputs for {len(labels)} labels")
+        probabilities = classifier.predict_proba(np.zeros(input_size, dtype=np.float32))
+        if not np.all(np.isfinite(probabilities)):
+            raise ValueError(f"{model_path} produced non-finite output")
+        return ModelVersion(kind, model_path, labels_path, classifier, labels, digest)
+
+    def poll(self):
+        """Check the watched files once and stage any new valid version."""
+        with self._source_lock:
+            self._poll()
+
+    def _poll(self):
+        for kind in self.sources:
+            stamp = self._file_stamp(kind)
+            if stamp is None or stamp == self._stamps.get(kind):
+                continue
+            self._stamps[kind] = stamp
+            model_path, labels_path, _ = self.sources[kind]
+            try:
+                digest = file_digest(model_path, labels_path)
+            except OSError as e:
+                logging.warning(f"Could not read {kind} model files: {e}")
+                continue
+            active = self._active.get(kind)
+            if (active is not None and digest == active.digest) or digest == self._rejected.get(kind):
+                continue
+            try:
+                version = self._load(kind, digest)
+            except Exception as e:
+                logging.error(f"Rejected new {kind} model {digest[:10]}: {e}")
+                self._rejected[kind] = digest
+                continue
+            with self._lock:
+                self._pending[kind] = version
+            logging.info(f"Staged {kind} model version {version.version}")
+
+    def switch_models(self, model_paths, num_threads=None):
+        """
+        Load model_paths (kind -> model file) with num_threads TFLite threads and stage them for commit_pending().
+        A kind whose file is missing or fails validation keeps its current source and model.
+        Returns the kinds that were staged.
+        """
+        staged = []
+        with self._source_lock:
+            reload_all = num_threads != self.num_threads
+            self.num_threads = num_threads
+            for kind, model_path in model_paths.items():
+                current_path, labels_path, input_size = self.sources[kind]
+                if model_path == current_path and not reload_all:
+                    continue
+                if not os.path.exists(model_path):
+                    logging.warning(f"{kind} model {model_path} not found, keeping {current_path}")
+                    if not reload_all:
+                        continue
+                    model_path = current_path
+                self.sources[kind] = (model_path, labels_path, input_size)
+                try:
+                    version = self._load(kind)
+                except Exception as e:
+                    logging.error(f"Could not switch {kind} model to {model_path}: {e}")
+                    self.sources[kind] = (current_path, labels_path, input_size)
+                    continue
+                self._stamps[kind] = self._file_stamp(kind)
+                with self._lock:
+                    self._pending[kind] = version
+                staged.append(kind)
+                logging.info(f"Staged {kind} model {model_path} version {version.version}")
+        return staged
+
+    def _watch(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self.poll()
+
+    def start(self):
+        """Start the background file watcher."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background file watcher."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def commit_pending(self):
+        """Atomically swap in staged versions. Call between frames. Returns the kinds that changed."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for kind, version in pending.items():
+                previous = self._active.get(kind)
+                if previous is not None:
+                    self._history[kind].append(previous)
+                self._active[kind] = version
+        for kind, version in pending.items():
+            logging.info(f"Activated {kind} model version {version.version}")
+        return list(pending)
+
+    def rollback(self, kind):
+        """Return to the previous version of kind. The rolled-back file content is not reloaded again."""
+        with self._lock:
+            if not self._history[kind]:
+                logging.warning(f"No previous {kind} model version to roll back to.")
+                return None
+            current = self._active.get(kind)
+            if current is not None:
+                self._rejected[kind] = current.digest
+            self._pending.pop(kind, None)
+            self._active[kind] = self._history[kind].pop()
+            version = self._active[kind]
+        logging.info(f"Rolled back {kind} model to version {version.version}")
+        return version
+
+    def active(self, kind):
+        """Return the active ModelVersion for kind, or None if none could be loaded."""
+        return self._active.get(kind)
+
+    def versions(self):
+        """Return the active version id of each kind."""
+        return {kind: version.version for kind, version in self._active.items()}
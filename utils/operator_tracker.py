@@ -0,0 +1,148 @@
+import math
+import logging
+import numpy as np
+import cv2
+import config
+from utils.metrics import metrics
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax2, ay2 = a[0] + a[2], a[1] + a[3]
+    bx2, by2 = b[0] + b[2], b[1] + b[3]
+    iw = min(ax2, bx2) - max(a[0], b[0])
+    ih = min(ay2, by2) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    intersection = iw * ih
+    return intersection / float(a[2] * a[3] + b[2] * b[3] - intersection)
+
+
+def torso_box(face_rect, frame_shape):
+    """Torso region below a face box, clipped to the frame: two face widths wide, 2.5 face heights tall."""
+    x, y, w, h = face_rect
+    frame_height, frame_width = frame_shape[:2]
+    x1, y1 = max(int(x - 0.5 * w), 0), max(int(y + h), 0)
+    x2, y2 = min(int(x + 1.5 * w), frame_width), min(int(y + 3.5 * h), frame_height)
+    return x1, y1, x2, y2
+
+
+class OperatorTracker:
+    """
+    Keeps the identity of the operator across frames among the detected faces, so a bystander
+    entering the frame cannot take over control. Candidates are scored by the IoU with the operator's
+    predicted box and by the similarity of an HSV colour histogram of the torso below the face.
+    The operator is locked on the largest (closest) face and re-acquired after being lost for a while.
+    """
+
+    def __init__(self, iou_weight=config.OPERATOR_IOU_WEIGHT, appearance_weight=config.OPERATOR_APPEARANCE_WEIGHT,
+                 match_threshold=config.OPERATOR_MATCH_THRESHOLD, lost_timeout=config.OPERATOR_LOST_TIMEOUT):
+        self.iou_weight = iou_weight
+        self.appearance_weight = appearance_weight
+        self.match_threshold = match_threshold
+        self.lost_timeout = lost_timeout
+        self.reset()
+
+    def reset(self):
+        """Forget the operator; the next update locks onto the closest face."""
+        self.box = None
+        self.velocity = np.zeros(2)
+        self.histogram = None
+        self.last_seen = None
+        self.last_update = None
+
+    def is_locked(self):
+        return self.box is not None
+
+    def _appearance(self, frame, face_rect):
+        """Normalized hue/saturation histogram of the torso patch, computed on a small copy."""
+        x1, y1, x2, y2 = torso_box(face_rect, frame.shape)
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return None
+        patch = frame[y1:y2, x1:x2]
+        scale = config.OPERATOR_PATCH_SIZE / max(patch.shape[:2])
+        if scale < 1:
+            patch = cv2.resize(patch, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(patch, cv2.COLOR_BGR2HSV)
+        histogram = cv2.calcHist([hsv], [0, 1], None, list(config.OPERATOR_HIST_BINS), [0, 180, 0, 256])
+        cv2.normalize(histogram, histogram, 1.0, 0.0, cv2.NORM_L1)
+        return histogram
+
+    def _similarity(self, histogram):
+        if histogram is None or self.histogram is None:
+            return 0.0
+        return 1.0 - cv2.compareHist(self.histogram, histogram, cv2.HISTCMP_BHATTACHARYYA)
+
+    def predicted_box(self, timestamp):
+        """Operator box moved by its estimated velocity up to timestamp."""
+        dt = timestamp - self.last_update if self.last_update is not None else 0.0
+        x, y, w, h = self.box
+        return (x + self.velocity[0] * dt, y + self.velocity[1] * dt, w, h)
+
+    def _lock(self, frame, face_rect, timestamp):
+        self.box = tuple(float(v) for v in face_rect)
+        self.velocity = np.zeros(2)
+        self.histogram = self._appearance(frame, face_rect)
+        self.last_seen = self.last_update = timestamp
+        logging.info(f"Operator locked at {list(face_rect)}")
+
+    def update(self, frame, face_rects, timestamp):
+        """
+        Match this frame's face boxes against the operator.
+        Returns the index of the operator's face in face_rects, or None when the operator is not visible.
+        """
+        with metrics.timer('operator_tracking_seconds'):
+            if self.box is not None and timestamp - self.last_seen > self.lost_timeout:
+                logging.info("Operator lost.")
+                metrics.count('operator_lost_total')
+                self.reset()
+            if not face_rects:
+                return None
+            if self.box is None:
+                index = int(np.argmax([rect[2] * rect[3] for rect in face_rects]))
+                self._lock(frame, face_rects[index], timestamp)
+                return index
+
+            predicted = self.predicted_box(timestamp)
+            best_index, best_score, best_histogram = None, self.match_threshold, None
+            for index, rect in enumerate(face_rects):
+                iou = box_iou(predicted, rect)
+                histogram = self._appearance(frame, rect)
+                score = self.iou_weight * iou + self.appearance_weight * self._similarity(histogram)
+                if score >= best_score:
+                    best_index, best_score, best_histogram = index, score, histogram
+            if best_index is None:
+                return None
+
+            rect = face_rects[best_index]
+            dt = timestamp - self.last_update
+            if dt > 0:
+                self.velocity = 0.5 * self.velocity + 0.5 * (np.array(rect[:2], dtype=float) - self.box[:2]) / dt
+            self.box = tuple(float(v) for v in rect)
+            if best_histogram is not None and self.histogram is not None:
+                self.histogram = cv2.addWeighted(self.histogram, 1.0 - config.OPERATOR_HIST_UPDATE,
+                                                 best_histogram, config.OPERATOR_HIST_UPDATE, 0)
+            self.last_seen = self.last_update = timestamp
+            return best_index
+
+    def matches_pose(self, points):
+        """
+        Return True if pose landmark points (arms subset, shoulders first) belong to the operator:
+        the shoulder midpoint must lie in the torso region below the operator's face.
+        Without a locked operator every pose is accepted.
+        """
+        if self.box is None:
+            return True
+        if points is None:
+            return False
+        x, y, w, h = self.box
+        shoulder_x, shoulder_y = (np.asarray(points[0]) + np.asarray(points[1])) / 2.0
+        return x - w <= shoulder_x <= x + 2 * w and y + 0.5 * h <= shoulder_y <= y + 4 * h
+
+    def target(self, frame_width, hfov=config.CAMERA_HFOV):
+        """Horizontal angle in degrees from the image centre to the operator (positive to the right)."""
+        if self.box is None:
+            return None
+        x, _, w, _ = self.box
+        offset = (x + w / 2.0) / frame_width - 0.5
+        return math.degrees(math.atan(2.0 * offset * math.tan(math.radians(hfov / 2.0))))
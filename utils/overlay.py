@@ -0,0 +1,72 @@
+import cv2
+import mediapipe as mp
+from utils.helper_func import HelperFunc
+from utils.metrics import metrics
+
+functions = HelperFunc()
+
+mp_drawing = mp.solutions.drawing_utils
+mp_pose = mp.solutions.pose
+mp_hands = mp.solutions.hands
+
+# Drawing specs, (landmark, connection) per gesture kind
+LANDMARK_STYLES = {
+    'hand': (
+        mp_hands.HAND_CONNECTIONS,
+        mp_drawing.DrawingSpec(color=(121, 22, 76), thickness=2, circle_radius=3),
+        mp_drawing.DrawingSpec(color=(121, 44, 250), thickness=2),
+    ),
+    'body': (
+        mp_pose.POSE_CONNECTIONS,
+        mp_drawing.DrawingSpec(color=(121, 22, 76), thickness=2, circle_radius=2),
+        mp_drawing.DrawingSpec(color=(121, 44, 250), thickness=2),
+    ),
+}
+
+
+class OverlayRenderer:
+    """
+    Draws detection results and status indicators for the sinks that display or record annotations.
+    Detection itself never draws, so headless runs skip this work and the raw frame stays untouched.
+    """
+
+    def __init__(self, indicator_pos=(30, 30)):
+        self.indicator_pos = indicator_pos
+
+    def draw_face(self, image, face):
+        """Draw the face box corners and the estimated distance."""
+        functions.rect_corners(image, face.rect, (121, 44, 250), th=3)
+        if face.distance is not None:
+            x, y = face.rect[0], face.rect[1]
+            functions.text_with_background(image, f"Distance: {int(face.distance)}cm", (x, y - 10),
+                                           cv2.FONT_HERSHEY_PLAIN, color=(121, 44, 250))
+
+    def draw_gesture(self, image, gesture):
+        """Draw the gesture bounding box, landmarks and label."""
+        functions.rect_corners(image, gesture.brect)
+        if gesture.landmarks is not None:
+            connections, landmark_spec, connection_spec = LANDMARK_STYLES[gesture.kind]
+            mp_drawing.draw_landmarks(image, gesture.landmarks, connections, landmark_spec, connection_spec)
+        info_text = f"{gesture.label} {gesture.accuracy:.2f}"
+        functions.text_with_background(image, info_text, (gesture.brect[0], gesture.brect[1]))
+
+    def draw_status(self, image, fps=None, recording=False, photo=False):
+        """Draw the FPS text and the recording/photo indicators."""
+        if fps is not None:
+            cv2.putText(image, f"FPS: {fps}", (int(image.shape[0] / 2), 30), cv2.FONT_HERSHEY_SIMPLEX,
+                        1.0, (255, 255, 255), 4, cv2.LINE_AA)
+        if recording:
+            cv2.circle(image, self.indicator_pos, 12, (0, 0, 255), -1)
+        if photo:
+            cv2.circle(image, self.indicator_pos, 12, (0, 255, 0), -1)
+
+    def render(self, frame, face=None, gesture=None, fps=None, recording=False, photo=False):
+        """Return an annotated copy of frame; the input frame is not modified."""
+        with metrics.timer('overlay_draw_seconds'):
+            image = frame.copy()
+            if face is not None:
+                self.draw_face(image, face)
+            if gesture is not None:
+                self.draw_gesture(image, gesture)
+            self.draw_status(image, fps, recording, photo)
+        return image
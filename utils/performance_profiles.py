@@ -0,0 +1,82 @@
+import os
+import json
+import logging
+from collections import namedtuple
+import cv2
+import config
+
+# A named set of pipeline settings from config.PERFORMANCE_PROFILES
+PerformanceProfile = namedtuple('PerformanceProfile', [
+    'name', 'video_size', 'video_fps', 'min_detection_confidence', 'min_tracking_confidence',
+    'pose_model_complexity', 'hand_model_complexity', 'face_model_selection', 'inference_heights',
+    'face_interval', 'standby_interval', 'prewarm_interval', 'classifier_backend', 'num_threads',
+])
+
+
+def profile_names():
+    """Names of the configured performance profiles, in config order."""
+    return list(config.PERFORMANCE_PROFILES)
+
+
+def get_profile(name=None):
+    """Return the PerformanceProfile called name (config.PERFORMANCE_PROFILE by default)."""
+    name = name or config.PERFORMANCE_PROFILE
+    settings = config.PERFORMANCE_PROFILES.get(name)
+    if settings is None:
+        raise ValueError(f"Unknown performance profile {name!r}, expected one of {', '.join(profile_names())}")
+    return PerformanceProfile(name=name, **settings)
+
+
+def next_profile(name):
+    """Return the profile after name, wrapping around."""
+    names = profile_names()
+    index = names.index(name) if name in names else -1
+    return get_profile(names[(index + 1) % len(names)])
+
+
+def classifier_paths(backend):
+    """Return the {'hand': path, 'body': path} classifier files of a backend."""
+    if backend not in config.CLASSIFIER_BACKENDS:
+        raise ValueError(f"Unknown classifier backend {backend!r}")
+    hand_path, body_path = config.CLASSIFIER_BACKENDS[backend]
+    return {'hand': hand_path, 'body': body_path}
+
+
+def apply_thread_settings(profile):
+    """Apply the profile's OpenCV thread count (TFLite threads are set when classifiers are loaded)."""
+    cv2.setNumThreads(profile.num_threads if profile.num_threads is not None else -1)
+
+
+def degrade(profile, level):
+    """
+    Return profile lightened by a load governor level (a dict from config.GOVERNOR_LEVELS): inference heights
+    capped, face detection and warm standby made less frequent, lighter graph models. Never makes it heavier.
+    """
+    changes = {}
+    if 'max_inference_height' in level:
+        cap = level['max_inference_height']
+        changes['inference_heights'] = {name: min(height or profile.video_size[1], cap)
+                                        for name, height in profile.inference_heights.items()}
+    if 'face_interval' in level:
+        changes['face_interval'] = max(profile.face_interval, level['face_interval'])
+    if 'standby_interval' in level and profile.standby_interval:
+        # 0 disables warm standby
+        interval = level['standby_interval']
+        changes['standby_interval'] = 0 if interval == 0 else max(profile.standby_interval, interval)
+        changes['prewarm_interval'] = 0 if interval == 0 else profile.prewarm_interval
+    for key in ('pose_model_complexity', 'hand_model_complexity'):
+        if key in level:
+            changes[key] = min(getattr(profile, key), level[key])
+    return profile._replace(**changes)
+
+
+def load_benchmark(name, path=config.PROFILE_BENCHMARK_PATH):
+    """Return the last `benchmark.py profiles` measurements of a profile, or None if it was not benchmarked."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f).get('profiles', {}).get(name)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read profile benchmark {path}: {e}")
+        return None
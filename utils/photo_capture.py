@@ -0,0 +1,166 @@
+import os
+import math
+import time
+import queue
+import logging
+import datetime
+import threading
+from collections import namedtuple
+import numpy as np
+import cv2
+import config
+from utils.metrics import metrics
+
+# A photo request: frames from target (monotonic time) on, count of them, keep only the sharpest if select
+PhotoRequest = namedtuple('PhotoRequest', ['target', 'count', 'select', 'requested_at'])
+
+
+class FrameRing:
+    """
+    The last few seconds of raw camera frames in one pre-allocated array, written by the capture thread
+    with a copy per frame and no allocation. Readers copy out the frames they need under the lock.
+    The array is (re)allocated only when the capture size or rate changes.
+    """
+
+    def __init__(self, seconds=config.PHOTO_RING_SECONDS):
+        self.seconds = seconds
+        self.fps = None
+        self._condition = threading.Condition()
+        self._frames = None
+        self._timestamps = None
+        self._count = 0  # frames written since allocation
+
+    def allocate(self, shape, fps):
+        """Allocate room for seconds of frames of shape at fps."""
+        capacity = max(2, int(math.ceil(self.seconds * fps)) + 1)
+        with self._condition:
+            self.fps = fps
+            self._frames = np.empty((capacity,) + tuple(shape), dtype=np.uint8)
+            self._timestamps = np.full(capacity, -np.inf)
+            self._count = 0
+        logging.info(f"Photo ring: {capacity} frames of {shape[1]}x{shape[0]} "
+                     f"({self._frames.nbytes / 1e6:.0f} MB)")
+
+    def push(self, image, timestamp):
+        """Copy a captured frame into the oldest slot (called from the capture thread)."""
+        with self._condition:
+            if self._frames is None or self._frames.shape[1:] != image.shape:
+                return
+            slot = self._count % len(self._frames)
+            np.copyto(self._frames[slot], image)
+            self._timestamps[slot] = timestamp
+            self._count += 1
+            self._condition.notify_all()
+
+    def wait_until(self, timestamp, timeout):
+        """Wait until a frame captured at or after timestamp is in the ring. Returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._count and self._timestamps[(self._count - 1) % len(self._timestamps)] >= timestamp,
+                timeout=timeout,
+            )
+
+    def take(self, target, count):
+        """Copies of count consecutive frames from the first one captured at or after target, as (image, timestamp)."""
+        with self._condition:
+            if not self._count:
+                return []
+            capacity = len(self._frames)
+            available = min(self._count, capacity)
+            # Ring slots in capture order, oldest first
+            order = [(self._count - available + i) % capacity for i in range(available)]
+            first = next((i for i, slot in enumerate(order) if self._timestamps[slot] >= target), available - 1)
+            if first == 0 and available == capacity and target < self._timestamps[order[0]]:
+                logging.warning(f"Photo target {self._timestamps[order[0]] - target:.2f}s older than the ring, "
+                                "using the oldest frame")
+            first = min(first, max(0, available - count))
+            return [(self._frames[slot].copy(), float(self._timestamps[slot])) for slot in order[first:first + count]]
+
+
+def sharpness(image):
+    """Variance of the Laplacian of a downscaled grayscale copy; higher is sharper."""
+    height, width = image.shape[:2]
+    scale = min(1.0, 320 / width)
+    small = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.Laplacian(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var()
+
+
+class PhotoService:
+    """
+    Takes photos from the frame ring on a worker thread, so neither the vision thread nor gesture dispatch
+    waits. A request names a moment relative to the trigger (negative offsets are before it, taken from
+    the frames already in the ring), a burst size, and whether to keep only the sharpest frame of the burst.
+    """
+
+    def __init__(self, ring, output_dir=config.OUTPUT_DIR):
+        self.ring = ring
+        self.output_dir = output_dir
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Finish the queued photos and stop the worker."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=config.PHOTO_OFFSET_LIMIT + 5.0)
+            self._thread = None
+
+    def is_pending(self):
+        """True while a requested photo has not been saved yet (drives the overlay indicator)."""
+        return self._queue.unfinished_tasks > 0
+
+    def request(self, trigger, offset=config.PHOTO_OFFSET, count=config.PHOTO_BURST,
+                select=config.PHOTO_SELECT_SHARPEST):
+        """Queue a photo of the frames from trigger + offset seconds (monotonic capture time) on. Returns immediately."""
+        offset = max(-self.ring.seconds, min(offset, config.PHOTO_OFFSET_LIMIT))
+        self._queue.put(PhotoRequest(trigger + offset, count, select, time.monotonic()))
+        logging.info(f"Photo requested {offset:+.2f}s from the trigger, {count} frame(s)")
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            try:
+                if request is None:
+                    return
+                self.capture(request)
+            except Exception as e:
+                logging.error(f"Photo capture failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def capture(self, request):
+        """Wait for the requested frames if they are in the future, then select and encode them."""
+        # The burst ends about count frames after the target; wait for it rather than polling the camera
+        end = request.target + (request.count - 1) / (self.ring.fps or config.VIDEO_FPS)
+        if not self.ring.wait_until(end, timeout=max(0.0, end - time.monotonic()) + 1.0):
+            logging.warning("Photo: camera stopped delivering frames, using the frames available")
+        frames = self.ring.take(request.target, request.count)
+        if not frames:
+            logging.warning("Photo: no frames captured")
+            return []
+        if request.select and len(frames) > 1:
+            with metrics.timer('photo_select_seconds'):
+                scores = [sharpness(image) for image, _ in frames]
+            frames = [frames[int(np.argmax(scores))]]
+        paths = []
+        for index, (image, timestamp) in enumerate(frames):
+            paths.append(self.save(image, timestamp, index if len(frames) > 1 else None))
+        metrics.observe('photo_capture_offset_seconds', abs(frames[0][1] - request.target))
+        metrics.observe('photo_request_seconds', time.monotonic() - request.requested_at)
+        return paths
+
+    def save(self, image, timestamp, index=None):
+        """Encode a frame to the output directory, named after its capture wall-clock time."""
+        taken = datetime.datetime.now() - datetime.timedelta(seconds=time.monotonic() - timestamp)
+        suffix = f"_{index}" if index is not None else ""
+        path = os.path.join(self.output_dir, f"photo_{taken.strftime('%d-%m-%y-%I-%M-%S-%f')[:-3]}{suffix}.jpg")
+        with metrics.timer('photo_encode_seconds'):
+            cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, config.PHOTO_JPEG_QUALITY])
+        metrics.count('photos_saved_total')
+        logging.info(f"Photo saved to {path}")
+        return path
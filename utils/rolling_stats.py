@@ -0,0 +1,176 @@
+import math
+import time
+import threading
+from collections import deque
+import config
+
+
+class RollingStats:
+    """
+    Statistics over the values added in the last window_seconds.
+    Sum, mean, standard deviation, min and max are kept incrementally (O(1) amortized per value);
+    percentiles sort the window on demand. An EWMA over all values is kept alongside.
+    """
+
+    def __init__(self, window_seconds=config.STATS_WINDOW, ewma_alpha=config.STATS_EWMA_ALPHA):
+        self.window_seconds = window_seconds
+        self.ewma_alpha = ewma_alpha
+        self._values = deque()
+        # Monotonic deques holding candidates for the window min/max
+        self._min = deque()
+        self._max = deque()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._ewma = None
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        horizon = now - self.window_seconds
+        while self._values and self._values[0][0] < horizon:
+            _, value = self._values.popleft()
+            self._sum -= value
+            self._sum_sq -= value * value
+        while self._min and self._min[0][0] < horizon:
+            self._min.popleft()
+        while self._max and self._max[0][0] < horizon:
+            self._max.popleft()
+        if not self._values:
+            # Drop accumulated floating point error whenever the window empties
+            self._sum = self._sum_sq = 0.0
+
+    def add(self, value, timestamp=None):
+        """Add a value observed at timestamp (monotonic seconds, now by default)."""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self._lock:
+            self._evict(timestamp)
+            self._values.append((timestamp, value))
+            self._sum += value
+            self._sum_sq += value * value
+            while self._min and self._min[-1][1] >= value:
+                self._min.pop()
+            self._min.append((timestamp, value))
+            while self._max and self._max[-1][1] <= value:
+                self._max.pop()
+            self._max.append((timestamp, value))
+            if self._ewma is None:
+                self._ewma = value
+            else:
+                self._ewma += self.ewma_alpha * (value - self._ewma)
+
+    def count(self):
+        return len(self._values)
+
+    def sum(self):
+        return self._sum
+
+    def mean(self):
+        with self._lock:
+            return self._sum / len(self._values) if self._values else 0.0
+
+    def std(self):
+        with self._lock:
+            n = len(self._values)
+            if n < 2:
+                return 0.0
+            mean = self._sum / n
+            return math.sqrt(max(self._sum_sq / n - mean * mean, 0.0))
+
+    def ewma(self):
+        return self._ewma if self._ewma is not None else 0.0
+
+    def min(self):
+        with self._lock:
+            return self._min[0][1] if self._min else 0.0
+
+    def max(self):
+        with self._lock:
+            return self._max[0][1] if self._max else 0.0
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of the values in the window."""
+        with self._lock:
+            values = sorted(value for _, value in self._values)
+        if not values:
+            return 0.0
+        position = (len(values) - 1) * q / 100.0
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    def expire(self, now=None):
+        """Drop values that left the window without adding a new one."""
+        with self._lock:
+            self._evict(time.monotonic() if now is None else now)
+
+    def summary(self):
+        """Return count, mean, ewma, min, max, p50 and p95 as a dict."""
+        return {
+            'count': self.count(),
+            'mean': self.mean(),
+            'ewma': self.ewma(),
+            'min': self.min(),
+            'max': self.max(),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+        }
+
+
+class RateCounter:
+    """Event rate (per second) over a time window, from the intervals between ticks."""
+
+    def __init__(self, window_seconds=config.STATS_WINDOW, ewma_alpha=config.STATS_EWMA_ALPHA):
+        self.intervals = RollingStats(window_seconds, ewma_alpha)
+        self._last_tick = None
+
+    def tick(self, timestamp=None):
+        """Record one event."""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if self._last_tick is not None:
+            self.intervals.add(timestamp - self._last_tick, timestamp)
+        self._last_tick = timestamp
+
+    def rate(self):
+        """Mean events per second over the window (0 when stalled for a whole window)."""
+        self.intervals.expire()
+        total = self.intervals.sum()
+        return self.intervals.count() / total if total > 0 else 0.0
+
+    def ewma_rate(self):
+        """Events per second from the EWMA of the intervals, quicker to react than rate()."""
+        interval = self.intervals.ewma()
+        return 1.0 / interval if interval > 0 else 0.0
+
+
+class FrameStats:
+    """
+    Frame rate and latency statistics of the processing pipeline, shared by the GUI,
+    the gesture confirmation and the metrics export.
+    """
+
+    def __init__(self, window_seconds=config.STATS_WINDOW):
+        self.camera = RateCounter(window_seconds)
+        self.processing = RateCounter(window_seconds)
+        self.latency = RollingStats(window_seconds)
+
+    def camera_fps(self):
+        return round(self.camera.rate(), 2)
+
+    def processing_fps(self):
+        return round(self.processing.rate(), 2)
+
+    def frame_done(self, captured_at, now=None):
+        """Record a processed frame and its capture-to-result latency."""
+        now = time.monotonic() if now is None else now
+        self.processing.tick(now)
+        self.latency.add(now - captured_at, now)
+
+    def gauges(self):
+        """Current values as flat metric gauges."""
+        latency = self.latency.summary()
+        return {
+            'camera_fps': self.camera_fps(),
+            'processing_fps': self.processing_fps(),
+            'frame_latency_mean_seconds': latency['mean'],
+            'frame_latency_p95_seconds': latency['p95'],
+            'frame_latency_max_seconds': latency['max'],
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import config
+from utils.metrics import metrics
+
+
+class AsyncRuntime:
+    """
+    Runs the application tasks on one asyncio event loop in a background thread (Tk keeps the main thread).
+    Blocking work goes to named, bounded thread pools: 'vision' has a single worker so MediaPipe graphs,
+    the video writer and cProfile stay on one thread, and 'io' runs blocking drone commands.
+    The loop lag (how late timers fire) is measured continuously as the scheduling latency metric.
+    """
+
+    def __init__(self, executors=None):
+        self.loop = asyncio.new_event_loop()
+        workers = executors if executors is not None else config.RUNTIME_EXECUTORS
+        self._executors = {
+            name: ThreadPoolExecutor(max_workers=count, thread_name_prefix=f'runtime-{name}')
+            for name, count in workers.items()
+        }
+        self._semaphores = {}
+        self._thread = None
+
+    def executor(self, name):
+        """Return the thread pool called name."""
+        return self._executors[name]
+
+    def start(self):
+        """Start the event loop thread and the loop lag monitor."""
+        self._thread = threading.Thread(target=self._run, name='runtime-loop', daemon=True)
+        self._thread.start()
+        self.submit(self._monitor_lag())
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the loop from any thread; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(self._guard(coroutine), self.loop)
+
+    async def _guard(self, coroutine):
+        try:
+            return await coroutine
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Runtime task failed")
+            raise
+
+    def call_soon(self, callback, *args):
+        """Run callback on the loop thread (safe to call from worker threads)."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    async def run_blocking(self, func, *args, executor='io'):
+        """
+        Await func(*args) on the named thread pool. At most RUNTIME_MAX_PENDING calls per pool are queued or
+        running, so a slow pool applies back-pressure instead of growing an unbounded queue.
+        """
+        semaphore = self._semaphores.get(executor)
+        if semaphore is None:
+            semaphore = self._semaphores[executor] = asyncio.Semaphore(config.RUNTIME_MAX_PENDING)
+        async with semaphore:
+            return await self.loop.run_in_executor(self._executors[executor], func, *args)
+
+    async def _monitor_lag(self):
+        interval = config.RUNTIME_LAG_INTERVAL
+        while True:
+            start = self.loop.time()
+            await asyncio.sleep(interval)
+            lag = max(self.loop.time() - start - interval, 0.0)
+            metrics.observe('event_loop_lag_seconds', lag)
+
+    async def _cancel_tasks(self):
+        tasks = [task for task in asyncio.all_tasks(self.loop) if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self, timeout=config.RUNTIME_SHUTDOWN_TIMEOUT):
+        """
+        Cancel all tasks, stop the loop and shut the pools down. The vision pool finishes its queued work
+        (the in-flight frame and the capture shutdown); pending drone commands are cancelled.
+        """
+        if self._thread is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._cancel_tasks(), self.loop).result(timeout)
+        except Exception as e:
+            logging.warning(f"Runtime tasks did not cancel cleanly: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        for name, executor in self._executors.items():
+            executor.shutdown(wait=(name == 'vision'), cancel_futures=(name != 'vision'))
+        if not self._thread.is_alive():
+            self.loop.close()
+        self._thread = None
+        logging.info("Runtime stopped.")
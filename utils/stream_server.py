@@ -0,0 +1,269 @@
+import json
+import time
+import socket
+import logging
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import cv2
+import config
+from utils.metrics import metrics
+
+BOUNDARY = 'frame'
+
+
+class FrameStream:
+    """
+    Shares the annotated video feed with remote viewers. publish() only swaps in a reference to the newest
+    frame, so capture and processing never wait on encoding or on clients. An encoder thread JPEG-encodes
+    the newest frame once per quality level that at least one client currently uses (at most max_fps times
+    a second) and every client at that level sends the same bytes. A client joining a level gets an
+    encoding of the newest frame at or after its join, never one cached before it.
+    """
+
+    def __init__(self, levels=config.STREAM_QUALITY_LEVELS, max_fps=config.STREAM_MAX_FPS):
+        """levels is a sequence of (scale, JPEG quality), best first."""
+        self.levels = levels
+        self.max_fps = max_fps
+        self._condition = threading.Condition()
+        self._frame = None
+        self._sequence = 0
+        self._encoded = {}
+        self._demand = Counter()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the encoder thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def is_running(self):
+        return self._running
+
+    def clients(self):
+        """Number of connected stream clients."""
+        return sum(self._demand.values())
+
+    def publish(self, frame):
+        """Offer the newest BGR frame to the stream (called once per processed frame, never blocks on clients)."""
+        if frame is None:
+            return
+        with self._condition:
+            self._frame = frame
+            self._sequence += 1
+            if self._demand:
+                self._condition.notify_all()
+
+    def join(self, level):
+        """Register a client at quality level. Returns the sequence of the newest frame, the first one it may be sent."""
+        with self._condition:
+            self._demand[level] += 1
+            sequence = self._sequence
+            self._condition.notify_all()
+        metrics.set_gauge('stream_clients', self.clients())
+        return sequence
+
+    def leave(self, level):
+        """Unregister a client from quality level."""
+        with self._condition:
+            self._demand[level] -= 1
+            if self._demand[level] <= 0:
+                del self._demand[level]
+        metrics.set_gauge('stream_clients', self.clients())
+
+    def change_level(self, old, new):
+        """Move a client from quality level old to new."""
+        self.join(new)
+        self.leave(old)
+
+    def encode(self, frame, level):
+        """JPEG-encode frame at quality level and return the bytes, or None if encoding failed."""
+        scale, quality = self.levels[level]
+        with metrics.timer('stream_encode_seconds'):
+            if scale < 1.0:
+                height, width = frame.shape[:2]
+                size = (max(1, int(width * scale)), max(1, int(height * scale)))
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        return jpeg.tobytes() if ok else None
+
+    def _stale_levels(self):
+        """Levels in use whose latest encoding is older than the newest frame (call with the lock held)."""
+        if self._frame is None:
+            return []
+        return [level for level in self._demand if self._encoded.get(level, (0, None))[0] < self._sequence]
+
+    def _encode_loop(self):
+        interval = 1.0 / self.max_fps
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: not self._running or self._stale_levels())
+                if not self._running:
+                    return
+                frame, sequence, levels = self._frame, self._sequence, self._stale_levels()
+            start = time.monotonic()
+            encoded = {}
+            for level in levels:
+                jpeg = self.encode(frame, level)
+                if jpeg is not None:
+                    encoded[level] = (sequence, jpeg)
+            with self._condition:
+                self._encoded.update(encoded)
+                self._condition.notify_all()
+            # Frames arriving faster than max_fps are skipped rather than encoded
+            remaining = interval - (time.monotonic() - start)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def wait_frame(self, level, last_sequence, timeout=1.0):
+        """Wait for an encoding at level newer than last_sequence. Returns (sequence, jpeg) or None on timeout."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self._running or self._encoded.get(level, (-1, None))[0] > last_sequence,
+                timeout=timeout,
+            )
+            entry = self._encoded.get(level)
+        if entry is None or entry[0] <= last_sequence:
+            return None
+        return entry
+
+
+class _StreamRequestHandler(BaseHTTPRequestHandler):
+    """Serves /stream.mjpg?fps=N (MJPEG), /snapshot.jpg and /status (JSON)."""
+
+    # A send blocked for longer than this drops the client
+    timeout = config.STREAM_CLIENT_TIMEOUT
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stream.mjpg':
+            self.send_stream(parse_qs(url.query))
+        elif url.path == '/snapshot.jpg':
+            self.send_snapshot()
+        elif url.path == '/status':
+            self.send_body(json.dumps(self.server.status_provider()).encode('utf-8'), 'application/json')
+        else:
+            self.send_error(404)
+
+    def send_body(self, data, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_snapshot(self):
+        stream = self.server.stream
+        since = stream.join(0)
+        try:
+            entry = stream.wait_frame(0, since - 1, timeout=2.0)
+        finally:
+            stream.leave(0)
+        if entry is None:
+            self.send_error(503, "No frame available")
+            return
+        self.send_body(entry[1], 'image/jpeg')
+
+    def send_stream(self, query):
+        """
+        Stream MJPEG at up to fps frames per second. A client whose sends take longer than its frame interval
+        is falling behind and is moved to a lower quality level; it moves back up once sends are fast again.
+        """
+        stream = self.server.stream
+        try:
+            fps = min(float(query.get('fps', [stream.max_fps])[0]), stream.max_fps)
+        except ValueError:
+            self.send_error(400, "fps must be a number")
+            return
+        if fps <= 0:
+            self.send_error(400, "fps must be positive")
+            return
+        interval = 1.0 / fps
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        level, slow, fast = 0, 0, 0
+        last_sequence = stream.join(level) - 1
+        try:
+            while stream.is_running():
+                entry = stream.wait_frame(level, last_sequence)
+                if entry is None:
+                    continue
+                last_sequence, jpeg = entry
+                start = time.monotonic()
+                self.wfile.write(f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n'.encode('ascii'))
+                self.wfile.write(jpeg)
+                self.wfile.write(b'\r\n')
+                self.wfile.flush()
+                elapsed = time.monotonic() - start
+                metrics.observe('stream_send_seconds', elapsed)
+                metrics.count('stream_frames_sent_total')
+
+                if elapsed > interval * config.STREAM_SLOW_SEND_RATIO:
+                    slow, fast = slow + 1, 0
+                    if slow >= config.STREAM_DOWNGRADE_AFTER and level < len(stream.levels) - 1:
+                        stream.change_level(level, level + 1)
+                        level, slow = level + 1, 0
+                        metrics.count('stream_quality_downgrades_total')
+                        logging.info(f"Stream client {self.client_address[0]} falling behind, quality level {level}")
+                elif elapsed < interval * config.STREAM_FAST_SEND_RATIO:
+                    slow, fast = 0, fast + 1
+                    if fast >= config.STREAM_UPGRADE_AFTER and level > 0:
+                        stream.change_level(level, level - 1)
+                        level, fast = level - 1, 0
+                        metrics.count('stream_quality_upgrades_total')
+                        logging.info(f"Stream client {self.client_address[0]} caught up, quality level {level}")
+
+                # Per-client frame rate limit
+                remaining = interval - (time.monotonic() - start)
+                if remaining > 0:
+                    time.sleep(remaining)
+        except (BrokenPipeError, ConnectionResetError, socket.timeout) as e:
+            logging.info(f"Stream client {self.client_address[0]} disconnected: {e.__class__.__name__}")
+        finally:
+            stream.leave(level)
+
+    def log_message(self, format, *args):
+        logging.debug("stream: " + format % args)
+
+
+def start_stream_server(status_provider, host=config.STREAM_HTTP_HOST, port=config.STREAM_HTTP_PORT):
+    """
+    Serve the MJPEG feed and the status JSON on a daemon thread. status_provider returns the status dict.
+    Port 0 binds an ephemeral port (see server.server_address). Returns the server, whose stream attribute
+    is the FrameStream to publish frames to, or None if disabled (port None) or the port is unavailable.
+    """
+    if port is None:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _StreamRequestHandler)
+    except OSError as e:
+        logging.error(f"Could not start stream server on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.stream = FrameStream().start()
+    server.status_provider = status_provider
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Streaming video on http://{host}:{server.server_address[1]}/stream.mjpg and status on /status")
+    return server
+
+
+def stop_stream_server(server):
+    """Stop serving, close the listening socket and stop the encoder thread of a server from start_stream_server."""
+    server.stream.stop()
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,96 @@
+import os
+import logging
+import numpy as np
+import config
+from utils.model_registry import Prediction, file_digest
+
+
+class TemporalGestureClassifier:
+    """
+    Streaming version of the temporal gesture model (Conv1D -> ReLU -> GlobalAveragePooling1D -> Dense softmax)
+    trained by train.py over windows of pre-processed landmark vectors.
+    Each update computes only the newest convolution output and keeps a running sum over the window,
+    so the cost per frame does not depend on the window length.
+    """
+
+    def __init__(self, model_path):
+        """Loads the exported NumPy weights and allocates the ring buffers."""
+        with np.load(model_path) as data:
+            self.conv_weight = data['conv_W'].astype(np.float32)  # (kernel_size, input_size, channels)
+            self.conv_bias = data['conv_b'].astype(np.float32)
+            self.dense_weight = data['dense_W'].astype(np.float32)  # (channels, num_classes)
+            self.dense_bias = data['dense_b'].astype(np.float32)
+            self.window = int(data['window'])
+        self.model_path = model_path
+        self.version = 'temporal-' + file_digest(model_path)[:10]
+        self.kernel_size, self.input_size, self.channels = self.conv_weight.shape
+        self.num_classes = int(self.dense_weight.shape[1])
+        self.num_outputs = self.window - self.kernel_size + 1
+        self._inputs = np.zeros((self.kernel_size, self.input_size), dtype=np.float32)
+        self._outputs = np.zeros((self.num_outputs, self.channels), dtype=np.float32)
+        self._sum = np.zeros(self.channels, dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        """Empty the window, e.g. when the landmarks are lost."""
+        self._input_pos = 0
+        self._input_count = 0
+        self._output_pos = 0
+        self._output_count = 0
+        self._updates = 0
+        self._sum[:] = 0
+
+    def is_ready(self):
+        """Return True once the window is full and update() produces predictions."""
+        return self._output_count == self.num_outputs
+
+    def update(self, landmark_vector):
+        """
+        Push one pre-processed landmark vector and return a Prediction for the current window,
+        or None while the window is still filling.
+        """
+        self._inputs[self._input_pos] = landmark_vector
+        self._input_pos = (self._input_pos + 1) % self.kernel_size
+        self._input_count += 1
+        if self._input_count < self.kernel_size:
+            return None
+
+        # Newest convolution output over the last kernel_size inputs (oldest first)
+        order = (self._input_pos + np.arange(self.kernel_size)) % self.kernel_size
+        conv = np.einsum('kf,kfc->c', self._inputs[order], self.conv_weight) + self.conv_bias
+        np.maximum(conv, 0, out=conv)
+
+        if self._output_count == self.num_outputs:
+            self._sum -= self._outputs[self._output_pos]
+        else:
+            self._output_count += 1
+        self._outputs[self._output_pos] = conv
+        self._sum += conv
+        self._output_pos = (self._output_pos + 1) % self.num_outputs
+
+        # Re-sum occasionally so rounding errors of the running sum cannot accumulate
+        self._updates += 1
+        if self._updates % (self.num_outputs * 8) == 0:
+            self._sum[:] = self._outputs[:self._output_count].sum(axis=0)
+
+        if self._output_count < self.num_outputs:
+            return None
+        logits = (self._sum / self.num_outputs) @ self.dense_weight + self.dense_bias
+        result = np.exp(logits - np.max(logits))
+        result /= np.sum(result)
+        class_id = int(np.argmax(result))
+        return Prediction(class_id, float(round(result[class_id], 2)), self.version)
+
+
+def load_temporal_classifier(model_path):
+    """Load the temporal classifier if enabled in config and present on disk, otherwise return None."""
+    if not config.TEMPORAL_CLASSIFIER_ENABLED:
+        return None
+    if not os.path.exists(model_path):
+        logging.warning(f"Temporal classifier {model_path} not found; using per-frame classification.")
+        return None
+    try:
+        return TemporalGestureClassifier(model_path)
+    except Exception as e:
+        logging.error(f"Failed to load temporal classifier {model_path}: {e}")
+        return None
@@ -0,0 +1,221 @@
+import os
+import time
+import queue
+import logging
+import datetime
+import threading
+from collections import deque
+import numpy as np
+import cv2
+import config
+from utils.metrics import metrics
+
+
+class PrerollBuffer:
+    """
+    The last few seconds before a recording starts, kept as JPEG frames in memory rather than raw frames
+    (roughly a tenth of the size). offer() only swaps in a reference to the newest frame; an encoder thread
+    compresses it and appends it to a ring that is trimmed to max_seconds and max_bytes. Frames offered
+    faster than the encoder keeps up with are skipped, so the pre-roll frame rate drops before the vision
+    thread ever waits on it.
+    """
+
+    def __init__(self, max_seconds=config.PREROLL_SECONDS, max_bytes=config.PREROLL_MAX_BYTES,
+                 quality=config.PREROLL_JPEG_QUALITY):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self._condition = threading.Condition()
+        self._frames = deque()  # (timestamp, jpeg bytes), oldest first
+        self._bytes = 0
+        self._offered = None
+        self._running = False
+        self._thread = None
+        self.encoded_frames = 0
+        self.skipped_frames = 0
+        self.encode_seconds = 0.0
+
+    def start(self):
+        """Start the encoder thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def offer(self, frame, timestamp):
+        """Offer a frame captured at timestamp to the pre-roll (called from the vision thread, never blocks on encoding)."""
+        with self._condition:
+            if self._offered is not None:
+                self.skipped_frames += 1
+                metrics.count('preroll_skipped_frames_total')
+            self._offered = (frame, timestamp)
+            self._condition.notify()
+
+    def _encode_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: not self._running or self._offered is not None)
+                if not self._running:
+                    return
+                (frame, timestamp), self._offered = self._offered, None
+            start = time.perf_counter()
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            elapsed = time.perf_counter() - start
+            metrics.observe('preroll_encode_seconds', elapsed)
+            if not ok:
+                continue
+            data = jpeg.tobytes()
+            with self._condition:
+                self.encoded_frames += 1
+                self.encode_seconds += elapsed
+                self._frames.append((timestamp, data))
+                self._bytes += len(data)
+                while self._frames and (self._bytes > self.max_bytes
+                                        or timestamp - self._frames[0][0] > self.max_seconds):
+                    self._bytes -= len(self._frames.popleft()[1])
+
+    def drain(self):
+        """Remove and return the buffered JPEG frames, oldest first."""
+        with self._condition:
+            frames = [data for _, data in self._frames]
+            self._frames.clear()
+            self._bytes = 0
+            self._offered = None
+        return frames
+
+    def clear(self):
+        self.drain()
+
+    def stats(self):
+        """Buffered frames, seconds and bytes, and the mean encoding cost per frame."""
+        with self._condition:
+            seconds = self._frames[-1][0] - self._frames[0][0] if len(self._frames) > 1 else 0.0
+            return {
+                'frames': len(self._frames),
+                'seconds': round(seconds, 2),
+                'bytes': self._bytes,
+                'encode_ms': round(1000 * self.encode_seconds / self.encoded_frames, 2) if self.encoded_frames else 0.0,
+                'skipped': self.skipped_frames,
+            }
+
+    def gauges(self):
+        stats = self.stats()
+        return {
+            'preroll_frames': stats['frames'],
+            'preroll_seconds': stats['seconds'],
+            'preroll_bytes': stats['bytes'],
+        }
+
+
+class VideoRecorder:
+    """
+    Writes recordings on a worker thread, so encoding video never runs on the vision thread. start() opens
+    a new timestamped file and hands the pre-roll frames to the worker as one item ahead of the live ones;
+    write() only queues a frame reference, dropping it if queue_size live frames are already waiting.
+    Control items and the pre-roll do not count against that bound, so neither call ever blocks.
+    """
+
+    def __init__(self, output_dir=config.OUTPUT_DIR, codec=config.VIDEO_CODEC, queue_size=config.RECORDER_QUEUE_SIZE):
+        self.output_dir = output_dir
+        self.fourcc = cv2.VideoWriter_fourcc(*codec)
+        self.queue_size = queue_size
+        self._queue = queue.Queue()
+        self._queued_frames = 0  # live frames waiting in the queue
+        self._lock = threading.Lock()
+        self._recording = False
+        self._thread = None
+        self.path = None
+
+    def start_worker(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def is_recording(self):
+        return self._recording
+
+    def start(self, size, fps, preroll=()):
+        """Start recording frames of size at fps into a new file, beginning with the pre-roll JPEG frames."""
+        if self._recording:
+            self.stop()
+        time_now = datetime.datetime.now()
+        self.path = os.path.join(self.output_dir, f"video_{time_now.strftime('%d-%m-%y-%I-%M-%S')}.avi")
+        self._recording = True
+        self._queue.put(('open', (self.path, fps, size)))
+        # One item for the whole pre-roll, its size is bounded by PREROLL_MAX_BYTES
+        if preroll:
+            self._queue.put(('preroll', list(preroll)))
+        logging.info(f"Recording to {self.path} with {len(preroll)} pre-roll frames")
+
+    def write(self, frame):
+        """Queue a frame of the current recording (called from the vision thread, never blocks)."""
+        if not self._recording:
+            return
+        with self._lock:
+            if self._queued_frames >= self.queue_size:
+                metrics.count('recorder_dropped_frames_total')
+                return
+            self._queued_frames += 1
+        self._queue.put(('frame', frame))
+
+    def stop(self):
+        """Finish the current recording; queued frames are still written."""
+        if not self._recording:
+            return
+        self._recording = False
+        self._queue.put(('close', None))
+
+    def close(self):
+        """Finish the current recording and stop the worker."""
+        self.stop()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def _run(self):
+        writer, size = None, None
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            kind, value = item
+            try:
+                if kind == 'open':
+                    path, fps, size = value
+                    writer = cv2.VideoWriter(path, self.fourcc, fps, size)
+                elif kind == 'close':
+                    if writer is not None:
+                        writer.release()
+                    writer = None
+                elif kind == 'preroll':
+                    for jpeg in value:
+                        if writer is not None:
+                            self._write(writer, cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR), size)
+                elif writer is not None:
+                    self._write(writer, value, size)
+            except Exception as e:
+                logging.error(f"Video recorder failed on {kind}: {e}")
+            finally:
+                if kind == 'frame':
+                    with self._lock:
+                        self._queued_frames -= 1
+        if writer is not None:
+            writer.release()
+
+    @staticmethod
+    def _write(writer, frame, size):
+        """Write a frame, resized to the recording size if needed."""
+        if frame is None:
+            return
+        with metrics.timer('writer_seconds'):
+            if (frame.shape[1], frame.shape[0]) != size:
+                frame = cv2.resize(frame, size)
+            writer.write(frame)